@@ -0,0 +1,75 @@
+import { NextRequest, NextResponse } from "next/server";
+import { spawn } from "child_process";
+import path from "path";
+
+// Enrolls the named speakers of a processed meeting so later meetings come back with their names.
+// The browser only sends the "result_id" returned by /api/process-audio; the voiceprints are read
+// from the server-side result cache and never leave the server.
+const RESULT_ID = /^[0-9a-f]{64}\.[0-9a-f]{32}$/;
+const SPEAKER_LABEL = /^Speaker \d+$/;
+
+export async function POST(request: NextRequest) {
+  try {
+    const { resultId, speakerNames } = await request.json();
+
+    if (typeof resultId !== "string" || !RESULT_ID.test(resultId)) {
+      return NextResponse.json({ error: "Invalid resultId." }, { status: 400 });
+    }
+    if (!speakerNames || typeof speakerNames !== "object") {
+      return NextResponse.json({ error: "speakerNames must map speaker labels to names." }, { status: 400 });
+    }
+
+    // e.g. { "Speaker 1": "Alice" } -> "Speaker 1=Alice"; unnamed speakers are not enrolled
+    const assignments: string[] = [];
+    for (const [label, name] of Object.entries(speakerNames)) {
+      if (!SPEAKER_LABEL.test(label) || typeof name !== "string") {
+        return NextResponse.json({ error: `Invalid speaker name for "${label}".` }, { status: 400 });
+      }
+      if (name.trim()) assignments.push(`${label}=${name.trim()}`);
+    }
+    if (assignments.length === 0) {
+      return NextResponse.json({ error: "No speaker names given." }, { status: 400 });
+    }
+
+    const pythonScriptPath = path.resolve("./src/python_services/audio_processor.py");
+    const pythonProcess = spawn("python3", [
+      pythonScriptPath,
+      "enroll",
+      "--from-cache",
+      "--enrollment-dir",
+      process.env.AUDIO_PROCESSOR_ENROLLMENT_DIR || "speaker_enrollment",
+      "--",
+      resultId,
+      ...assignments
+    ]);
+
+    let scriptOutput = "";
+    let scriptError = "";
+    pythonProcess.stdout.on("data", (data) => {
+      scriptOutput += data.toString();
+    });
+    pythonProcess.stderr.on("data", (data) => {
+      scriptError += data.toString();
+    });
+
+    const code = await new Promise<number | null>((resolve, reject) => {
+      pythonProcess.on("close", resolve);
+      pythonProcess.on("error", reject);
+    });
+
+    let result: any;
+    try {
+      result = JSON.parse(scriptOutput);
+    } catch (e) {
+      console.error("Python script error (stderr):", scriptError);
+      return NextResponse.json({ error: `Python script failed with code ${code}.`, details: scriptError },
+                               { status: 500 });
+    }
+    // An unknown result_id (e.g. evicted from the cache) is the caller's to fix by reprocessing
+    return NextResponse.json(result, { status: code === 0 ? 200 : 404 });
+
+  } catch (error: any) {
+    console.error("Error enrolling speakers:", error);
+    return NextResponse.json({ error: "Internal server error.", details: error.message }, { status: 500 });
+  }
+}
@@ -36,19 +36,55 @@ export async function POST(request: NextRequest) {
         }
     }
 
-    // Execute the Python script with language parameter
+    // Execute the Python script with language parameter.
+    // `--events ndjson` makes the script report progress as one JSON event per line
+    // (stage-start/stage-end, partial-transcript, segment) and finish with a "result" event.
+    // `--enrollment-dir` matches the speakers against those enrolled through /api/enroll-speakers:
+    // the result then carries their names ("speaker_names") and a "result_id" to enroll from.
     const pythonProcess = spawn("python3", [
       pythonScriptPath, 
       tempFilePath,
       "--language", 
-      audioLanguage
+      audioLanguage,
+      "--events",
+      "ndjson",
+      "--enrollment-dir",
+      process.env.AUDIO_PROCESSOR_ENROLLMENT_DIR || "speaker_enrollment"
     ]);
 
-    let scriptOutput = "";
+    const cleanupTempFiles = () => {
+      try {
+          if (fs.existsSync(tempFilePath)) fs.unlinkSync(tempFilePath);
+          if (fs.existsSync(tempDir)) fs.rmdirSync(tempDir);
+      } catch (cleanupError) {
+          console.error("Error during temporary file cleanup:", cleanupError);
+      }
+    };
+
+    let pendingOutput = "";
     let scriptError = "";
+    let finalResult: any = null;
+    const eventListeners: ((event: any) => void)[] = [];
 
     pythonProcess.stdout.on("data", (data) => {
-      scriptOutput += data.toString();
+      pendingOutput += data.toString();
+      const lines = pendingOutput.split("\n");
+      pendingOutput = lines.pop() || "";
+      for (const line of lines) {
+        if (!line.trim()) continue;
+        try {
+          const event = JSON.parse(line);
+          if (event.event === "result") {
+            // Speaker embeddings are voiceprints; they stay on the server (result cache,
+            // enrollment) and are never sent to the browser
+            if (event.result) delete event.result.speaker_embeddings;
+            finalResult = event.result;
+          }
+          eventListeners.forEach((listener) => listener(event));
+        } catch (e) {
+          console.error("Ignoring non-JSON output from Python script:", line);
+        }
+      }
     });
 
     pythonProcess.stderr.on("data", (data) => {
@@ -58,40 +94,44 @@ export async function POST(request: NextRequest) {
     const processingPromise = new Promise((resolve, reject) => {
       pythonProcess.on("close", (code) => {
         // Clean up the temporary file and directory
-        fs.unlinkSync(tempFilePath);
-        fs.rmdirSync(tempDir);
-
-        if (code === 0) {
-          try {
-            const result = JSON.parse(scriptOutput);
-            resolve(result);
-          } catch (e) {
-            console.error("Error parsing Python script output:", e);
-            console.error("Python script output (stdout):", scriptOutput);
-            console.error("Python script error (stderr):", scriptError);
-            reject({ error: "Failed to parse Python script output.", details: scriptOutput, stderr: scriptError });
-          }
+        cleanupTempFiles();
+
+        if (code === 0 && finalResult) {
+          resolve(finalResult);
+        } else if (code === 0) {
+          console.error("Python script finished without a result event.");
+          console.error("Python script error (stderr):", scriptError);
+          reject({ error: "Failed to parse Python script output.", details: pendingOutput, stderr: scriptError });
         } else {
           console.error(`Python script exited with code ${code}`);
           console.error("Python script error (stderr):", scriptError);
-          console.error("Python script output (stdout):", scriptOutput);
-          reject({ error: `Python script failed with code ${code}.`, details: scriptError, stdout: scriptOutput });
+          reject({ error: `Python script failed with code ${code}.`, details: scriptError, stdout: pendingOutput });
         }
       });
 
       pythonProcess.on("error", (err) => {
         // Clean up the temporary file and directory in case of spawn error
-        try {
-            if (fs.existsSync(tempFilePath)) fs.unlinkSync(tempFilePath);
-            if (fs.existsSync(tempDir)) fs.rmdirSync(tempDir);
-        } catch (cleanupError) {
-            console.error("Error during cleanup after spawn error:", cleanupError);
-        }
+        cleanupTempFiles();
         console.error("Failed to start Python script:", err);
         reject({ error: "Failed to start Python script.", details: err.message });
       });
     });
 
+    // Clients that ask for a stream get the NDJSON events as they happen, so long
+    // meetings render progressively instead of waiting minutes for a single response.
+    if (formData.get("stream") === "true") {
+      const encoder = new TextEncoder();
+      const stream = new ReadableStream({
+        start(controller) {
+          eventListeners.push((event) => controller.enqueue(encoder.encode(JSON.stringify(event) + "\n")));
+          processingPromise
+            .catch((error) => controller.enqueue(encoder.encode(JSON.stringify({ event: "error", ...error }) + "\n")))
+            .finally(() => controller.close());
+        },
+      });
+      return new Response(stream, { headers: { "Content-Type": "application/x-ndjson" } });
+    }
+
     const result = await processingPromise;
     return NextResponse.json(result);
 
@@ -0,0 +1,150 @@
+# Word-level timestamps from CTC emissions and word -> speaker-turn assignment.
+# The decoded tokens are force-aligned against the wav2vec2 CTC log-probabilities
+# (Viterbi over the usual blank-interleaved state graph), grouped into words, and the
+# words are then placed onto diarization turns with a sorted-interval binary search.
+import numpy as np
+
+from diarization import speaker_names
+
+WORD_BOUNDARY = "▁"  # SentencePiece marks the first piece of each word with "▁"
+
+
+def ctc_emissions(asr_model, wavs, wav_lens, encoder=None):
+    """Return CTC log-probabilities (batch, frames, vocab) and the encoder output.
+
+    `encoder` is an optional inference backend used in place of asr_model.encode_batch.
+    """
+    encoder_out = (encoder or asr_model.encode_batch)(wavs, wav_lens)
+    logits = asr_model.hparams.ctc_lin(encoder_out)
+    return asr_model.hparams.log_softmax(logits), encoder_out
+
+
+def ctc_forced_align(log_probs, tokens, blank_id=0):
+    """Viterbi-align `tokens` to (frames, vocab) log-probs.
+
+    Returns per-token start and end frames (end exclusive). Raises ValueError when the
+    sequence cannot fit into the available frames.
+    """
+    tokens = np.asarray(tokens, dtype=np.int64)
+    num_frames, num_tokens = log_probs.shape[0], tokens.size
+    if num_tokens == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+
+    # Blank-interleaved state sequence: blank, t1, blank, t2, ..., tN, blank
+    states = np.full(2 * num_tokens + 1, blank_id, dtype=np.int64)
+    states[1::2] = tokens
+    num_states = states.size
+    emit = log_probs[:, states]
+    can_skip = np.zeros(num_states, dtype=bool)
+    can_skip[2:] = (states[2:] != blank_id) & (states[2:] != states[:-2])
+
+    alpha = np.full(num_states, -np.inf)
+    alpha[:2] = emit[0, :2]
+    backpointers = np.zeros((num_frames, num_states), dtype=np.int8)
+    for t in range(1, num_frames):
+        from_prev = np.concatenate(([-np.inf], alpha[:-1]))
+        from_skip = np.where(can_skip, np.concatenate(([-np.inf, -np.inf], alpha[:-2])), -np.inf)
+        candidates = np.stack((alpha, from_prev, from_skip))
+        step = candidates.argmax(axis=0)
+        alpha = candidates[step, np.arange(num_states)] + emit[t]
+        backpointers[t] = step
+
+    state = num_states - 1 if alpha[-1] >= alpha[-2] else num_states - 2
+    if not np.isfinite(alpha[state]):
+        raise ValueError("Token sequence is longer than the CTC emission")
+    path = np.empty(num_frames, dtype=np.int64)
+    for t in range(num_frames - 1, -1, -1):
+        path[t] = state
+        state -= backpointers[t, state]
+
+    token_frames = np.flatnonzero(path % 2 == 1)
+    token_index = (path[token_frames] - 1) // 2
+    _, first = np.unique(token_index, return_index=True)
+    _, last_reversed = np.unique(token_index[::-1], return_index=True)
+    starts = token_frames[first]
+    ends = token_frames[token_index.size - 1 - last_reversed] + 1
+    return starts, ends
+
+
+def tokens_to_words(pieces, token_starts, token_ends):
+    """Group SentencePiece tokens into words; returns (words, start_frames, end_frames)."""
+    words, starts, ends = [], [], []
+    new_word = True
+    for piece, start, end in zip(pieces, token_starts, token_ends):
+        if piece.startswith(WORD_BOUNDARY):
+            new_word = True
+        text = piece.replace(WORD_BOUNDARY, "")
+        if not text:
+            continue
+        if new_word or not words:
+            words.append(text)
+            starts.append(start)
+            ends.append(end)
+            new_word = False
+        else:
+            words[-1] += text
+            ends[-1] = end
+    return words, np.asarray(starts, dtype=np.int64), np.asarray(ends, dtype=np.int64)
+
+
+def stitch_timed_words(chunk_words, bounds, sample_rate):
+    """Merge per-chunk (words, starts, ends) triples into one timeline.
+
+    Each overlap is split at its midpoint: words centred before it come from the earlier
+    chunk, the rest from the later one, so nothing is emitted twice.
+    """
+    words, starts, ends = [], [], []
+    for k, ((chunk_text, chunk_starts, chunk_ends), (start, end)) in enumerate(zip(chunk_words, bounds)):
+        keep_from = (start + bounds[k - 1][1]) / 2.0 / sample_rate if k > 0 else -np.inf
+        keep_to = (end + bounds[k + 1][0]) / 2.0 / sample_rate if k + 1 < len(bounds) else np.inf
+        midpoints = (chunk_starts + chunk_ends) / 2.0
+        keep = np.flatnonzero((midpoints >= keep_from) & (midpoints < keep_to))
+        words.extend(chunk_text[i] for i in keep)
+        starts.append(chunk_starts[keep])
+        ends.append(chunk_ends[keep])
+    if not starts:
+        return [], np.empty(0), np.empty(0)
+    return words, np.concatenate(starts), np.concatenate(ends)
+
+
+def assign_words_to_turns(word_starts, word_ends, turn_starts, turn_ends):
+    """Index of the speaker turn for every word, by word midpoint.
+
+    Turns must be sorted and non-overlapping. Words falling into a gap between turns go
+    to whichever neighbouring turn is closer.
+    """
+    midpoints = (np.asarray(word_starts) + np.asarray(word_ends)) / 2.0
+    turn_index = np.searchsorted(turn_starts, midpoints, side="right") - 1
+    turn_index = np.clip(turn_index, 0, len(turn_starts) - 1)
+
+    in_gap = midpoints > turn_ends[turn_index]
+    next_index = np.minimum(turn_index + 1, len(turn_starts) - 1)
+    closer_to_next = (turn_starts[next_index] - midpoints) < (midpoints - turn_ends[turn_index])
+    return np.where(in_gap & closer_to_next, next_index, turn_index)
+
+
+def words_to_segments(speakers, turn_starts, turn_ends, words, word_starts, word_ends):
+    """Build review-page segments from speaker turns and time-stamped words.
+
+    Consecutive words spoken by the same speaker form one segment; turns that received
+    no words are dropped.
+    """
+    if speakers.size == 0 or not words:
+        return []
+    turn_index = assign_words_to_turns(word_starts, word_ends, turn_starts, turn_ends)
+    word_speakers = speakers[turn_index]
+    boundaries = np.flatnonzero(np.diff(word_speakers)) + 1
+    first_word = np.concatenate(([0], boundaries))
+    last_word = np.concatenate((boundaries, [len(words)])) - 1
+
+    names = speaker_names(word_speakers[first_word])
+    segments = []
+    for first, last in zip(first_word, last_word):
+        segments.append({
+            "speaker": names[int(word_speakers[first])],
+            "start_time": round(float(min(turn_starts[turn_index[first]], word_starts[first])), 2),
+            "end_time": round(float(max(turn_ends[turn_index[last]], word_ends[last])), 2),
+            "text": " ".join(words[first:last + 1])
+        })
+    return segments
@@ -0,0 +1,180 @@
+# Windowed transcription for long recordings.
+# The waveform is cut into fixed-length chunks that overlap by a few seconds, the chunks
+# are decoded in small batches, and the per-chunk hypotheses are stitched back together
+# with the words repeated in the overlap removed. Only `batch_size` chunks are ever
+# resident on the device, so peak memory does not grow with meeting length.
+
+import sys
+
+DEFAULT_CHUNK_SECONDS = 30.0
+DEFAULT_OVERLAP_SECONDS = 2.0
+DEFAULT_BATCH_SIZE = 4
+
+
+def chunk_bounds(num_samples, chunk_samples, overlap_samples):
+    """Return (start, end) sample ranges covering the signal with the given overlap."""
+    if overlap_samples >= chunk_samples:
+        raise ValueError("Chunk overlap must be shorter than the chunk itself")
+    step = chunk_samples - overlap_samples
+    starts = range(0, max(num_samples - overlap_samples, 1), step)
+    return [(start, min(start + chunk_samples, num_samples)) for start in starts]
+
+
+def _merge_words(left, right, max_overlap_words, min_match_words=2):
+    # Find the longest run of words shared by the tail of `left` and the head of `right`.
+    # Chunk edges are often mis-recognised, so the match does not have to sit exactly at
+    # either boundary; everything after it in `left` and before it in `right` is dropped.
+    tail = left[-max_overlap_words:]
+    head = right[:max_overlap_words]
+    best_len, best_tail_end, best_head_end = 0, 0, 0
+    previous = [0] * (len(head) + 1)
+    for i in range(1, len(tail) + 1):
+        current = [0] * (len(head) + 1)
+        for j in range(1, len(head) + 1):
+            if tail[i - 1] == head[j - 1]:
+                current[j] = previous[j - 1] + 1
+                if current[j] > best_len:
+                    best_len, best_tail_end, best_head_end = current[j], i, j
+        previous = current
+
+    # A single shared word ("the", "and") is as likely to be coincidence as overlap
+    if best_len < min(min_match_words, len(tail), len(head)) or best_len == 0:
+        return left + right
+    cut_left = len(left) - len(tail) + best_tail_end
+    return left[:cut_left] + right[best_head_end:]
+
+
+def stitch_hypotheses(hypotheses, max_overlap_words=12):
+    """Join per-chunk transcripts, de-duplicating the words decoded twice in each overlap."""
+    words = []
+    for hypothesis in hypotheses:
+        chunk_words = hypothesis.split()
+        words = _merge_words(words, chunk_words, max_overlap_words) if words else chunk_words
+    return " ".join(words)
+
+
+def _decode_with_word_times(asr_model, batch, wav_lens, batch_bounds, sample_rate, encoder=None):
+    # Run the encoder once, decode text with the attention decoder and force-align the
+    # decoded tokens against the CTC head for per-word times (absolute, in seconds)
+    from alignment import ctc_emissions, ctc_forced_align, tokens_to_words
+
+    log_probs, encoder_out = ctc_emissions(asr_model, batch, wav_lens, encoder)
+    predicted_tokens = asr_model.mods.decoder(encoder_out, wav_lens)[0]
+    blank_id = getattr(asr_model.hparams, "blank_index", 0)
+
+    texts, timed_words = [], []
+    for row, (start, end) in enumerate(batch_bounds):
+        tokens = [int(token) for token in predicted_tokens[row]]
+        texts.append(asr_model.tokenizer.decode_ids(tokens) if tokens else "")
+        valid_frames = max(1, int(round(float(wav_lens[row]) * log_probs.shape[1])))
+        frame_shift = (end - start) / sample_rate / valid_frames
+        token_starts, token_ends = ctc_forced_align(
+            log_probs[row, :valid_frames].float().cpu().numpy(), tokens, blank_id
+        )
+        pieces = [asr_model.tokenizer.id_to_piece(token) for token in tokens]
+        words, word_starts, word_ends = tokens_to_words(pieces, token_starts, token_ends)
+        offset = start / sample_rate
+        timed_words.append((words, offset + word_starts * frame_shift, offset + word_ends * frame_shift))
+    return texts, timed_words
+
+
+def _transcribe_batch(asr_model, batch, wav_lens, encoder=None):
+    if encoder is None:
+        return asr_model.transcribe_batch(batch, wav_lens)[0]
+    # Same as EncoderDecoderASR.transcribe_batch, with the encoder run by the backend
+    predicted_tokens = asr_model.mods.decoder(encoder(batch, wav_lens), wav_lens)[0]
+    return [asr_model.tokenizer.decode_ids([int(token) for token in tokens]) if len(tokens) else ""
+            for tokens in predicted_tokens]
+
+
+def _decode_batch(asr_model, signal, batch_bounds, sample_rate, device, word_timestamps, encoder):
+    # Returns (hypotheses, per-chunk timed words); the timed words are None when they were
+    # not requested or word alignment is unavailable for this model
+    import torch
+
+    max_len = max(end - start for start, end in batch_bounds)
+    batch = torch.zeros(len(batch_bounds), max_len)
+    for row, (start, end) in enumerate(batch_bounds):
+        batch[row, :end - start] = signal[start:end]
+    # SpeechBrain expects lengths relative to the longest item in the batch
+    wav_lens = torch.tensor([(end - start) / max_len for start, end in batch_bounds])
+    batch, wav_lens = batch.to(device), wav_lens.to(device)
+    with torch.no_grad():
+        if word_timestamps:
+            try:
+                return _decode_with_word_times(asr_model, batch, wav_lens, batch_bounds, sample_rate, encoder)
+            except (AttributeError, ValueError) as e:
+                print(f"Word alignment unavailable: {str(e)}. Continuing without word timestamps.", file=sys.stderr)
+        return _transcribe_batch(asr_model, batch, wav_lens, encoder), None
+
+
+def _save_batch(checkpoint, batch_start, hypotheses, timed_words):
+    checkpoint.put_batch(batch_start, {
+        "hypotheses": hypotheses,
+        "timed_words": None if timed_words is None else [[list(texts), starts.tolist(), ends.tolist()]
+                                                          for texts, starts, ends in timed_words],
+    })
+
+
+def _load_batch(checkpoint, batch_start, batch_len):
+    # (hypotheses, timed words or None) of a batch finished by an earlier run, if any
+    payload = checkpoint.get_batch(batch_start) if checkpoint is not None else None
+    if payload is None or len(payload["hypotheses"]) != batch_len:
+        return None
+    if payload["timed_words"] is None:
+        return payload["hypotheses"], None
+    import numpy as np
+
+    return payload["hypotheses"], [(texts, np.asarray(starts, dtype=np.float64), np.asarray(ends, dtype=np.float64))
+                                   for texts, starts, ends in payload["timed_words"]]
+
+
+def transcribe_chunked(asr_model, waveform, sample_rate=16000, chunk_seconds=DEFAULT_CHUNK_SECONDS,
+                       overlap_seconds=DEFAULT_OVERLAP_SECONDS, batch_size=DEFAULT_BATCH_SIZE, device="cpu",
+                       word_timestamps=False, on_batch=None, encoder=None, checkpoint=None):
+    """Transcribe `waveform` window by window.
+
+    Returns (transcript, timed_words). With `word_timestamps`, timed_words is a
+    (words, start_seconds, end_seconds) triple taken from CTC forced alignment; it is None
+    when timestamps were not requested or the model has no usable CTC head.
+    `on_batch`, if given, is called after every batch with (start_seconds, end_seconds, text)
+    for each decoded chunk so callers can report partial transcripts.
+    `encoder`, if given, is the inference backend that runs the acoustic encoder.
+    `checkpoint`, if given, is a checkpoint.StageCheckpoint: batches saved there by an
+    earlier, interrupted run are reused and every newly decoded batch is saved.
+    """
+    signal = waveform.reshape(-1)
+    chunk_samples = int(chunk_seconds * sample_rate)
+    overlap_samples = int(overlap_seconds * sample_rate)
+    bounds = chunk_bounds(signal.shape[0], chunk_samples, overlap_samples)
+
+    hypotheses, chunk_words = [], []
+    for batch_start in range(0, len(bounds), batch_size):
+        batch_bounds = bounds[batch_start:batch_start + batch_size]
+        saved = _load_batch(checkpoint, batch_start, len(batch_bounds))
+        if saved is not None:
+            predicted_words, batch_words = saved
+        else:
+            predicted_words, batch_words = _decode_batch(
+                asr_model, signal, batch_bounds, sample_rate, device, word_timestamps, encoder
+            )
+            if checkpoint is not None:
+                _save_batch(checkpoint, batch_start, predicted_words, batch_words)
+        if batch_words is None:
+            word_timestamps = False
+        elif word_timestamps:
+            chunk_words.extend(batch_words)
+        hypotheses.extend(predicted_words)
+        if on_batch is not None:
+            on_batch([(start / sample_rate, end / sample_rate, text)
+                      for (start, end), text in zip(batch_bounds, predicted_words)])
+
+    if word_timestamps:
+        from alignment import stitch_timed_words
+
+        words, word_starts, word_ends = stitch_timed_words(chunk_words, bounds, sample_rate)
+        return " ".join(words), (words, word_starts, word_ends)
+
+    # Roughly four words per second is a generous upper bound for the overlapped span
+    max_overlap_words = max(4, int(overlap_seconds * 4) + 2)
+    return stitch_hypotheses(hypotheses, max_overlap_words=max_overlap_words), None
@@ -0,0 +1,238 @@
+# Bounded-memory audio decoding.
+# Recordings are decoded block by block, downmixed and resampled incrementally, and written
+# as mono float32 at the pipeline rate to a scratch file that is then memory-mapped. The
+# later stages read windows from the map, so peak RSS does not grow with recording length.
+# Multi-channel files can also keep each channel as its own scratch track.
+import functools
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+DEFAULT_BLOCK_SECONDS = 30.0
+
+# Containers that carry a video stream; only their audio track is decoded, through ffmpeg
+VIDEO_EXTENSIONS = (".mp4", ".m4v", ".mov", ".mkv", ".webm", ".avi")
+
+# Scratch files go to the system temp dir unless this points somewhere with more room
+SCRATCH_DIR = os.environ.get("AUDIO_PROCESSOR_SCRATCH_DIR") or None
+
+# torchaudio.functional.resample defaults, needed to size the block context
+_LOWPASS_FILTER_WIDTH = 6
+_ROLLOFF = 0.99
+
+
+@functools.lru_cache(maxsize=16)
+def resampler_for(orig_freq, new_freq):
+    # One Resample module per rate pair and process: the sinc kernel is built on first use
+    # and reused by every later block and file (workers see the same few source rates).
+    # The module is read-only in forward, so threads can share it.
+    import torchaudio
+
+    return torchaudio.transforms.Resample(orig_freq=orig_freq, new_freq=new_freq)
+
+
+class ChunkedResampler:
+    """Resample a signal that arrives in blocks.
+
+    Each block is resampled together with enough input on either side that the filter never
+    sees a block edge, so the output matches resampling the whole signal in one call to
+    torchaudio.functional.resample.
+    """
+
+    def __init__(self, orig_freq, new_freq):
+        divisor = math.gcd(orig_freq, new_freq)
+        self.orig_freq = orig_freq
+        self.new_freq = new_freq
+        self._orig_step = orig_freq // divisor
+        self._new_step = new_freq // divisor
+        width = math.ceil(_LOWPASS_FILTER_WIDTH * self._orig_step / (min(self._orig_step, self._new_step) * _ROLLOFF))
+        # Whole resampling periods, so block starts stay on output sample boundaries
+        self._context = self._orig_step * (width // self._orig_step + 2)
+        self._history = np.zeros(self._context, dtype=np.float32)  # zeros match resample's own padding
+        self._pending = np.zeros(0, dtype=np.float32)
+
+    def _resample(self, segment, start, length):
+        import torch
+
+        with torch.no_grad():
+            out = resampler_for(self.orig_freq, self.new_freq)(torch.from_numpy(segment))
+        return out.numpy()[start:start + length]
+
+    def process(self, block):
+        self._pending = np.concatenate((self._pending, np.asarray(block, dtype=np.float32)))
+        # Only input followed by a full context of lookahead can be finalised
+        ready = (self._pending.shape[0] - self._context) // self._orig_step * self._orig_step
+        if ready <= 0:
+            return np.zeros(0, dtype=np.float32)
+        segment = np.concatenate((self._history, self._pending[:ready + self._context]))
+        out = self._resample(segment, self._context // self._orig_step * self._new_step,
+                             ready // self._orig_step * self._new_step)
+        self._history = np.concatenate((self._history, self._pending[:ready]))[-self._context:]
+        self._pending = self._pending[ready:]
+        return out
+
+    def flush(self):
+        remaining = self._pending.shape[0]
+        if remaining == 0:
+            return np.zeros(0, dtype=np.float32)
+        segment = np.concatenate((self._history, self._pending))
+        self._pending = np.zeros(0, dtype=np.float32)
+        return self._resample(segment, self._context // self._orig_step * self._new_step,
+                              math.ceil(remaining * self.new_freq / self.orig_freq))
+
+
+class ScratchBuffer:
+    """Append-only float32 scratch file, memory-mapped once it is complete."""
+
+    def __init__(self, scratch_dir=SCRATCH_DIR):
+        fd, self.path = tempfile.mkstemp(prefix="audio-", suffix=".f32", dir=scratch_dir)
+        self._file = os.fdopen(fd, "wb")
+        self.num_samples = 0
+
+    def write(self, samples):
+        samples = np.ascontiguousarray(samples, dtype=np.float32)
+        samples.tofile(self._file)
+        self.num_samples += samples.shape[0]
+
+    def finish(self):
+        self._file.close()
+        try:
+            if self.num_samples == 0:
+                return np.zeros(0, dtype=np.float32)
+            # Copy-on-write so in-place tensor ops never touch the file
+            return np.memmap(self.path, dtype=np.float32, mode="c", shape=(self.num_samples,))
+        finally:
+            # The mapping keeps the data alive on POSIX, so the name can go now and nothing
+            # is left behind; Windows refuses while mapped and the temp dir cleans it up later
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+
+def ffmpeg_blocks(audio_file_path, sample_rate=16000, block_seconds=DEFAULT_BLOCK_SECONDS):
+    """Yield (frames, 1) float32 blocks of the audio track, decoded and resampled by ffmpeg.
+
+    ffmpeg skips the video stream (-vn) and writes raw mono PCM at `sample_rate` to a pipe,
+    so no intermediate file is written and the pipeline does no resampling of its own.
+    """
+    command = ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", audio_file_path,
+               "-vn", "-ac", "1", "-ar", str(sample_rate), "-f", "f32le", "-"]
+    block_bytes = int(block_seconds * sample_rate) * 4
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr)
+        try:
+            leftover = b""
+            while True:
+                data = process.stdout.read(block_bytes)
+                if not data:
+                    break
+                data = leftover + data
+                usable = len(data) - len(data) % 4
+                leftover = data[usable:]
+                if usable:
+                    yield np.frombuffer(data[:usable], dtype=np.float32).reshape(-1, 1)
+            if process.wait() != 0:
+                stderr.seek(0)
+                message = stderr.read().decode("utf-8", "replace").strip()
+                raise RuntimeError(f"ffmpeg could not decode {os.path.basename(audio_file_path)}: {message}")
+        finally:
+            if process.poll() is None:  # consumer stopped early
+                process.kill()
+                process.wait()
+            process.stdout.close()
+
+
+def open_audio_blocks(audio_file_path, sample_rate=16000, block_seconds=DEFAULT_BLOCK_SECONDS):
+    """Return (source_rate, blocks), where blocks yields (frames, channels) float32 arrays.
+
+    Video containers go straight to ffmpeg, which already delivers mono audio at
+    `sample_rate`. Audio files are read with soundfile at their own rate, falling back to
+    ffmpeg for formats libsndfile cannot open and to torchaudio when there is no ffmpeg.
+    """
+    has_ffmpeg = shutil.which("ffmpeg") is not None
+    if has_ffmpeg and audio_file_path.lower().endswith(VIDEO_EXTENSIONS):
+        return sample_rate, ffmpeg_blocks(audio_file_path, sample_rate, block_seconds)
+
+    try:
+        import soundfile
+    except ImportError:
+        soundfile = None
+
+    if soundfile is not None:
+        try:
+            sound_file = soundfile.SoundFile(audio_file_path)
+        except RuntimeError:  # format libsndfile cannot read
+            sound_file = None
+        if sound_file is not None:
+            def blocks():
+                with sound_file:
+                    yield from sound_file.blocks(blocksize=int(block_seconds * sound_file.samplerate),
+                                                 dtype="float32", always_2d=True)
+            return sound_file.samplerate, blocks()
+
+    if has_ffmpeg:
+        return sample_rate, ffmpeg_blocks(audio_file_path, sample_rate, block_seconds)
+
+    # No block decoder for this file: fall back to decoding it in one piece
+    print(f"Decoding {os.path.basename(audio_file_path)} in one piece (no soundfile or ffmpeg decoder available)",
+          file=sys.stderr)
+    import torchaudio
+
+    waveform, source_rate = torchaudio.load(audio_file_path)
+    return source_rate, iter([waveform.numpy().T])
+
+
+def decode_to_scratch(audio_file_path, sample_rate=16000, block_seconds=DEFAULT_BLOCK_SECONDS,
+                      scratch_dir=SCRATCH_DIR):
+    """Decode a file to a 1-D memory-mapped float32 array of mono audio at `sample_rate`."""
+    signal, _ = decode_tracks_to_scratch(audio_file_path, sample_rate, block_seconds, scratch_dir, max_tracks=0)
+    return signal
+
+
+def decode_tracks_to_scratch(audio_file_path, sample_rate=16000, block_seconds=DEFAULT_BLOCK_SECONDS,
+                             scratch_dir=SCRATCH_DIR, max_tracks=8):
+    """Decode a file to its mono downmix plus one memory-mapped array per channel.
+
+    Returns (mono, tracks). `tracks` is empty for single-channel sources, for sources with
+    more than `max_tracks` channels and for video containers, which ffmpeg downmixes.
+    """
+    source_rate, blocks = open_audio_blocks(audio_file_path, sample_rate, block_seconds)
+    make_resampler = (lambda: ChunkedResampler(source_rate, sample_rate)) if source_rate != sample_rate else None
+    resampler = make_resampler() if make_resampler is not None else None
+    scratch = ScratchBuffer(scratch_dir)
+    track_scratches, track_resamplers = [], []
+    try:
+        for block in blocks:
+            mono = block.mean(axis=1, dtype=np.float32) if block.shape[1] > 1 else block[:, 0]
+            scratch.write(resampler.process(mono) if resampler is not None else mono)
+            if not track_scratches and 1 < block.shape[1] <= max_tracks:
+                track_scratches = [ScratchBuffer(scratch_dir) for _ in range(block.shape[1])]
+                track_resamplers = [make_resampler() if make_resampler is not None else None for _ in track_scratches]
+            for channel, (track, track_resampler) in enumerate(zip(track_scratches, track_resamplers)):
+                samples = block[:, channel]
+                track.write(track_resampler.process(samples) if track_resampler is not None else samples)
+        if resampler is not None:
+            scratch.write(resampler.flush())
+            for track, track_resampler in zip(track_scratches, track_resamplers):
+                track.write(track_resampler.flush())
+    finally:
+        signal = scratch.finish()
+        tracks = [track.finish() for track in track_scratches]
+    return signal, tracks
+
+
+def gather_regions(signal, regions, scratch_dir=SCRATCH_DIR):
+    """Concatenate [start, end) sample ranges of `signal` into a new memory-mapped array."""
+    scratch = ScratchBuffer(scratch_dir)
+    try:
+        for start, end in regions:
+            scratch.write(signal[start:end])
+    finally:
+        gathered = scratch.finish()
+    return gathered
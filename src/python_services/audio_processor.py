@@ -1,210 +1,408 @@
 # Save this code as audio_processor.py
+# Entry point of the audio pipeline. Only the standard library and the light sibling
+# modules are imported at the top, so `--help`, argument errors and result-cache hits
+# return without loading torch, torchaudio, NumPy or SpeechBrain; process_audio imports
+# them once a model is actually needed.
 import argparse
+import functools
 import json
 import os
 import sys
-import tempfile
 import warnings
 
 # Suppress Hugging Face and other warnings for cleaner output in a production-like script
 warnings.filterwarnings("ignore")
 os.environ["HF_HUB_DISABLE_PROGRESS_BARS"] = "1"
-os.environ["TRANSFORMERS_OFFLINE"] = "0" # Ensure online mode for model downloads if not cached
-
-# Add a try-except block for SpeechBrain import to provide a clearer error if it's not installed
-try:
-    from speechbrain.pretrained import EncoderClassifier, SpeakerDiarization, EncoderDecoderASR
-    from speechbrain.dataio.dataio import read_audio_info, read_audio
-    import torchaudio
-    import torch
-except ImportError as e:
-    print(f"Error: A required library is not installed. Please ensure SpeechBrain, PyTorch, and Torchaudio are correctly installed. Details: {e}", file=sys.stderr)
-    sys.exit(1)
-
-def process_audio(audio_file_path, language="auto", output_sample_rate=16000):
-    # 1. Load audio and resample if necessary
+
+from asr_chunking import DEFAULT_CHUNK_SECONDS, DEFAULT_OVERLAP_SECONDS
+from language_id import DEFAULT_EXCERPT_SECONDS, DEFAULT_NUM_EXCERPTS
+from model_store import (ASR_MEMORY_MB_ENV, DEFAULT_MAX_ASR_MODELS, MAX_ASR_MODELS_ENV, ModelStore,
+                         asr_source_for_language, model_sources_for)
+from model_bundle import backend_unavailable_error, bundle_missing_error, use_offline_bundle, warm_up, main as bundle_main
+from events import NO_EVENTS, EventEmitter
+from profiling import StageProfiler, pipeline_stage
+from quantization import QUANTIZE_MODES
+from inference_backends import BACKENDS
+from checkpoint import DEFAULT_WORK_DIR
+from result_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, ResultCache, hash_file, result_id, result_key
+
+# Jobs only ever load models from the local bundle (`prefetch` is the one online step)
+use_offline_bundle()
+
+def job_cache_key(language, output_sample_rate=16000, chunk_seconds=DEFAULT_CHUNK_SECONDS,
+                  chunk_overlap_seconds=DEFAULT_OVERLAP_SECONDS, vad=True, lid_excerpts=DEFAULT_NUM_EXCERPTS,
+                  lid_excerpt_seconds=DEFAULT_EXCERPT_SECONDS, quantize=None, backend="torch", channel_split=True,
+                  speaker_check=True, voiceprints=True):
+    # Every option that can change the result; scheduling options (threads, concurrency) are left out
+    return result_key(language, model_sources_for(language), {
+        "sample_rate": output_sample_rate, "chunk_seconds": chunk_seconds,
+        "chunk_overlap_seconds": chunk_overlap_seconds, "vad": vad,
+        "lid_excerpts": lid_excerpts, "lid_excerpt_seconds": lid_excerpt_seconds,
+        "quantize": quantize, "backend": backend, "channel_split": channel_split,
+        "speaker_check": speaker_check, "voiceprints": voiceprints,
+    })
+
+def suggest_speaker_names(result, enrollment_dir):
+    # Names from the enrollment index are looked up on every run, cached or not, since
+    # speakers may have been enrolled after the result was cached
+    if "error" in result or not result.get("speaker_embeddings"):
+        return result
+    try:
+        from speaker_enrollment import SpeakerIndex
+
+        return {**result, "speaker_names": SpeakerIndex(enrollment_dir).suggest_names(result["speaker_embeddings"])}
+    except Exception as e:
+        print(f"Speaker name lookup failed: {str(e)}", file=sys.stderr)
+        return result
+
+def process_audio(audio_file_path, language="auto", output_sample_rate=16000, models=None,
+                  chunk_seconds=DEFAULT_CHUNK_SECONDS, chunk_overlap_seconds=DEFAULT_OVERLAP_SECONDS, vad=True,
+                  lid_excerpts=DEFAULT_NUM_EXCERPTS, lid_excerpt_seconds=DEFAULT_EXCERPT_SECONDS, cache=None, events=NO_EVENTS,
+                  profiler=None, concurrent_stages=True, quantize=None, backend="torch", enrollment_dir=None,
+                  channel_split=True, speaker_check=True, voiceprints=True, work_dir=None, resume=False):
+    # `models` lets a long-running worker pass in a ModelStore whose models are already loaded.
+    # `cache` is an optional ResultCache; it is consulted before torch is even imported.
+    # `events` is an EventEmitter that reports stage progress and partial transcripts.
+    # `profiler` is an optional StageProfiler; its per-stage report is added as "profile".
+    # `concurrent_stages` runs speaker-embedding extraction alongside ASR decoding.
+    # `quantize` ("int8") applies dynamic quantization to the ASR and speaker models.
+    # `backend` ("torch" or "onnx") selects the inference backend of the ASR encoder.
+    # `enrollment_dir` is a speaker enrollment index used to pre-fill "speaker_names".
+    # `channel_split` lets multi-track recordings with one speaker per channel skip diarization.
+    # `speaker_check` skips full embedding extraction and clustering when sampled windows agree.
+    # `voiceprints` keeps the per-speaker embeddings ("speaker_embeddings") in the result.
+    # `work_dir` keeps per-batch checkpoints of the job; `resume` reuses those of an earlier run.
+    stage = functools.partial(pipeline_stage, events, profiler)
+
+    audio_hash = cache_key = None
+    if cache is not None:
+        with stage("cache_lookup"):
+            audio_hash = hash_file(audio_file_path)
+            cache_key = job_cache_key(language, output_sample_rate, chunk_seconds, chunk_overlap_seconds, vad,
+                                      lid_excerpts, lid_excerpt_seconds, quantize, backend, channel_split,
+                                      speaker_check, voiceprints)
+            cached_result = cache.get_result(audio_hash, cache_key)
+        if cached_result is not None:
+            print(f"Using cached result for {os.path.basename(audio_file_path)}", file=sys.stderr)
+            events.emit("cache-hit")
+            if enrollment_dir:
+                cached_result = suggest_speaker_names(cached_result, enrollment_dir)
+                cached_result["result_id"] = result_id(audio_hash, cache_key)
+            if profiler is not None:
+                return {**cached_result, "profile": profiler.report()}
+            return cached_result
+
+    if models is None:
+        bundle_error = bundle_missing_error() or backend_unavailable_error(backend)
+        if bundle_error:
+            return {"error": bundle_error}
+
+    # Checkpoints are keyed like cache entries, so a resumed job only reuses work done
+    # on the same audio with the same options
+    if work_dir and audio_hash is None:
+        audio_hash = hash_file(audio_file_path)
+        cache_key = job_cache_key(language, output_sample_rate, chunk_seconds, chunk_overlap_seconds, vad,
+                                  lid_excerpts, lid_excerpt_seconds, quantize, backend, channel_split,
+                                  speaker_check, voiceprints)
+
+    # Provide a clearer error if SpeechBrain, PyTorch or Torchaudio is not installed
+    try:
+        import torch
+        from audio_io import decode_tracks_to_scratch, gather_regions
+        from asr_chunking import transcribe_chunked
+        from diarization import (SINGLE_SPEAKER_MIN_SIMILARITY, diarize_embeddings, embed_sampled_windows,
+                                 embed_windows, labels_to_turns, single_speaker_frames, speaker_centroids,
+                                 speaker_names, split_similarity, turns_to_segments)
+        from alignment import assign_words_to_turns, words_to_segments
+        from vad import SpeechTimeline, detect_speech_regions
+        from channels import analyze_channels, channel_segments, turn_units
+        from checkpoint import JobCheckpoint
+        from language_id import identify_language
+        from stage_scheduler import run_stages
+        if models is None:
+            models = ModelStore(quantize=quantize, backend=backend)
+    except ImportError as e:
+        return {"error": f"A required library is not installed. Please ensure SpeechBrain, PyTorch, and Torchaudio are correctly installed. Details: {e}"}
+
+    checkpoint = None
+    if work_dir:
+        checkpoint = JobCheckpoint(work_dir, audio_hash, cache_key, resume=resume)
+        if resume:
+            print(f"Resuming from {checkpoint.path}: {json.dumps(checkpoint.completed_batches())} batches done",
+                  file=sys.stderr)
+
+    # 1. Decode, downmix and resample block by block into a memory-mapped scratch buffer,
+    # so peak memory does not depend on the length of the recording
     try:
-        waveform, sample_rate = torchaudio.load(audio_file_path)
-        if waveform.ndim > 1 and waveform.shape[0] > 1: # Check if stereo
-            waveform = torch.mean(waveform, dim=0, keepdim=True) # Convert to mono by averaging channels
-        if sample_rate != output_sample_rate:
-            resampler = torchaudio.transforms.Resample(orig_freq=sample_rate, new_freq=output_sample_rate)
-            waveform = resampler(waveform)
+        with stage("load"):
+            signal, tracks = decode_tracks_to_scratch(audio_file_path, output_sample_rate,
+                                                      max_tracks=8 if channel_split else 0)
+            waveform = torch.from_numpy(signal).unsqueeze(0)
         input_duration_seconds = waveform.shape[1] / output_sample_rate
     except Exception as e:
         return {"error": f"Failed to load or preprocess audio: {str(e)}"}
+    if profiler is not None:
+        profiler.audio_seconds = input_duration_seconds
 
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    # 1a. Multi-track recordings with one speaker per channel are recognised from channel
+    # energies; their speakers are the channels, so diarization is not needed
+    channel_layout = None
+    if tracks:
+        with stage("channel_analysis"):
+            try:
+                channel_layout = analyze_channels(tracks, output_sample_rate)
+            except Exception as e:
+                print(f"Channel analysis failed: {str(e)}. Diarizing the downmix.", file=sys.stderr)
+        if channel_layout is not None:
+            print(f"One speaker per channel on channels {[c + 1 for c in channel_layout.speaking_channels]}; "
+                  "skipping diarization.", file=sys.stderr)
+
+    # 1b. Voice activity detection - only voiced spans are sent to LID, ASR and diarization.
+    # Times produced on the condensed timeline are mapped back through `timeline`.
+    timeline = None
+    if vad:
+        with stage("vad"):
+            try:
+                regions = cache.get_artifact(audio_hash, "vad_regions") if cache is not None else None
+                if regions is None and checkpoint is not None:
+                    regions = checkpoint.get_array("vad_regions")
+                if regions is None:
+                    regions = detect_speech_regions(waveform[0].numpy(), output_sample_rate)
+                    if cache is not None:
+                        cache.put_artifact(audio_hash, "vad_regions", regions)
+                    if checkpoint is not None:
+                        checkpoint.put_array("vad_regions", regions)
+                if regions.shape[0]:
+                    timeline = SpeechTimeline(regions, output_sample_rate)
+                    waveform = torch.from_numpy(gather_regions(waveform[0].numpy(), regions)).unsqueeze(0)
+                    print(f"VAD kept {timeline.speech_seconds:.1f}s of {input_duration_seconds:.1f}s of audio", file=sys.stderr)
+                else:
+                    print("VAD found no speech, processing the full recording.", file=sys.stderr)
+            except Exception as e:
+                print(f"Voice activity detection failed: {str(e)}. Processing the full recording.", file=sys.stderr)
+
+    device = models.device
 
     # 2. Language Identification (LID) - Skip if language is specified
+    # `degraded` marks results built on a fallback after a failure that may be temporary
+    # (out of memory, a model that failed to load); they are returned but never cached
+    degraded = False
     detected_language = language
     if language == "auto":
-        try:
-            language_id = EncoderClassifier.from_hparams(
-                source="speechbrain/lang-id-commonlanguage_ecapa", 
-                savedir="pretrained_models/lang-id-commonlanguage_ecapa"
-            )
-            language_id.to(device)
-            waveform_lid = waveform.to(device) # Ensure waveform is on the correct device
-            out_prob = language_id.classify_batch(waveform_lid)
-            scores = out_prob[0]
-            predicted_index = torch.argmax(scores)
-            detected_language = language_id.hparams.label_encoder.decode_torch(predicted_index.unsqueeze(0))[0]
-        except Exception as e:
-            # Log language detection failure but proceed with a default (e.g., English)
-            print(f"Language detection failed: {str(e)}. Defaulting to English.", file=sys.stderr)
-            detected_language = "en"  # Default to English if auto-detection fails
+        with stage("language_id"):
+            try:
+                # Classify a few voiced excerpts as one batch and vote, so LID cost does not grow
+                # with meeting length (lid_excerpts=0 classifies the whole recording instead)
+                detected_language = identify_language(
+                    models.language_id(), waveform, output_sample_rate,
+                    num_excerpts=lid_excerpts, excerpt_seconds=lid_excerpt_seconds, device=device
+                )
+            except Exception as e:
+                # Log language detection failure but proceed with a default (e.g., English)
+                print(f"Language detection failed: {str(e)}. Defaulting to English.", file=sys.stderr)
+                detected_language = "en"  # Default to English if auto-detection fails
+                degraded = True
+        events.emit("language", language=detected_language)
     else:
         print(f"Using specified language: {language}", file=sys.stderr)
 
+    # Both the per-channel and the diarization path end here: emit the segments, cache the
+    # result unless it is degraded, then add suggested speaker names and the profile
+    def finish(full_transcript, speaker_segments, speaker_embeddings):
+        for segment in speaker_segments:
+            events.emit("segment", segment=segment)
+
+        result = {
+            "language": detected_language,
+            "duration_seconds": round(input_duration_seconds, 2),
+            "segments": speaker_segments,
+            "speaker_embeddings": speaker_embeddings,
+            "full_transcript_debug": full_transcript # For debugging, can be removed later
+        }
+        if not voiceprints:
+            # Speaker embeddings are biometric data; without them nothing can be enrolled
+            del result["speaker_embeddings"]
+        cached = False
+        if cache is not None and not degraded:
+            try:
+                cache.put_result(audio_hash, cache_key, result)
+                cached = True
+            except OSError as e:
+                print(f"Could not write result cache: {str(e)}", file=sys.stderr)
+        if checkpoint is not None:
+            checkpoint.finish()
+        if enrollment_dir:
+            result = suggest_speaker_names(result, enrollment_dir)
+            if cached:
+                # Lets the app enroll the speakers from the cached result (`enroll --result-id`)
+                result = {**result, "result_id": result_id(audio_hash, cache_key)}
+        if profiler is not None:
+            result["profile"] = profiler.report()
+        return result
+
     # 3. Automatic Speech Recognition (ASR)
     # Choose model based on detected or specified language
-    asr_model_source = "speechbrain/asr-wav2vec2-commonvoice-en"  # Default English model
-    
-    # Map language codes to appropriate ASR models
-    language_model_map = {
-        "en": "speechbrain/asr-wav2vec2-commonvoice-en",
-        "ko": "speechbrain/asr-wav2vec2-commonvoice-en",  # Replace with Korean model when available
-        "ja": "speechbrain/asr-wav2vec2-commonvoice-en",  # Replace with Japanese model when available
-        "zh": "speechbrain/asr-wav2vec2-commonvoice-en",  # Replace with Chinese model when available
-        # Add more language-specific models as needed
-    }
-    
-    # Select the appropriate model based on detected language
-    if detected_language in language_model_map:
-        asr_model_source = language_model_map[detected_language]
-    else:
-        print(f"No specific model for {detected_language}, using default English model", file=sys.stderr)
-    
+    asr_model_source = asr_source_for_language(detected_language)
+
+    if channel_layout is not None:
+        # 3/4. Per-channel fast path: every channel is transcribed on its own, in parallel, over
+        # the spans where it carries its own speech rather than bleed from the other mics.
+        # The model is resolved once up front so the channel threads never load it concurrently.
+        try:
+            asr_model, asr_encoder = models.asr(asr_model_source), models.asr_encoder(asr_model_source)
+        except Exception as e:
+            return {"error": f"Transcription failed: {str(e)}", "language": detected_language}
+
+        def transcribe_channel(channel):
+            def run():
+                with stage(f"asr_channel_{channel + 1}", model=asr_model_source):
+                    track = tracks[channel]
+                    regions = channel_layout.channel_regions(channel, track.shape[0])
+                    if regions.shape[0] == 0:
+                        return "", None
+                    channel_timeline = SpeechTimeline(regions, output_sample_rate)
+                    speech = torch.from_numpy(gather_regions(track, regions)).unsqueeze(0)
+                    transcript, words = transcribe_chunked(
+                        asr_model, speech, output_sample_rate,
+                        chunk_seconds=chunk_seconds, overlap_seconds=chunk_overlap_seconds, device=device,
+                        word_timestamps=True, encoder=asr_encoder,
+                        checkpoint=checkpoint.stage(f"asr_channel_{channel + 1}") if checkpoint is not None else None
+                    )
+                    if words is not None:
+                        words = (words[0], channel_timeline.to_original(words[1]),
+                                 channel_timeline.to_original(words[2], ends=True))
+                    return transcript, words
+            return run
+
+        channels = channel_layout.speaking_channels
+        futures = run_stages([transcribe_channel(channel) for channel in channels], concurrent=concurrent_stages)
+        try:
+            channel_results = [future.result() for future in futures]
+        except Exception as e:
+            return {"error": f"Transcription failed: {str(e)}", "language": detected_language}
+
+        with stage("segments"):
+            turn_speakers, turn_starts, turn_ends = labels_to_turns(channel_layout.frame_labels(),
+                                                                    channel_layout.frame_shift)
+            channel_units = {}
+            for channel, (transcript, words) in zip(channels, channel_results):
+                if words is None:
+                    own_turns = turn_speakers == channel
+                    words = turn_units(transcript, turn_starts[own_turns], turn_ends[own_turns])
+                channel_units[channel] = words
+            speaker_segments = channel_segments(channel_units)
+        full_transcript = " ".join(segment["text"] for segment in speaker_segments)
+        if not speaker_segments:
+            speaker_segments = [{"speaker": "Speaker 1", "start_time": 0, "end_time": round(input_duration_seconds, 2), "text": ""}]
+        return finish(full_transcript, speaker_segments, {})
+
+    def report_partial_transcript(chunks):
+        # Partial transcripts are reported on the original timeline as each batch finishes
+        for start, end, text in chunks:
+            if timeline is not None:
+                start, end = float(timeline.to_original(start)), float(timeline.to_original(end, ends=True))
+            events.emit("partial-transcript", start_time=round(start, 2), end_time=round(end, 2), text=text)
+
+    def run_asr():
+        with stage("asr", model=asr_model_source):
+            asr_model = models.asr(asr_model_source)
+            # Decode fixed-length overlapping windows in batches so memory stays flat on long meetings
+            # and force-align the decoded tokens to the CTC emissions for per-word timestamps
+            return transcribe_chunked(
+                asr_model, waveform, output_sample_rate,
+                chunk_seconds=chunk_seconds, overlap_seconds=chunk_overlap_seconds, device=device,
+                word_timestamps=True, on_batch=report_partial_transcript if events.enabled else None,
+                encoder=models.asr_encoder(asr_model_source),
+                checkpoint=checkpoint.stage("asr") if checkpoint is not None else None
+            )
+
+    # 4. Speaker Diarization
+    # Speaker embeddings are taken straight from the in-memory waveform and clustered into
+    # frame-level speaker labels, which are run-length encoded into (speaker, start, end)
+    # turns. Time-stamped words are then placed onto those turns; without word timestamps
+    # the transcript is spread over the turns by duration.
+    # run_speaker_embeddings returns (embeddings, single_speaker).
+    def run_speaker_embeddings():
+        embeddings_name = "speaker_embeddings" if timeline is not None else "speaker_embeddings_full"
+        if quantize:
+            embeddings_name += f"_{quantize}"  # a quantized encoder gives different embeddings
+        embeddings = cache.get_artifact(audio_hash, embeddings_name) if cache is not None else None
+        if embeddings is not None:
+            return embeddings, False
+
+        # Dictations and single-presenter recordings: if splitting windows sampled across the
+        # whole recording in two leaves two halves of the same voice, the full embedding pass
+        # and clustering are skipped
+        complete = False
+        if speaker_check:
+            with stage("speaker_check"):
+                embeddings, complete = embed_sampled_windows(models.speaker_encoder(), waveform,
+                                                             output_sample_rate, device=device)
+                similarity = split_similarity(embeddings)
+            if similarity > SINGLE_SPEAKER_MIN_SIMILARITY:
+                print(f"Sampled speaker embeddings agree (split similarity {similarity:.2f}); skipping diarization.",
+                      file=sys.stderr)
+                return embeddings, True
+        with stage("speaker_embeddings"):
+            if not complete:
+                embeddings = embed_windows(models.speaker_encoder(), waveform, output_sample_rate, device=device,
+                                           checkpoint=checkpoint.stage("speaker_embeddings") if checkpoint is not None else None)
+            if cache is not None:
+                cache.put_artifact(audio_hash, embeddings_name, embeddings)
+        return embeddings, False
+
+    # Embedding extraction does not need the transcript, so it runs alongside ASR decoding
+    # with the torch threads split between them; the two join again at alignment
+    asr_future, embeddings_future = run_stages(
+        [run_asr, run_speaker_embeddings], concurrent=concurrent_stages
+    )
+
     full_transcript = ""
     try:
-        asr_model = EncoderDecoderASR.from_hparams(
-            source=asr_model_source, 
-            savedir=f"pretrained_models/{asr_model_source.split('/')[-1]}"
-        )
-        asr_model.to(device)
-        waveform_asr = waveform.to(device) # Ensure waveform is on the correct device
-        # Transcribe the whole audio to get a full transcript for context
-        # Note: For long audio, batching or streaming ASR would be more robust
-        transcription_result = asr_model.transcribe_batch(waveform_asr)
-        full_transcript = transcription_result[0][0] # Get the transcribed text
+        full_transcript, timed_words = asr_future.result()
     except Exception as e:
         return {"error": f"Transcription failed: {str(e)}", "language": detected_language}
+    if timeline is not None and timed_words is not None:
+        words, word_starts, word_ends = timed_words
+        timed_words = (words, timeline.to_original(word_starts), timeline.to_original(word_ends, ends=True))
 
-    # 4. Speaker Diarization
-    # This uses a pre-trained diarization model. It might require specific audio properties.
-    # The output of diarization is typically a list of segments with speaker labels and timestamps.
     speaker_segments = []
+    speaker_embeddings = {}
     try:
-        # Using a more complete diarization pipeline from SpeechBrain
-        # This model performs VAD, speaker embeddings, and clustering.
-        diarization_model = SpeakerDiarization.from_hparams(
-            source="speechbrain/spkrec-ecapa-voxceleb", # Base model for embeddings
-            savedir="pretrained_models/spkrec-ecapa-voxceleb",
-            run_opts={"device": str(device)} # Ensure model runs on the correct device
-        )
-        # The diarize_file method expects a file path. We can save the processed waveform to a temp file.
-        # Or, if the model supports waveform input directly, that's preferable.
-        # For SpeechBrain's SpeakerDiarization, it often works with file paths or can be adapted.
-        # Let's try to use the waveform directly if possible, or save to a temporary file.
-
-        # Create a temporary WAV file from the processed waveform for the diarizer
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp_audio_file:
-            torchaudio.save(tmp_audio_file.name, waveform, output_sample_rate)
-            tmp_audio_file_path = tmp_audio_file.name
-        
-        # Perform diarization
-        # diarization_model.diarize_file might not be the direct method for all SpeechBrain diarization setups.
-        # Often, it involves calling specific methods for VAD, embeddings, clustering, etc.
-        # The example `diarize_file` is a high-level abstraction that might exist in some pipelines.
-        # For this example, we'll assume a simplified output format or use a placeholder approach
-        # if a direct `diarize_file` method isn't straightforward with this base model.
-
-        # A more robust approach would be to use a dedicated diarization pipeline like:
-        # from speechbrain.pipelines import DiarizationPipeline
-        # pipeline = DiarizationPipeline.from_hparams(source="...", savedir="...")
-        # boundaries = pipeline(tmp_audio_file_path)
-        # However, SpeechBrain's direct diarization pipelines might vary.
-        # For now, we'll simulate a basic segmentation based on the full transcript, 
-        # as robust diarization is complex and model-dependent.
-
-        # Placeholder: If full diarization is too complex for this step, 
-        # we can split the transcript into sentences and assign speakers round-robin or based on VAD.
-        # This is NOT real diarization but a step towards it.
-        # For now, let's assume the diarization model gives us speaker boundaries.
-        # Example output from a diarization model: RTTM-like format or list of (speaker, start, end)
-        # boundaries = diarization_model.diarize_file(tmp_audio_file_path) # This is a conceptual call
-        # The line above is conceptual. Actual SpeechBrain diarization might be more involved.
-        # For example, using `speechbrain.nnet.speaker_verification.diarize_multi_channel` or similar.
-
-        # Let's use the `diarize_file` method which is part of the SpeakerDiarization class
-        # This method performs VAD, speaker embeddings, spectral clustering, and speaker counting.
-        # It returns speaker labels for segments. We need to map these to text.
-        boundaries = diarization_model.diarize_file(tmp_audio_file_path) # This should work with the class
-        # The `boundaries` tensor contains speaker labels for frames. We need to convert this to segments.
-        # This part requires careful processing of the `boundaries` output to create meaningful segments.
-        # Each segment should have a speaker, start_time, end_time, and corresponding text.
-        # This alignment is non-trivial.
-
-        # For now, as a step towards full diarization, let's process the boundaries:
-        # The `boundaries` tensor is (1, num_frames, num_speakers) with probabilities or one-hot labels.
-        # We need to convert this frame-level information into time segments.
-        # This is a simplified interpretation of `boundaries` for demonstration.
-        # A real implementation would need to parse `boundaries` according to the model's specific output format.
-        # (e.g., by finding contiguous blocks of frames for each speaker).
-
-        # Clean up the temporary audio file
-        os.unlink(tmp_audio_file_path)
-
-        # This is a simplified way to create segments from the boundaries. 
-        # A more accurate method would involve looking at changes in speaker labels in the 'boundaries' tensor.
-        # For now, we'll create segments based on the diarization output if it's in a usable format.
-        # The output of `diarize_file` is usually frame-level speaker labels. 
-        # We need to convert this to (speaker, start, end) segments.
-        # This is a complex step. Let's assume `boundaries` gives us segments directly for now, or we use a placeholder.
-
-        # Placeholder for processing `boundaries` into speaker_segments
-        # This part needs to be implemented based on the actual output format of `diarization_model.diarize_file`
-        # For now, we will split the full transcript somewhat arbitrarily if proper diarization is not available.
-        # This is a placeholder and needs to be replaced with actual diarization logic.
-        if boundaries is not None and hasattr(boundaries, 'tolist'): # Check if boundaries are somewhat usable
-            # This is a very simplified interpretation and likely needs refinement
-            # based on the actual structure of `boundaries` from SpeechBrain.
-            # Assuming `boundaries` can be converted to a list of speaker changes or segments.
-            # For now, we'll just use the full transcript and assign speakers based on some logic.
-            # This is a placeholder for actual diarization result processing.
-            # A real diarization would give segments like: [('spk_0', 0.0, 10.5), ('spk_1', 10.5, 15.0), ...]
-            # And then you'd need to map transcript parts to these segments.
-            current_speaker_id = 0
-            num_words = len(full_transcript.split())
-            words_per_segment = max(10, num_words // max(1, boundaries.shape[-1] if boundaries.ndim ==3 else 2)) # Heuristic
-            words = full_transcript.split()
-            current_segment_text = []
-            start_time_approx = 0.0
-            segment_duration_approx = input_duration_seconds / max(1, (num_words / words_per_segment))
-
-            for i, word in enumerate(words):
-                current_segment_text.append(word)
-                if (i + 1) % words_per_segment == 0 or (i + 1) == num_words:
-                    segment_text = " ".join(current_segment_text)
-                    end_time_approx = start_time_approx + segment_duration_approx * (len(current_segment_text) / words_per_segment)
-                    speaker_segments.append({
-                        "speaker": f"Speaker {current_speaker_id + 1}",
-                        "start_time": round(start_time_approx, 2),
-                        "end_time": round(min(end_time_approx, input_duration_seconds), 2),
-                        "text": segment_text
-                    })
-                    current_segment_text = []
-                    start_time_approx = end_time_approx
-                    current_speaker_id = (current_speaker_id + 1) % (boundaries.shape[-1] if boundaries.ndim ==3 else 2) # Cycle through speakers
-            if not speaker_segments: # Fallback if loop didn't run
-                 speaker_segments.append({"speaker": "Speaker 1", "start_time": 0, "end_time": round(input_duration_seconds,2), "text": full_transcript})
-
-        else: # Fallback if diarization fails or boundaries are not usable
-            speaker_segments.append({"speaker": "Speaker 1", "start_time": 0, "end_time": round(input_duration_seconds,2), "text": full_transcript})
+        embeddings, single_speaker = embeddings_future.result()
+        if single_speaker:
+            labels, frame_shift = single_speaker_frames(waveform.shape[1], output_sample_rate)
+        else:
+            with stage("diarization"):
+                labels, frame_shift = diarize_embeddings(embeddings, waveform.shape[1], output_sample_rate)
+
+        with stage("segments"):
+            speakers, starts, ends = labels_to_turns(labels, frame_shift)
+            if speakers.size:
+                if timeline is not None:
+                    starts, ends = timeline.to_original(starts), timeline.to_original(ends, ends=True)
+                if timed_words is not None:
+                    speaker_segments = words_to_segments(speakers, starts, ends, *timed_words)
+                else:
+                    speaker_segments = turns_to_segments(speakers, starts, ends, full_transcript)
+
+                # One centroid per named speaker, so speakers can be enrolled and recognised
+                # in later meetings; names follow the same first-appearance order as the segments
+                if timed_words is not None:
+                    word_turns = assign_words_to_turns(timed_words[1], timed_words[2], starts, ends)
+                    names = speaker_names(speakers[word_turns]) if word_turns.size else {}
+                else:
+                    names = speaker_names(speakers)
+                centroids = speaker_centroids(embeddings, labels)
+                speaker_embeddings = {name: [round(float(v), 5) for v in centroids[speaker]]
+                                      for speaker, name in names.items()}
+
+            if not speaker_segments: # Fallback if diarization found no speech turns
+                speaker_segments.append({"speaker": "Speaker 1", "start_time": 0, "end_time": round(input_duration_seconds,2), "text": full_transcript})
 
     except Exception as e:
         print(f"Speaker diarization failed: {str(e)}. Falling back to single speaker.", file=sys.stderr)
+        degraded = True
         # Fallback to single speaker if diarization fails
         speaker_segments = [
             {
@@ -214,27 +412,163 @@ def process_audio(audio_file_path, language="auto", output_sample_rate=16000):
                 "text": full_transcript
             }
         ]
+    return finish(full_transcript, speaker_segments, speaker_embeddings)
 
-    return {
-        "language": detected_language,
-        "segments": speaker_segments,
-        "full_transcript_debug": full_transcript # For debugging, can be removed later
-    }
+def serve(input_stream=sys.stdin, output_stream=sys.stdout, cache=None, options=None, emit_events=False):
+    # Worker mode: load the models once, then process one job per input line.
+    # A job is either a bare audio path or a JSON object:
+    #   {"id": "job-1", "audio_file": "/path/to/audio.wav", "language": "auto"}
+    # Each result is written back as a single JSON line carrying the job id. With
+    # `emit_events`, progress events for the job precede it and the result itself is
+    # wrapped in a "result" event.
+    models = ModelStore(quantize=(options or {}).get("quantize"), backend=(options or {}).get("backend", "torch"))
+    models.preload()
+    print(f"Audio worker warm-up: {json.dumps(warm_up(models))}", file=sys.stderr)
+    print("Audio worker ready.", file=sys.stderr)
+
+    for line in input_stream:
+        line = line.strip()
+        if not line:
+            continue
+        job, result = {}, None
+        try:
+            job = json.loads(line) if line.startswith("{") else {"audio_file": line}
+        except json.JSONDecodeError as e:
+            result = {"error": f"Invalid job: {str(e)}"}
+        if result is None and (not isinstance(job, dict) or not isinstance(job.get("audio_file"), str)):
+            job = job if isinstance(job, dict) else {}
+            result = {"error": "Invalid job: expected a JSON object with an \"audio_file\" path"}
+        job_events = EventEmitter(output_stream, job.get("id")) if emit_events else NO_EVENTS
+        if result is None:
+            audio_file = job["audio_file"]
+            if not os.path.exists(audio_file):
+                result = {"error": f"Audio file not found: {audio_file}"}
+            else:
+                try:
+                    result = process_audio(audio_file, job.get("language", "auto"), models=models, cache=cache,
+                                           events=job_events, **(options or {}))
+                except Exception as e:
+                    # Keep the worker alive; a bad job must not take the resident models down with it
+                    result = {"error": f"Processing failed: {str(e)}"}
+                print(f"ASR model pool: {json.dumps(models.pool_stats())}", file=sys.stderr)
+        if emit_events:
+            job_events.emit("result", result=result)
+            continue
+        if "id" in job:
+            result = {"id": job["id"], **result}
+        output_stream.write(json.dumps(result) + "\n")
+        output_stream.flush()
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Process audio file for transcription and speaker diarization.")
-    parser.add_argument("audio_file", help="Path to the audio file to process.")
+    if len(sys.argv) > 1 and sys.argv[1] in ("prefetch", "warmup"):
+        sys.exit(bundle_main(sys.argv[1:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "enroll":
+        from speaker_enrollment import main as enroll_main
+
+        sys.exit(enroll_main(sys.argv[1:]))
+
+    parser = argparse.ArgumentParser(description="Process audio file for transcription and speaker diarization.",
+                                     epilog="Model bundle: `%(prog)s prefetch` downloads every model for offline use; "
+                                            "`%(prog)s warmup` verifies the bundle and initialises the models. "
+                                            "Speakers: `%(prog)s enroll result.json \"Speaker 1=Alice\"` enrolls named speakers.")
+    parser.add_argument("audio_file", nargs="?", help="Path to the audio file to process.")
     parser.add_argument("--language", default="auto", help="Language code (e.g., 'en', 'ko', 'ja') or 'auto' for automatic detection.")
+    parser.add_argument("--chunk-seconds", type=float, default=DEFAULT_CHUNK_SECONDS, help="Length of each ASR window in seconds.")
+    parser.add_argument("--chunk-overlap", type=float, default=DEFAULT_OVERLAP_SECONDS, help="Overlap between consecutive ASR windows in seconds.")
+    parser.add_argument("--no-vad", action="store_true", help="Send the whole recording to the models instead of only the voiced regions.")
+    parser.add_argument("--lid-excerpts", type=int, default=DEFAULT_NUM_EXCERPTS, help="Number of voiced excerpts used for language identification (0 = whole recording).")
+    parser.add_argument("--lid-excerpt-seconds", type=float, default=DEFAULT_EXCERPT_SECONDS, help="Length of each language identification excerpt in seconds.")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Directory of the content-addressed result cache.")
+    parser.add_argument("--cache-max-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024), help="Size limit of the result cache; least recently used entries are evicted.")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the result cache.")
+    parser.add_argument("--sequential-stages", action="store_true", help="Run ASR and speaker-embedding extraction one after the other instead of concurrently.")
+    parser.add_argument("--no-channel-split", action="store_true", help="Always diarize the downmix, even for multi-track recordings with one speaker per channel.")
+    parser.add_argument("--no-speaker-check", action="store_true", help="Always run full diarization, even when sampled speaker embeddings show a single voice.")
+    parser.add_argument("--quantize", choices=QUANTIZE_MODES, help="Run the ASR and speaker models with dynamically quantized linear layers (CPU only).")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch", help="Inference backend for the ASR encoder: PyTorch eager or ONNX Runtime (CPU provider; export the encoders first with `prefetch --backend onnx` or `warmup --backend onnx`).")
+    parser.add_argument("--max-asr-models", type=int, help=f"Worker and batch modes: per-language ASR models kept resident, least recently used evicted first (default {DEFAULT_MAX_ASR_MODELS}).")
+    parser.add_argument("--asr-memory-mb", type=float, help="Worker and batch modes: memory budget for resident ASR model weights (default: no limit).")
+    parser.add_argument("--enrollment-dir", help="Speaker enrollment index (see `enroll`); matching speakers come back named in \"speaker_names\".")
+    parser.add_argument("--no-voiceprints", action="store_true", help="Leave the per-speaker voice embeddings (\"speaker_embeddings\") out of the result and the result cache.")
+    parser.add_argument("--work-dir", default=DEFAULT_WORK_DIR, help="Directory for per-job checkpoints (VAD regions, ASR and speaker-embedding batches); removed when a job completes.")
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted job from its checkpoints instead of starting over.")
+    parser.add_argument("--no-checkpoint", action="store_true", help="Do not write job checkpoints.")
+    parser.add_argument("--input-dir", help="Batch mode: process every audio file under this directory.")
+    parser.add_argument("--manifest", help="Batch mode: file listing audio paths (or JSON jobs), one per line.")
+    parser.add_argument("--workers", type=int, help="Batch mode: number of worker processes (default: half the CPU cores).")
+    parser.add_argument("--threads-per-worker", type=int, help="Batch mode: torch intra-op threads per worker.")
+    parser.add_argument("--output", help="Batch mode: write NDJSON results here instead of stdout.")
+    parser.add_argument("--events", choices=["none", "ndjson"], default="none", help="Emit progress events (stage start/end, partial transcripts) as NDJSON on stdout; the result becomes the final \"result\" event.")
+    parser.add_argument("--profile", action="store_true", help="Add per-stage wall time, CPU time, peak RSS and audio-seconds-per-second to the output JSON.")
+    parser.add_argument("--profile-trace", help="Also write the stage timings as a Chrome trace file to this path (implies --profile).")
+    parser.add_argument("--serve", action="store_true", help="Run as a long-lived worker: keep models loaded and read jobs (one per line) from stdin.")
     args = parser.parse_args()
+    if args.resume and args.no_checkpoint:
+        parser.error("--resume needs checkpoints; drop --no-checkpoint")
+    if args.no_voiceprints and args.enrollment_dir:
+        parser.error("--enrollment-dir matches speakers by their voiceprints; drop --no-voiceprints")
+
+    cache = None if args.no_cache else ResultCache(args.cache_dir, args.cache_max_mb * 1024 * 1024)
+
+    options = {
+        "chunk_seconds": args.chunk_seconds, "chunk_overlap_seconds": args.chunk_overlap,
+        "vad": not args.no_vad, "lid_excerpts": args.lid_excerpts, "lid_excerpt_seconds": args.lid_excerpt_seconds,
+        "concurrent_stages": not args.sequential_stages, "quantize": args.quantize,
+        "backend": args.backend, "enrollment_dir": args.enrollment_dir,
+        "channel_split": not args.no_channel_split, "speaker_check": not args.no_speaker_check,
+        "voiceprints": not args.no_voiceprints,
+        "work_dir": None if args.no_checkpoint else args.work_dir, "resume": args.resume,
+    }
+
+    # Pool limits reach batch worker processes through the environment
+    if args.max_asr_models is not None:
+        os.environ[MAX_ASR_MODELS_ENV] = str(args.max_asr_models)
+    if args.asr_memory_mb is not None:
+        os.environ[ASR_MEMORY_MB_ENV] = str(args.asr_memory_mb)
+
+    # Fail fast instead of letting every job (or every batch worker) hit the missing models
+    if args.serve or args.input_dir or args.manifest:
+        bundle_error = bundle_missing_error() or backend_unavailable_error(args.backend)
+        if bundle_error:
+            print(json.dumps({"error": bundle_error}), file=sys.stderr)
+            sys.exit(1)
+
+    if args.serve:
+        serve(cache=cache, options=options, emit_events=args.events == "ndjson")
+        sys.exit(0)
+
+    if args.input_dir or args.manifest:
+        from batch import collect_jobs, run_batch
+
+        jobs = collect_jobs(args.input_dir, args.manifest, args.language)
+        if not jobs:
+            print(json.dumps({"error": "No audio files found for batch processing."}), file=sys.stderr)
+            sys.exit(1)
+        output_stream = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+        try:
+            summary = run_batch(jobs, output_stream, workers=args.workers, threads_per_worker=args.threads_per_worker,
+                                options=options, cache_dir=None if cache is None else args.cache_dir,
+                                cache_max_bytes=None if cache is None else cache.max_bytes)
+        finally:
+            if args.output:
+                output_stream.close()
+        print(json.dumps(summary), file=sys.stderr)
+        sys.exit(0 if summary["failed"] == 0 else 1)
+
+    if not args.audio_file:
+        parser.error("audio_file is required unless --serve, --input-dir or --manifest is given")
 
     if not os.path.exists(args.audio_file):
         print(json.dumps({"error": f"Audio file not found: {args.audio_file}"}), file=sys.stderr)
         sys.exit(1)
 
-    # Create a temporary directory for SpeechBrain models if it doesn't exist
-    temp_model_dir = os.path.join(tempfile.gettempdir(), "sb_models")
-    os.makedirs(temp_model_dir, exist_ok=True)
+    profiler = StageProfiler() if args.profile or args.profile_trace else None
+    events = EventEmitter(sys.stdout) if args.events == "ndjson" else NO_EVENTS
+    result = process_audio(args.audio_file, args.language, cache=cache, events=events, profiler=profiler, **options)
+    if args.profile_trace:
+        profiler.write_chrome_trace(args.profile_trace)
 
-    result = process_audio(args.audio_file, args.language)
-    
-    print(json.dumps(result, indent=2)) # Added indent for readability
+    if args.events == "ndjson":
+        events.emit("result", result=result)
+    else:
+        print(json.dumps(result, indent=2)) # Added indent for readability
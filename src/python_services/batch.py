@@ -0,0 +1,139 @@
+# Batch transcription for archive backfills.
+# Files from a directory or manifest are spread over a pool of worker processes. Each
+# worker loads the models once in its initializer and then processes jobs until the queue
+# is empty; results are streamed out as NDJSON as soon as each file finishes.
+import json
+import multiprocessing
+import os
+import time
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".flac", ".m4a", ".ogg", ".opus", ".webm", ".mp4")
+
+_worker_state = {}
+
+
+def collect_jobs(input_dir=None, manifest=None, language="auto"):
+    """Build the job list from a directory tree and/or a manifest file.
+
+    Manifest lines are either bare paths or JSON objects with "audio_file" and optional
+    "id" and "language" keys. A line that is neither becomes a job carrying an "error",
+    which run_batch reports as a failed record instead of stopping the backfill.
+    """
+    jobs = []
+    if input_dir:
+        for dirpath, _, filenames in os.walk(input_dir):
+            for filename in sorted(filenames):
+                if filename.lower().endswith(AUDIO_EXTENSIONS):
+                    jobs.append({"audio_file": os.path.join(dirpath, filename), "language": language})
+    if manifest:
+        with open(manifest, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    job = json.loads(line) if line.startswith("{") else {"audio_file": line}
+                except json.JSONDecodeError as e:
+                    job = {"error": f"Invalid job: {str(e)}"}
+                if not isinstance(job, dict):
+                    job = {"error": "Invalid job: expected a JSON object"}
+                elif "error" not in job and not isinstance(job.get("audio_file"), str):
+                    job = {"error": "Invalid job: expected a JSON object with an \"audio_file\" path",
+                           **{key: job[key] for key in ("id",) if key in job}}
+                if "error" in job:
+                    job["manifest_line"] = line_number
+                else:
+                    job.setdefault("language", language)
+                jobs.append(job)
+
+    # Longest files first so a big recording does not end up alone at the tail of the run
+    jobs.sort(key=lambda job: os.path.getsize(job["audio_file"]) if os.path.exists(job.get("audio_file", "")) else 0,
+              reverse=True)
+    return jobs
+
+
+def _init_worker(options, threads_per_worker, cache_dir, cache_max_bytes):
+    import torch
+
+    from audio_processor import process_audio
+    from model_bundle import warm_up
+    from model_store import ModelStore
+    from result_cache import ResultCache
+
+    torch.set_num_threads(threads_per_worker)
+    models = ModelStore(quantize=options.get("quantize"), backend=options.get("backend", "torch"))
+    models.preload()
+    warm_up(models)
+    _worker_state.update({
+        "process_audio": process_audio,
+        "models": models,
+        "cache": ResultCache(cache_dir, cache_max_bytes) if cache_dir else None,
+        "options": options,
+    })
+
+
+def _run_job(job):
+    started = time.perf_counter()
+    if not os.path.exists(job["audio_file"]):
+        result = {"error": f"Audio file not found: {job['audio_file']}"}
+    else:
+        try:
+            result = _worker_state["process_audio"](
+                job["audio_file"], job.get("language", "auto"),
+                models=_worker_state["models"], cache=_worker_state["cache"], **_worker_state["options"]
+            )
+        except Exception as e:
+            result = {"error": f"Processing failed: {str(e)}"}
+    record = {key: job[key] for key in ("id", "audio_file") if key in job}
+    record["processing_seconds"] = round(time.perf_counter() - started, 3)
+    record.update(result)
+    return record
+
+
+def run_batch(jobs, output_stream, workers=None, threads_per_worker=None, options=None,
+              cache_dir=None, cache_max_bytes=None):
+    """Process `jobs` on a process pool, writing one NDJSON record per file.
+
+    Returns an aggregate summary including the real-time factor (processing wall time
+    divided by total audio duration; below 1.0 is faster than real time).
+    """
+    cpu_count = os.cpu_count() or 1
+    workers = workers or max(1, cpu_count // 2)
+    threads_per_worker = threads_per_worker or max(1, cpu_count // workers)
+    runnable = [job for job in jobs if "error" not in job]
+    workers = max(1, min(workers, len(runnable)))
+
+    started = time.perf_counter()
+    audio_seconds = 0.0
+    failed = 0
+
+    def write(record):
+        nonlocal audio_seconds, failed
+        if "error" in record:
+            failed += 1
+        audio_seconds += record.get("duration_seconds", 0.0)
+        output_stream.write(json.dumps(record) + "\n")
+        output_stream.flush()
+
+    # Unreadable manifest lines are reported up front; they never reach a worker
+    for job in jobs:
+        if "error" in job:
+            write(job)
+    if runnable:
+        # Spawn rather than fork: workers must not inherit a half-initialised torch runtime
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(workers, initializer=_init_worker,
+                          initargs=(options or {}, threads_per_worker, cache_dir, cache_max_bytes)) as pool:
+            for record in pool.imap_unordered(_run_job, runnable):
+                write(record)
+
+    wall_seconds = time.perf_counter() - started
+    return {
+        "files": len(jobs),
+        "failed": failed,
+        "workers": workers,
+        "threads_per_worker": threads_per_worker,
+        "audio_seconds": round(audio_seconds, 2),
+        "wall_seconds": round(wall_seconds, 2),
+        "real_time_factor": round(wall_seconds / audio_seconds, 4) if audio_seconds else None,
+    }
@@ -0,0 +1,81 @@
+# Speed/accuracy benchmark of model variants on a fixed local clip.
+#   python benchmark.py clip.wav --reference clip.txt --repeats 3
+# Every variant gets its own ModelStore. A first untimed run loads and warms up the models,
+# then the median wall time of `repeats` runs is compared with the fp32 baseline, and the
+# transcript is scored against the reference (or the baseline transcript if none is given).
+import argparse
+import json
+import statistics
+import sys
+import time
+
+VARIANTS = {
+    "fp32": {},
+    "int8": {"quantize": "int8"},
+    "onnx": {"backend": "onnx"},
+}
+
+
+def word_error_rate(reference, hypothesis):
+    """Word-level Levenshtein distance divided by the number of reference words."""
+    reference = reference.lower().split()
+    hypothesis = hypothesis.lower().split()
+    if not reference:
+        return 0.0 if not hypothesis else 1.0
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1] / len(reference)
+
+
+def run_variant(audio_file, language, options, repeats):
+    from audio_processor import process_audio
+    from model_store import ModelStore
+
+    models = ModelStore(quantize=options.get("quantize"), backend=options.get("backend", "torch"))
+    result = process_audio(audio_file, language, models=models, **options)  # warm-up, not timed
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = process_audio(audio_file, language, models=models, **options)
+        timings.append(time.perf_counter() - started)
+    if "error" in result:
+        raise RuntimeError(f"{result['error']}")
+    return result["full_transcript_debug"], statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare speed and WER of model variants on one clip.")
+    parser.add_argument("audio_file", help="Fixed local test clip.")
+    parser.add_argument("--reference", help="Text file with the reference transcript of the clip.")
+    parser.add_argument("--language", default="en", help="Language of the clip (skips LID so only the variant differs).")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per variant.")
+    parser.add_argument("--variants", nargs="+", choices=list(VARIANTS), default=list(VARIANTS),
+                        help="Variants to run; the first one is the baseline.")
+    args = parser.parse_args()
+
+    reference = None
+    if args.reference:
+        with open(args.reference, "r", encoding="utf-8") as f:
+            reference = f.read()
+
+    report = []
+    for name in args.variants:
+        print(f"Benchmarking {name}...", file=sys.stderr)
+        transcript, seconds = run_variant(args.audio_file, args.language, VARIANTS[name], args.repeats)
+        if reference is None:
+            reference = transcript  # score later variants against the baseline output
+        report.append({
+            "variant": name,
+            "seconds": round(seconds, 3),
+            "speedup": round(report[0]["seconds"] / seconds, 2) if report else 1.0,
+            "wer": round(word_error_rate(reference, transcript), 4),
+        })
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# Channel-activity analysis for multi-track recordings.
+# Conference-room and podcast recordings often put every participant on their own channel.
+# Such files are recognised from per-channel frame energies: at least two channels carry
+# speech, and whenever someone speaks one channel is clearly louder than the rest (the
+# others only pick up bleed). For them the speaker of every moment is simply the loudest
+# active channel, so diarization is skipped, and each channel is transcribed on its own
+# over the spans where it is active, which keeps cross-talk out of the transcripts.
+import numpy as np
+
+from diarization import NON_SPEECH, run_length_encode, speaker_names, turns_to_segments
+from vad import frame_energy_db, frames_to_regions, voiced_frames
+
+DEFAULT_FRAME_SECONDS = 0.03
+DOMINANCE_DB = 6.0
+MIN_DOMINANT_FRACTION = 0.8
+MIN_ACTIVE_FRACTION = 0.02
+
+
+class ChannelLayout:
+    """Per-channel frame energies of a recording whose channels each carry one speaker."""
+
+    def __init__(self, energies, active, speaking_channels, frame_samples, sample_rate):
+        self.energies = energies
+        self.active = active
+        self.speaking_channels = speaking_channels
+        self.frame_samples = frame_samples
+        self.sample_rate = sample_rate
+
+    @property
+    def frame_shift(self):
+        return self.frame_samples / self.sample_rate
+
+    def frame_labels(self):
+        """Loudest active speaking channel for every frame, NON_SPEECH when none is active."""
+        energies = self.energies[self.speaking_channels]
+        active = self.active[self.speaking_channels]
+        loudest = np.where(active, energies, -np.inf).argmax(axis=0)
+        labels = np.asarray(self.speaking_channels)[loudest]
+        return np.where(active.any(axis=0), labels, NON_SPEECH)
+
+    def channel_regions(self, channel, num_samples):
+        """[start, end) sample ranges where `channel` speaks itself rather than picking up bleed.
+
+        A frame counts when the channel is active and within DOMINANCE_DB of the loudest
+        channel, so overlapping speech is kept on both channels.
+        """
+        own_speech = self.active[channel] & (self.energies[channel] >= self.energies.max(axis=0) - DOMINANCE_DB)
+        return frames_to_regions(own_speech, self.frame_samples, num_samples, self.sample_rate)
+
+
+def analyze_channels(tracks, sample_rate, frame_seconds=DEFAULT_FRAME_SECONDS):
+    """Return a ChannelLayout when every speaking channel carries its own speaker, else None."""
+    if len(tracks) < 2:
+        return None
+    frame_samples = max(1, int(frame_seconds * sample_rate))
+    num_frames = min(track.shape[0] for track in tracks) // frame_samples
+    if num_frames == 0:
+        return None
+    energies = np.stack([frame_energy_db(track[:num_frames * frame_samples], frame_samples) for track in tracks])
+    active = np.stack([voiced_frames(energy) for energy in energies])
+
+    # Silent tracks (absent participants) are ignored; at least two people must speak
+    speaking_channels = np.flatnonzero(active.mean(axis=1) >= MIN_ACTIVE_FRACTION).tolist()
+    if len(speaking_channels) < 2:
+        return None
+    speech = active[speaking_channels].any(axis=0)
+    ranked = np.sort(energies[speaking_channels][:, speech], axis=0)
+    # Duplicated or mixed-down channels are about equally loud; per-speaker mics are not
+    if ranked.shape[1] == 0 or ((ranked[-1] - ranked[-2]) >= DOMINANCE_DB).mean() < MIN_DOMINANT_FRACTION:
+        return None
+    return ChannelLayout(energies, active, speaking_channels, frame_samples, sample_rate)
+
+
+def channel_segments(channel_units):
+    """Interleave per-channel units into review-page segments.
+
+    `channel_units` maps a channel to (texts, starts, ends) of its words (or of transcript
+    pieces when there are no word timestamps). Units from all channels are ordered by
+    start time and consecutive units of one channel form a segment.
+    """
+    texts, starts, ends, channels = [], [], [], []
+    for channel, (channel_texts, channel_starts, channel_ends) in sorted(channel_units.items()):
+        texts.extend(channel_texts)
+        starts.append(np.asarray(channel_starts, dtype=np.float64))
+        ends.append(np.asarray(channel_ends, dtype=np.float64))
+        channels.append(np.full(len(channel_texts), channel, dtype=np.int64))
+    if not texts:
+        return []
+    starts, ends, channels = np.concatenate(starts), np.concatenate(ends), np.concatenate(channels)
+    order = np.argsort(starts, kind="stable")
+    starts, ends, channels = starts[order], ends[order], channels[order]
+    texts = [texts[i] for i in order]
+
+    speakers, first, stop = run_length_encode(channels)
+    names = speaker_names(speakers)
+    segments = []
+    for speaker, begin, end in zip(speakers, first, stop):
+        segments.append({
+            "speaker": names[int(speaker)],
+            "start_time": round(float(starts[begin]), 2),
+            "end_time": round(float(ends[begin:end].max()), 2),
+            "text": " ".join(texts[begin:end])
+        })
+    return segments
+
+
+def turn_units(transcript, turn_starts, turn_ends):
+    """Spread a channel transcript without word timestamps over the channel's turns."""
+    pieces = turns_to_segments(np.zeros(len(turn_starts), dtype=np.int64), np.asarray(turn_starts),
+                               np.asarray(turn_ends), transcript)
+    pieces = [piece for piece in pieces if piece["text"]]
+    return ([piece["text"] for piece in pieces], [piece["start_time"] for piece in pieces],
+            [piece["end_time"] for piece in pieces])
@@ -0,0 +1,159 @@
+# Checkpoints of long audio jobs, so a job that dies part-way can resume.
+# Every run gets its own work directory, named after the audio hash and the result key
+# plus a per-run suffix, and holds an exclusive lock on it for as long as it runs. The VAD
+# regions are saved there as soon as they are known, and every ASR batch and speaker-
+# embedding batch is saved as it completes. A run started with `resume` adopts the
+# directory of an earlier run of the same job whose lock is no longer held (that run
+# died) and only computes what is missing; without it, such leftovers are discarded.
+# Directories locked by a live run, e.g. a concurrent retry of the same upload, are never
+# touched. A run deletes its own directory once it has produced its result.
+import json
+import os
+import shutil
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DEFAULT_WORK_DIR = os.environ.get("AUDIO_PROCESSOR_WORK_DIR", "audio_jobs")
+
+
+def _replace_atomically(path, write, mode="w"):
+    # Write to a temporary name first, so a kill mid-write never leaves a truncated batch
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, mode, encoding=None if "b" in mode else "utf-8") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+LOCK_NAME = ".lock"
+
+
+def _try_lock(directory):
+    """Exclusively lock `directory`; returns the open lock file, or None if a live run holds it.
+
+    The OS drops the lock when its holder exits, however it dies, so a directory whose
+    lock can be taken belongs to a run that is gone.
+    """
+    try:
+        lock_file = open(os.path.join(directory, LOCK_NAME), "a+b")
+    except OSError:
+        return None
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def _last_modified(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:  # removed by another run meanwhile
+        return 0.0
+
+
+class StageCheckpoint:
+    """Completed batches of one pipeline stage, one file per batch."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, index, extension):
+        return os.path.join(self.directory, f"batch-{index:07d}.{extension}")
+
+    def get_batch(self, index):
+        try:
+            with open(self._path(index, "json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put_batch(self, index, payload):
+        _replace_atomically(self._path(index, "json"), lambda f: json.dump(payload, f))
+
+    def get_array(self, index):
+        import numpy as np
+
+        try:
+            return np.load(self._path(index, "npy"))
+        except (OSError, ValueError):
+            return None
+
+    def put_array(self, index, array):
+        import numpy as np
+
+        _replace_atomically(self._path(index, "npy"), lambda f: np.save(f, array), mode="wb")
+
+
+class JobCheckpoint:
+    def __init__(self, work_dir, audio_hash, job_key, resume=False):
+        os.makedirs(work_dir, exist_ok=True)
+        prefix = f"{audio_hash[:16]}-{job_key[:16]}-"
+        self.path, self._lock = None, None
+
+        # Earlier runs of this job whose lock is free died before finishing
+        abandoned = []
+        earlier_runs = [os.path.join(work_dir, name) for name in os.listdir(work_dir) if name.startswith(prefix)]
+        for directory in sorted(earlier_runs, key=_last_modified, reverse=True):
+            lock = _try_lock(directory)
+            if lock is not None:
+                abandoned.append((directory, lock))
+        if resume and abandoned:
+            self.path, self._lock = abandoned.pop(0)  # the most recently active one
+        for directory, lock in abandoned:
+            shutil.rmtree(directory, ignore_errors=True)
+            lock.close()
+
+        if self.path is None:
+            # Created under a hidden name and locked before it gets a name other runs look
+            # for, so nobody can mistake it for an abandoned directory in between
+            staging = tempfile.mkdtemp(prefix=".new-", dir=work_dir)
+            self._lock = _try_lock(staging)
+            self.path = os.path.join(work_dir, prefix + os.path.basename(staging)[len(".new-"):])
+            os.rename(staging, self.path)
+
+    def stage(self, name):
+        return StageCheckpoint(os.path.join(self.path, name))
+
+    def get_array(self, name):
+        import numpy as np
+
+        try:
+            return np.load(os.path.join(self.path, f"{name}.npy"))
+        except (OSError, ValueError):
+            return None
+
+    def put_array(self, name, array):
+        import numpy as np
+
+        _replace_atomically(os.path.join(self.path, f"{name}.npy"), lambda f: np.save(f, array), mode="wb")
+
+    def completed_batches(self):
+        """Number of saved batches per stage, for progress logs."""
+        counts = {}
+        for name in sorted(os.listdir(self.path)):
+            stage_dir = os.path.join(self.path, name)
+            if os.path.isdir(stage_dir):
+                counts[name] = sum(1 for entry in os.listdir(stage_dir) if entry.startswith("batch-")
+                                   and not entry.endswith(".tmp"))
+        return counts
+
+    def release(self):
+        """Give up the lock, leaving the checkpoints for a later `resume`."""
+        if self._lock is not None:
+            self._lock.close()
+            self._lock = None
+
+    def finish(self):
+        """Delete this run's checkpoints once its result exists."""
+        shutil.rmtree(self.path, ignore_errors=True)
+        self.release()
@@ -0,0 +1,157 @@
+# Two-pass speaker clustering that scales to very long recordings.
+# Pass 1 over-clusters the window embeddings chunk by chunk with spherical k-means, so each
+# chunk only ever needs a (chunk, sub-clusters) similarity block. Pass 2 merges the chunk
+# centroids agglomeratively (centroid linkage on cosine similarity) until the closest pair
+# falls below a threshold, then every window is assigned to its nearest final centroid in
+# fixed-size float32 blocks. Memory is bounded by the chunk and centroid counts, and time
+# grows linearly with the number of windows.
+import numpy as np
+
+DEFAULT_CHUNK_SIZE = 4000
+DEFAULT_SUBCLUSTERS_PER_CHUNK = 16
+DEFAULT_MAX_CENTROIDS = 2000
+DEFAULT_MERGE_THRESHOLD = 0.5
+DEFAULT_MAX_SPEAKERS = 10
+BLOCK_SIZE = 8192
+
+
+def normalize_rows(x):
+    x = np.asarray(x, dtype=np.float32)
+    return x / (np.linalg.norm(x, axis=1, keepdims=True) + 1e-9)
+
+
+def nearest_centroids(x, centroids, block_size=BLOCK_SIZE):
+    """Index of the most cosine-similar centroid for every (normalized) row of `x`."""
+    centroids = normalize_rows(centroids)
+    labels = np.empty(x.shape[0], dtype=np.int64)
+    for start in range(0, x.shape[0], block_size):
+        labels[start:start + block_size] = (x[start:start + block_size] @ centroids.T).argmax(axis=1)
+    return labels
+
+
+def cluster_sums(x, labels, k, weights=None):
+    """Per-cluster (weighted) sums of the rows of `x`, as one BLAS product."""
+    membership = np.zeros((k, x.shape[0]), dtype=np.float32)
+    membership[labels, np.arange(x.shape[0])] = 1.0 if weights is None else weights
+    return membership @ x
+
+
+def spherical_kmeans(x, k, weights=None, iterations=20):
+    """Cluster normalized rows into at most `k` groups; returns (labels, weighted sums)."""
+    k = min(k, x.shape[0])
+    # Deterministic farthest-point initialisation
+    chosen = [0]
+    closest = x @ x[0]
+    for _ in range(1, k):
+        chosen.append(int(np.argmin(closest)))
+        closest = np.maximum(closest, x @ x[chosen[-1]])
+    centroids = x[chosen]
+
+    labels = None
+    for _ in range(iterations):
+        new_labels = (x @ centroids.T).argmax(axis=1)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        sums = cluster_sums(x, labels, k, weights)
+        empty = ~sums.any(axis=1)
+        sums[empty] = centroids[empty]  # keep an emptied centroid where it was
+        centroids = normalize_rows(sums)
+
+    used = np.unique(labels)
+    labels = np.searchsorted(used, labels)
+    return labels, cluster_sums(x, labels, used.size, weights)
+
+
+def over_cluster(x, chunk_size=DEFAULT_CHUNK_SIZE, subclusters=DEFAULT_SUBCLUSTERS_PER_CHUNK, weights=None):
+    """Pass 1: return (labels, centroid sums, centroid weights) from chunk-wise k-means."""
+    labels = np.empty(x.shape[0], dtype=np.int64)
+    all_sums, all_weights = [], []
+    offset = 0
+    for start in range(0, x.shape[0], chunk_size):
+        chunk = slice(start, start + chunk_size)
+        chunk_weights = None if weights is None else weights[chunk]
+        chunk_labels, sums = spherical_kmeans(x[chunk], subclusters, chunk_weights)
+        labels[chunk] = chunk_labels + offset
+        all_sums.append(sums)
+        counts = np.bincount(chunk_labels, weights=chunk_weights, minlength=sums.shape[0])
+        all_weights.append(counts.astype(np.float32))
+        offset += sums.shape[0]
+    return labels, np.concatenate(all_sums), np.concatenate(all_weights)
+
+
+def agglomerative_merge(sums, threshold=DEFAULT_MERGE_THRESHOLD, max_clusters=DEFAULT_MAX_SPEAKERS):
+    """Pass 2: merge centroids (given as embedding sums) by centroid linkage.
+
+    Merging continues while the most similar pair is above `threshold`, and regardless of
+    similarity while more than `max_clusters` clusters remain. Returns one cluster label
+    per input centroid.
+    """
+    m = sums.shape[0]
+    sums = sums.astype(np.float32).copy()
+    parent = np.arange(m)
+    if m == 1:
+        return np.zeros(1, dtype=np.int64)
+
+    unit = normalize_rows(sums)
+    similarity = unit @ unit.T
+    np.fill_diagonal(similarity, -np.inf)
+    best = similarity.max(axis=1)
+    best_index = similarity.argmax(axis=1)
+    active = np.ones(m, dtype=bool)
+    remaining = m
+
+    while remaining > 1:
+        i = int(np.argmax(best))
+        j = int(best_index[i])
+        if best[i] < threshold and remaining <= max_clusters:
+            break
+        # Merge j into i
+        sums[i] += sums[j]
+        parent[parent == j] = i
+        active[j] = False
+        remaining -= 1
+        similarity[j, :] = -np.inf
+        similarity[:, j] = -np.inf
+        best[j] = -np.inf
+
+        unit_i = sums[i] / (np.linalg.norm(sums[i]) + 1e-9)
+        row = normalize_rows(sums[active]) @ unit_i
+        similarity[i, active] = row
+        similarity[active, i] = row
+        similarity[i, i] = -np.inf
+
+        # Rows whose best partner was i or j must be rescanned; others may now prefer i
+        stale = active & ((best_index == i) | (best_index == j))
+        stale[i] = True
+        best[stale] = similarity[stale].max(axis=1)
+        best_index[stale] = similarity[stale].argmax(axis=1)
+        improved = active & (similarity[:, i] > best)
+        best[improved] = similarity[improved, i]
+        best_index[improved] = i
+
+    _, labels = np.unique(parent, return_inverse=True)
+    return labels.astype(np.int64)
+
+
+def cluster_speakers(embeddings, max_speakers=DEFAULT_MAX_SPEAKERS, threshold=DEFAULT_MERGE_THRESHOLD,
+                     chunk_size=DEFAULT_CHUNK_SIZE, subclusters=DEFAULT_SUBCLUSTERS_PER_CHUNK,
+                     max_centroids=DEFAULT_MAX_CENTROIDS):
+    """Label every embedding window with a speaker index (0, 1, ...)."""
+    n = embeddings.shape[0]
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    x = normalize_rows(embeddings)
+
+    labels, sums, weights = over_cluster(x, chunk_size, subclusters)
+    # Day-long recordings can leave too many centroids for pass 2; reduce them again
+    while sums.shape[0] > max_centroids:
+        centroid_labels, sums, weights = over_cluster(normalize_rows(sums), chunk_size, subclusters, weights)
+        labels = centroid_labels[labels]
+
+    merged = agglomerative_merge(sums, threshold, max_speakers)
+    speaker_sums = cluster_sums(sums, merged, merged.max() + 1)
+    # Final reassignment fixes windows that pass 1 grouped with the wrong speaker
+    labels = nearest_centroids(x, speaker_sums)
+    _, labels = np.unique(labels, return_inverse=True)
+    return labels.astype(np.int64)
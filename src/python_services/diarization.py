@@ -0,0 +1,198 @@
+# Speaker diarization on the in-memory waveform, plus post-processing of frame-level
+# speaker labels into (speaker, start, end) turns.
+# Speaker embeddings are computed on sliding windows taken as strided views of the tensor
+# the rest of the pipeline already holds, so nothing is re-encoded to disk. Everything
+# after the embeddings is vectorized with NumPy so multi-hour inputs with millions of
+# frames are handled without Python-level loops over frames; the windows are clustered by
+# the two-pass engine in clustering.py, whose memory does not grow with the window count.
+import numpy as np
+
+from clustering import DEFAULT_MERGE_THRESHOLD, cluster_speakers, normalize_rows, spherical_kmeans
+
+NON_SPEECH = -1
+
+DEFAULT_WINDOW_SECONDS = 1.5
+DEFAULT_HOP_SECONDS = 0.75
+DEFAULT_MAX_SPEAKERS = 10
+
+# Single-speaker pre-check: windows sampled across the recording, and the similarity above
+# which the two halves of the sample count as one voice (the clusterer would merge them)
+DEFAULT_SAMPLE_WINDOWS = 64
+SINGLE_SPEAKER_MIN_SIMILARITY = DEFAULT_MERGE_THRESHOLD
+
+
+def run_length_encode(labels):
+    """Return (values, starts, ends) for each run of identical consecutive labels."""
+    labels = np.asarray(labels)
+    if labels.size == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return labels[:0], empty, empty
+    change = np.flatnonzero(labels[1:] != labels[:-1]) + 1
+    starts = np.concatenate(([0], change))
+    ends = np.concatenate((change, [labels.size]))
+    return labels[starts], starts, ends
+
+
+def labels_to_turns(labels, frame_shift, max_gap=0.5, min_turn=0.3):
+    """Convert per-frame labels into speaker turns.
+
+    Runs shorter than `min_turn` seconds are treated as label flicker and dropped, then
+    consecutive runs of the same speaker separated by at most `max_gap` seconds are merged.
+    Returns three arrays: speaker ids, start times and end times (seconds).
+    """
+    speakers, starts, ends = run_length_encode(labels)
+    speech = speakers != NON_SPEECH
+    speakers, starts, ends = speakers[speech], starts[speech], ends[speech]
+
+    long_enough = (ends - starts) * frame_shift >= min_turn
+    if long_enough.any():
+        speakers, starts, ends = speakers[long_enough], starts[long_enough], ends[long_enough]
+    if speakers.size == 0:
+        return speakers, starts.astype(np.float64), ends.astype(np.float64)
+
+    gaps = (starts[1:] - ends[:-1]) * frame_shift
+    new_turn = np.concatenate(([True], (speakers[1:] != speakers[:-1]) | (gaps > max_gap)))
+    first = np.flatnonzero(new_turn)
+    last = np.concatenate((first[1:], [speakers.size])) - 1
+    return speakers[first], starts[first] * frame_shift, ends[last] * frame_shift
+
+
+def speaker_names(speaker_ids):
+    # Number speakers in order of first appearance so "Speaker 1" is whoever talks first
+    unique_ids, first_seen = np.unique(speaker_ids, return_index=True)
+    order = unique_ids[np.argsort(first_seen)]
+    return {int(speaker_id): f"Speaker {rank + 1}" for rank, speaker_id in enumerate(order)}
+
+
+def turns_to_segments(speakers, starts, ends, transcript):
+    """Build the review-page segment dicts, spreading transcript words by turn duration."""
+    if speakers.size == 0:
+        return []
+    words = transcript.split()
+    durations = ends - starts
+    total = durations.sum()
+    if total > 0:
+        cumulative = np.cumsum(durations) / total
+    else:
+        cumulative = np.arange(1, speakers.size + 1) / speakers.size
+    word_bounds = np.concatenate(([0], np.rint(cumulative * len(words)).astype(np.int64)))
+
+    names = speaker_names(speakers)
+    segments = []
+    for i in range(speakers.size):
+        segments.append({
+            "speaker": names[int(speakers[i])],
+            "start_time": round(float(starts[i]), 2),
+            "end_time": round(float(ends[i]), 2),
+            "text": " ".join(words[word_bounds[i]:word_bounds[i + 1]])
+        })
+    return segments
+
+
+def _strided_windows(waveform, sample_rate, window_seconds, hop_seconds):
+    import torch
+
+    signal = waveform.reshape(-1)
+    window = int(window_seconds * sample_rate)
+    hop = int(hop_seconds * sample_rate)
+    if signal.shape[0] < window:
+        signal = torch.nn.functional.pad(signal, (0, window - signal.shape[0]))
+    return signal.unfold(0, window, hop)  # (num_windows, window) view, no copy
+
+
+def _encode_windows(encoder, windows, batch_size, device, checkpoint=None):
+    import torch
+
+    embeddings = []
+    with torch.no_grad():
+        for start in range(0, windows.shape[0], batch_size):
+            count = min(batch_size, windows.shape[0] - start)
+            saved = checkpoint.get_array(start) if checkpoint is not None else None
+            if saved is not None and saved.shape[0] == count:
+                embeddings.append(saved)
+                continue
+            batch = windows[start:start + batch_size].contiguous().to(device)
+            batch_embeddings = encoder.encode_batch(batch).reshape(batch.shape[0], -1).cpu().numpy().astype(np.float32)
+            if checkpoint is not None:
+                checkpoint.put_array(start, batch_embeddings)
+            embeddings.append(batch_embeddings)
+    return np.concatenate(embeddings)
+
+
+def embed_windows(encoder, waveform, sample_rate, window_seconds=DEFAULT_WINDOW_SECONDS,
+                  hop_seconds=DEFAULT_HOP_SECONDS, batch_size=64, device="cpu", checkpoint=None):
+    """Return a (num_windows, dim) float32 array of speaker embeddings.
+
+    Windows start every `hop_seconds`; they are strided views of `waveform`, so only one
+    batch at a time is materialised. With a checkpoint.StageCheckpoint, batches saved by
+    an interrupted run are reused and new ones are saved as they complete.
+    """
+    windows = _strided_windows(waveform, sample_rate, window_seconds, hop_seconds)
+    return _encode_windows(encoder, windows, batch_size, device, checkpoint)
+
+
+def embed_sampled_windows(encoder, waveform, sample_rate, num_windows=DEFAULT_SAMPLE_WINDOWS,
+                          window_seconds=DEFAULT_WINDOW_SECONDS, hop_seconds=DEFAULT_HOP_SECONDS,
+                          batch_size=64, device="cpu"):
+    """Embed `num_windows` of the embed_windows windows, spread evenly over the recording.
+
+    Returns (embeddings, complete); `complete` is True when the recording has no more
+    windows than that, so the sample is the full embed_windows output.
+    """
+    import torch
+
+    windows = _strided_windows(waveform, sample_rate, window_seconds, hop_seconds)
+    if windows.shape[0] <= num_windows:
+        return _encode_windows(encoder, windows, batch_size, device), True
+    index = np.unique(np.linspace(0, windows.shape[0] - 1, num_windows).round().astype(np.int64))
+    return _encode_windows(encoder, windows[torch.from_numpy(index)], batch_size, device), False
+
+
+def split_similarity(embeddings):
+    """Cosine similarity of the two centroids of a 2-means split of the embeddings.
+
+    One voice splits into two halves that are still alike (close to 1); any second
+    speaker, whether balanced or a small minority picked up by the farthest-point
+    initialisation, ends up in its own half and pulls the similarity down. Returns 1.0
+    when the sample cannot be split at all.
+    """
+    labels, sums = spherical_kmeans(normalize_rows(embeddings), 2)
+    if sums.shape[0] < 2:
+        return 1.0
+    centroids = normalize_rows(sums)
+    return float(centroids[0] @ centroids[1])
+
+
+def speaker_centroids(embeddings, window_labels):
+    """Mean L2-normalized embedding of every speaker, keyed by speaker label."""
+    count = min(embeddings.shape[0], window_labels.size)
+    x = embeddings[:count] / (np.linalg.norm(embeddings[:count], axis=1, keepdims=True) + 1e-9)
+    labels = window_labels[:count]
+    return {int(label): x[labels == label].mean(axis=0) for label in np.unique(labels) if label != NON_SPEECH}
+
+
+def window_labels_to_frames(window_labels, num_samples, hop_samples):
+    """Expand per-window labels to one label per hop-sized frame.
+
+    Each frame takes the label of the window that starts on it; frames past the last
+    window start keep the last window's label.
+    """
+    num_frames = max(1, -(-num_samples // hop_samples))
+    frames = np.full(num_frames, window_labels[-1] if window_labels.size else NON_SPEECH, dtype=np.int64)
+    count = min(num_frames, window_labels.size)
+    frames[:count] = window_labels[:count]
+    return frames
+
+
+def single_speaker_frames(num_samples, sample_rate, hop_seconds=DEFAULT_HOP_SECONDS):
+    """Per-frame labels for a recording with one speaker, shaped like diarize_embeddings output."""
+    hop = int(hop_seconds * sample_rate)
+    return window_labels_to_frames(np.zeros(1, dtype=np.int64), num_samples, hop), hop / sample_rate
+
+
+def diarize_embeddings(embeddings, num_samples, sample_rate, hop_seconds=DEFAULT_HOP_SECONDS,
+                       max_speakers=DEFAULT_MAX_SPEAKERS):
+    """Cluster window embeddings into per-frame speaker labels; returns (labels, frame_shift)."""
+    hop = int(hop_seconds * sample_rate)
+    window_labels = cluster_speakers(embeddings, max_speakers)
+    return window_labels_to_frames(window_labels, num_samples, hop), hop / sample_rate
@@ -0,0 +1,45 @@
+# NDJSON progress events for the audio pipeline.
+# With `--events ndjson`, process_audio reports stage starts/ends and partial
+# transcripts on stdout as it goes, one JSON object per line, ending with a "result"
+# event. Callers that do not ask for events get a disabled emitter and no output.
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+
+class EventEmitter:
+    def __init__(self, stream=None, job_id=None):
+        self.stream = stream
+        self.job_id = job_id
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()  # concurrent stages emit from several threads
+
+    @property
+    def enabled(self):
+        return self.stream is not None
+
+    def emit(self, event, **fields):
+        if self.stream is None:
+            return
+        payload = {"event": event, "elapsed": round(time.perf_counter() - self._started, 3)}
+        if self.job_id is not None:
+            payload["id"] = self.job_id
+        payload.update(fields)
+        with self._lock:
+            self.stream.write(json.dumps(payload) + "\n")
+            self.stream.flush()
+
+    @contextmanager
+    def stage(self, name, **fields):
+        self.emit("stage-start", stage=name, **fields)
+        started = time.perf_counter()
+        status = "error"
+        try:
+            yield
+            status = "ok"
+        finally:
+            self.emit("stage-end", stage=name, status=status, seconds=round(time.perf_counter() - started, 3))
+
+
+NO_EVENTS = EventEmitter()
@@ -0,0 +1,92 @@
+# Pluggable inference backends for the ASR encoder.
+# The wav2vec2 encoder dominates ASR cost. With the "onnx" backend it is exported once to
+# ONNX (next to the checkpoint in pretrained_models/, by `prefetch --backend onnx` or
+# `warmup --backend onnx`) and run with ONNX Runtime's CPU provider, with full graph
+# optimizations and an explicit thread count; the attention decoder, CTC head and
+# tokenizer stay in PyTorch. Both backends are plain callables taking (wavs, wav_lens)
+# and returning the encoder output tensor.
+import os
+import sys
+
+BACKENDS = ("torch", "onnx")
+
+
+def onnx_encoder_path(savedir):
+    return os.path.join(savedir, "encoder.onnx")
+
+
+def onnx_export_error(savedir):
+    """Why the ONNX encoder for `savedir` can be neither loaded nor exported, or None."""
+    path = onnx_encoder_path(savedir)
+    if os.path.exists(path) or os.access(savedir, os.W_OK):
+        return None
+    return (f"ONNX encoder not found at {path} and {savedir} is not writable. Run "
+            f"`python audio_processor.py warmup --backend onnx` where the model bundle is writable to export it.")
+
+
+class TorchEncoder:
+    def __init__(self, asr_model):
+        self.asr_model = asr_model
+
+    def __call__(self, wavs, wav_lens):
+        return self.asr_model.encode_batch(wavs, wav_lens)
+
+
+def export_encoder(asr_model, path, opset_version=17):
+    """Export `asr_model.mods.encoder` to ONNX with dynamic batch and time axes."""
+    import torch
+
+    encoder = asr_model.mods.encoder.cpu().eval()
+    example_wavs = torch.zeros(1, 16000)
+    example_lens = torch.ones(1)
+    tmp_path = f"{path}.tmp"
+    with torch.no_grad():
+        torch.onnx.export(
+            encoder, (example_wavs, example_lens), tmp_path,
+            input_names=["wavs", "wav_lens"], output_names=["encoder_out"],
+            dynamic_axes={"wavs": {0: "batch", 1: "samples"}, "wav_lens": {0: "batch"},
+                          "encoder_out": {0: "batch", 1: "frames"}},
+            opset_version=opset_version, dynamo=False,
+        )
+    os.replace(tmp_path, path)
+
+
+class OnnxEncoder:
+    def __init__(self, asr_model, savedir, num_threads=None):
+        import onnxruntime
+        import torch
+
+        path = onnx_encoder_path(savedir)
+        if not os.path.exists(path):
+            error = onnx_export_error(savedir)
+            if error:
+                raise RuntimeError(error)
+            print(f"Exporting ASR encoder to {path}", file=sys.stderr)
+            export_encoder(asr_model, path)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = num_threads or torch.get_num_threads()
+        options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        # The exporter drops inputs the graph never reads (some encoders ignore wav_lens)
+        self._input_names = {graph_input.name for graph_input in self.session.get_inputs()}
+
+    def __call__(self, wavs, wav_lens):
+        import torch
+
+        inputs = {
+            "wavs": wavs.detach().float().cpu().numpy(),
+            "wav_lens": wav_lens.detach().float().cpu().numpy(),
+        }
+        (encoder_out,) = self.session.run(None, {name: value for name, value in inputs.items()
+                                                 if name in self._input_names})
+        return torch.from_numpy(encoder_out).to(wavs.device)
+
+
+def create_encoder(backend, asr_model, savedir, num_threads=None):
+    if backend == "torch":
+        return TorchEncoder(asr_model)
+    if backend == "onnx":
+        return OnnxEncoder(asr_model, savedir, num_threads)
+    raise ValueError(f"Unknown inference backend: {backend}")
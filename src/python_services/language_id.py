@@ -0,0 +1,80 @@
+# Language identification on a bounded set of excerpts.
+# Instead of running the ECAPA LID model over the whole recording, a few loud (voiced)
+# windows spread across the meeting are classified as one batch and vote on the
+# language, so LID cost is constant per job rather than linear in meeting length.
+
+DEFAULT_NUM_EXCERPTS = 3
+DEFAULT_EXCERPT_SECONDS = 10.0
+
+# CommonLanguage labels for the languages we route to a specific ASR model
+LANGUAGE_LABEL_CODES = {
+    "English": "en",
+    "Korean": "ko",
+    "Japanese": "ja",
+    "Chinese_China": "zh",
+    "Chinese_Hongkong": "zh",
+    "Chinese_Taiwan": "zh",
+}
+
+
+def language_code(label):
+    # VoxLingua-style labels look like "en: English"; CommonLanguage ones are bare names
+    if ":" in label:
+        return label.split(":", 1)[0].strip()
+    return LANGUAGE_LABEL_CODES.get(label, label)
+
+
+def select_lid_excerpts(signal, sample_rate, num_excerpts=DEFAULT_NUM_EXCERPTS,
+                        excerpt_seconds=DEFAULT_EXCERPT_SECONDS, frame_seconds=0.1):
+    """Pick up to `num_excerpts` [start, end) sample ranges for LID.
+
+    The recording is split into equal sections and the highest-energy window of
+    `excerpt_seconds` is taken from each one, so the excerpts are both voiced and spread
+    over the meeting. Short recordings yield a single excerpt covering everything.
+    """
+    import numpy as np
+
+    excerpt_samples = int(excerpt_seconds * sample_rate)
+    num_samples = signal.shape[0]
+    if num_excerpts <= 0 or num_samples <= excerpt_samples * num_excerpts:
+        return [(0, num_samples)]
+
+    frame_samples = max(1, int(frame_seconds * sample_rate))
+    num_frames = num_samples // frame_samples
+    frames = np.asarray(signal[:num_frames * frame_samples], dtype=np.float32).reshape(num_frames, frame_samples)
+    power = np.einsum("ij,ij->i", frames, frames) / frame_samples
+
+    window = excerpt_samples // frame_samples
+    cumulative = np.concatenate(([0.0], np.cumsum(power)))
+    window_energy = cumulative[window:] - cumulative[:-window]  # energy of the window starting at each frame
+
+    section = window_energy.size // num_excerpts
+    excerpts = []
+    for k in range(num_excerpts):
+        best = k * section + int(np.argmax(window_energy[k * section:(k + 1) * section]))
+        start = best * frame_samples
+        excerpts.append((start, start + excerpt_samples))
+    return excerpts
+
+
+def identify_language(language_id_model, waveform, sample_rate, num_excerpts=DEFAULT_NUM_EXCERPTS,
+                      excerpt_seconds=DEFAULT_EXCERPT_SECONDS, device="cpu"):
+    """Classify the excerpts as one batch and return the majority-vote language code.
+
+    Ties are broken by the summed posterior of the tied languages.
+    """
+    import torch
+
+    signal = waveform.reshape(-1)
+    excerpts = select_lid_excerpts(signal.cpu().numpy(), sample_rate, num_excerpts, excerpt_seconds)
+    batch = torch.stack([signal[start:end] for start, end in excerpts]).to(device)
+
+    with torch.no_grad():
+        out_prob = language_id_model.classify_batch(batch)[0]
+    posteriors = out_prob.exp() if out_prob.max() <= 0 else out_prob  # the model returns log-probabilities
+    votes = torch.bincount(posteriors.argmax(dim=1), minlength=posteriors.shape[1]).float()
+    # Add the (normalised) summed posterior as a sub-vote tie-breaker
+    summed = posteriors.sum(dim=0)
+    predicted_index = torch.argmax(votes + summed / (summed.sum() + 1e-9))
+    label = language_id_model.hparams.label_encoder.decode_torch(predicted_index.unsqueeze(0))[0]
+    return language_code(label)
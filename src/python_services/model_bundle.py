@@ -0,0 +1,206 @@
+# Versioned offline model bundle.
+#   python audio_processor.py prefetch   # online: download every model into the bundle
+#   python audio_processor.py warmup     # offline: verify checksums, load, run a dummy job
+# `prefetch` materialises every model in LANGUAGE_MODEL_MAP (plus the LID and speaker
+# models) under MODEL_BUNDLE_DIR, together with the Hugging Face hub cache the models
+# pull their backbones from, and writes a manifest with the SHA-256 of every file. At
+# runtime the hub libraries are forced offline and pointed at the bundle, so a job never
+# touches the network; a missing bundle is reported instead of triggering a download.
+import json
+import os
+import shutil
+import sys
+import time
+
+from inference_backends import BACKENDS, onnx_export_error
+from model_store import (DEFAULT_ASR_MODEL_SOURCE, LANGUAGE_MODEL_MAP, MODEL_BUNDLE_DIR, MODEL_BUNDLE_VERSION,
+                         ModelStore, all_model_sources, model_savedir)
+from quantization import QUANTIZE_MODES
+from result_cache import hash_file
+
+MANIFEST_NAME = "manifest.json"
+ASR_SOURCES = sorted(set(LANGUAGE_MODEL_MAP.values()) | {DEFAULT_ASR_MODEL_SOURCE})
+
+
+def hub_cache_dir(bundle_dir=MODEL_BUNDLE_DIR):
+    return os.path.join(bundle_dir, "hf_cache")
+
+
+def use_offline_bundle(bundle_dir=MODEL_BUNDLE_DIR):
+    # Must run before speechbrain/transformers/huggingface_hub are imported: they read
+    # these variables once at import time
+    os.environ["HF_HUB_CACHE"] = os.path.abspath(hub_cache_dir(bundle_dir))
+    os.environ["HF_HUB_OFFLINE"] = "1"
+    os.environ["TRANSFORMERS_OFFLINE"] = "1"
+
+
+def use_online_downloads(bundle_dir=MODEL_BUNDLE_DIR):
+    os.environ["HF_HUB_CACHE"] = os.path.abspath(hub_cache_dir(bundle_dir))
+    os.environ["HF_HUB_OFFLINE"] = "0"
+    os.environ["TRANSFORMERS_OFFLINE"] = "0"
+
+
+def manifest_path(bundle_dir=MODEL_BUNDLE_DIR):
+    return os.path.join(bundle_dir, MANIFEST_NAME)
+
+
+def bundle_missing_error(bundle_dir=MODEL_BUNDLE_DIR):
+    # Cheap presence check for every job; full checksum verification is done by `warmup`
+    if os.path.exists(manifest_path(bundle_dir)):
+        return None
+    return (f"Model bundle not found at {bundle_dir}. Run `python audio_processor.py prefetch` "
+            f"on a machine with network access and copy {os.path.dirname(bundle_dir) or '.'} here.")
+
+
+def backend_unavailable_error(backend):
+    # Checked before a job starts, so a read-only bundle without the exported ONNX encoder
+    # fails at once rather than after decoding, VAD and language identification
+    if backend != "onnx":
+        return None
+    for source in ASR_SOURCES:
+        error = onnx_export_error(model_savedir(source))
+        if error:
+            return error
+    return None
+
+
+def _localize_symlinks(bundle_dir):
+    # SpeechBrain links its savedirs into the hub cache with absolute paths. Rewrite links
+    # into the bundle as relative ones and replace links leaving it with copies, so the
+    # bundle can be copied to another machine as a plain directory tree.
+    bundle_root = os.path.realpath(bundle_dir)
+    for dirpath, _, filenames in os.walk(bundle_dir):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            if not os.path.islink(path):
+                continue
+            target = os.path.realpath(path)
+            os.unlink(path)
+            if target.startswith(bundle_root + os.sep):
+                os.symlink(os.path.relpath(target, os.path.realpath(dirpath)), path)
+            else:
+                shutil.copy2(target, path)
+
+
+def write_manifest(bundle_dir=MODEL_BUNDLE_DIR, sources=None):
+    files = {}
+    for dirpath, _, filenames in os.walk(bundle_dir):
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            relative = os.path.relpath(path, bundle_dir)
+            # Links point at files that are listed themselves
+            if relative == MANIFEST_NAME or os.path.islink(path) or filename.endswith(".lock"):
+                continue
+            files[relative] = {"sha256": hash_file(path), "bytes": os.path.getsize(path)}
+    manifest = {
+        "bundle_version": MODEL_BUNDLE_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "models": {source: os.path.relpath(model_savedir(source), bundle_dir) for source in sources or all_model_sources()},
+        "language_model_map": LANGUAGE_MODEL_MAP,
+        "files": files,
+    }
+    with open(manifest_path(bundle_dir), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def verify_bundle(bundle_dir=MODEL_BUNDLE_DIR):
+    """Return a list of problems (missing or modified files); empty when the bundle is intact."""
+    missing = bundle_missing_error(bundle_dir)
+    if missing:
+        return [missing]
+    with open(manifest_path(bundle_dir), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("bundle_version") != MODEL_BUNDLE_VERSION:
+        return [f"Bundle version {manifest.get('bundle_version')} does not match {MODEL_BUNDLE_VERSION}"]
+    problems = []
+    for relative, expected in sorted(manifest["files"].items()):
+        path = os.path.join(bundle_dir, relative)
+        if not os.path.exists(path):
+            problems.append(f"missing: {relative}")
+        elif os.path.getsize(path) != expected["bytes"] or hash_file(path) != expected["sha256"]:
+            problems.append(f"checksum mismatch: {relative}")
+    return problems
+
+
+def warm_up(models, sample_rate=16000, seconds=2.0):
+    """Run one dummy inference through every resident model to initialise kernels.
+
+    Returns the seconds each model took, so slow first calls show up in deploy logs.
+    """
+    import torch
+
+    from asr_chunking import transcribe_chunked
+
+    generator = torch.Generator().manual_seed(0)
+    waveform = 0.01 * torch.randn(1, int(seconds * sample_rate), generator=generator)
+    timings = {}
+    with torch.no_grad():
+        started = time.perf_counter()
+        models.language_id().classify_batch(waveform.to(models.device))
+        timings["language_id"] = time.perf_counter() - started
+        for source in sorted(models.loaded_asr_sources()):
+            started = time.perf_counter()
+            transcribe_chunked(models.asr(source), waveform, sample_rate, device=models.device,
+                               encoder=models.asr_encoder(source))
+            timings[source] = time.perf_counter() - started
+        started = time.perf_counter()
+        models.speaker_encoder().encode_batch(waveform.to(models.device))
+        timings["speaker_encoder"] = time.perf_counter() - started
+    return {name: round(seconds, 3) for name, seconds in timings.items()}
+
+
+def prefetch(bundle_dir=MODEL_BUNDLE_DIR, backend="torch"):
+    """Download every model into the bundle, write the manifest, then warm up offline.
+
+    With the "onnx" backend the ASR encoders are exported into the bundle as well, so
+    they are covered by the manifest and jobs never export them.
+    """
+    use_online_downloads(bundle_dir)
+    os.makedirs(bundle_dir, exist_ok=True)
+    models = ModelStore(backend=backend)
+    models.preload(ASR_SOURCES)
+    _localize_symlinks(bundle_dir)
+    manifest = write_manifest(bundle_dir)
+    print(f"Wrote {len(manifest['files'])} files to {bundle_dir}", file=sys.stderr)
+    return {"bundle": bundle_dir, "files": len(manifest["files"]),
+            "bytes": sum(entry["bytes"] for entry in manifest["files"].values()),
+            "warmup_seconds": warm_up(models)}
+
+
+def warmup(bundle_dir=MODEL_BUNDLE_DIR, verify=True, quantize=None, backend="torch"):
+    """Verify the bundle and load and exercise every model, strictly offline."""
+    use_offline_bundle(bundle_dir)
+    if verify:
+        problems = verify_bundle(bundle_dir)
+        if problems:
+            return {"error": "Model bundle failed verification", "problems": problems}
+    backend_error = backend_unavailable_error(backend)
+    if backend_error:
+        return {"error": backend_error}
+
+    # With the "onnx" backend, preloading exports any ASR encoder that is still missing
+    models = ModelStore(quantize=quantize, backend=backend)
+    models.preload(ASR_SOURCES)
+    return {"bundle": bundle_dir, "verified": verify, "warmup_seconds": warm_up(models)}
+
+
+def main(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="audio_processor.py", description="Manage the offline model bundle.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    prefetch_parser = subcommands.add_parser("prefetch", help="Download every model into the versioned bundle and write its manifest.")
+    prefetch_parser.add_argument("--backend", choices=BACKENDS, default="torch", help="Also prepare this ASR encoder backend (onnx exports the encoders into the bundle).")
+    warmup_parser = subcommands.add_parser("warmup", help="Verify the bundle checksums and run one dummy inference per model.")
+    warmup_parser.add_argument("--skip-verify", action="store_true", help="Do not re-hash the bundle files.")
+    warmup_parser.add_argument("--quantize", choices=QUANTIZE_MODES, help="Warm up the quantized models.")
+    warmup_parser.add_argument("--backend", choices=BACKENDS, default="torch", help="Warm up this ASR encoder backend (onnx also exports the encoder).")
+    args = parser.parse_args(argv)
+
+    if args.command == "prefetch":
+        result = prefetch(backend=args.backend)
+    else:
+        result = warmup(verify=not args.skip_verify, quantize=args.quantize, backend=args.backend)
+    print(json.dumps(result, indent=2))
+    return 1 if "error" in result else 0
@@ -0,0 +1,236 @@
+# Model loading for the audio pipeline.
+# Each SpeechBrain model is deserialized on first use and then kept resident, so a
+# long-running worker (audio_processor.py --serve) pays the from_hparams cost once
+# instead of once per upload.
+# SpeechBrain and torch are only imported once a model is actually needed, so the
+# constants here can be used (e.g. for cache keys) without paying for them.
+import gc
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+from quantization import quantize_model
+
+# Models are loaded from a versioned local bundle (see model_bundle.py); bump the version
+# when the set of models or their layout changes so stale bundles are not picked up
+MODEL_BUNDLE_VERSION = "1"
+MODEL_BUNDLE_DIR = os.path.join(os.environ.get("AUDIO_PROCESSOR_MODEL_DIR", "pretrained_models"),
+                                f"v{MODEL_BUNDLE_VERSION}")
+
+LID_MODEL_SOURCE = "speechbrain/lang-id-commonlanguage_ecapa"
+SPEAKER_MODEL_SOURCE = "speechbrain/spkrec-ecapa-voxceleb"
+DEFAULT_ASR_MODEL_SOURCE = "speechbrain/asr-wav2vec2-commonvoice-en"
+
+# Map language codes to appropriate ASR models
+LANGUAGE_MODEL_MAP = {
+    "en": "speechbrain/asr-wav2vec2-commonvoice-en",
+    "ko": "speechbrain/asr-wav2vec2-commonvoice-en",  # Replace with Korean model when available
+    "ja": "speechbrain/asr-wav2vec2-commonvoice-en",  # Replace with Japanese model when available
+    "zh": "speechbrain/asr-wav2vec2-commonvoice-en",  # Replace with Chinese model when available
+    # Add more language-specific models as needed
+}
+
+
+# ASR pool limits for multilingual workers (a budget of 0 means no memory limit)
+DEFAULT_MAX_ASR_MODELS = 2
+MAX_ASR_MODELS_ENV = "AUDIO_PROCESSOR_MAX_ASR_MODELS"
+ASR_MEMORY_MB_ENV = "AUDIO_PROCESSOR_ASR_MEMORY_MB"
+
+
+def model_savedir(source):
+    return os.path.join(MODEL_BUNDLE_DIR, source.split('/')[-1])
+
+
+def all_model_sources():
+    # Every model any job can need, i.e. the contents of a complete bundle
+    return sorted(set(LANGUAGE_MODEL_MAP.values()) | {DEFAULT_ASR_MODEL_SOURCE, LID_MODEL_SOURCE, SPEAKER_MODEL_SOURCE})
+
+
+def asr_source_for_language(language):
+    if language in LANGUAGE_MODEL_MAP:
+        return LANGUAGE_MODEL_MAP[language]
+    print(f"No specific model for {language}, using default English model", file=sys.stderr)
+    return DEFAULT_ASR_MODEL_SOURCE
+
+
+def model_sources_for(language):
+    # Every model whose weights can influence the result for a job in `language`
+    if language == "auto":
+        return all_model_sources()
+    return sorted({LANGUAGE_MODEL_MAP.get(language, DEFAULT_ASR_MODEL_SOURCE), SPEAKER_MODEL_SOURCE})
+
+
+def module_nbytes(model):
+    # Parameter and buffer bytes of a SpeechBrain model (or any torch module)
+    module = getattr(model, "mods", model)
+    tensors = list(module.parameters()) + list(module.buffers())
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+
+class ModelPool:
+    """Keeps up to `max_models` models resident, evicting the least recently used.
+
+    Room for a new model is made before it is loaded, so the count limit holds even while
+    loading. With `max_bytes`, models are also evicted after a load until the resident
+    total fits the budget (the model just requested is always kept). `on_evict(key)` lets
+    owners drop state derived from an evicted model.
+    """
+
+    def __init__(self, max_models=DEFAULT_MAX_ASR_MODELS, max_bytes=None, size_of=module_nbytes, on_evict=None):
+        self.max_models = max(1, max_models)
+        self.max_bytes = max_bytes
+        self.size_of = size_of
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._models = OrderedDict()  # key -> (model, nbytes), least recently used first
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        return key in self._models
+
+    def keys(self):
+        return list(self._models)
+
+    @property
+    def resident_bytes(self):
+        return sum(nbytes for _, nbytes in self._models.values())
+
+    def get(self, key, load):
+        with self._lock:
+            if key in self._models:
+                self.hits += 1
+                self._models.move_to_end(key)
+                return self._models[key][0]
+            self.misses += 1
+            self._evict(max_models=self.max_models - 1)
+            model = load()
+            self._models[key] = (model, self.size_of(model))
+            self._evict(max_models=self.max_models, keep=key)
+            return model
+
+    def _evict(self, max_models, keep=None):
+        evicted = False
+        while self._models and (
+                len(self._models) > max_models
+                or (self.max_bytes and self.resident_bytes > self.max_bytes)):
+            key = next((k for k in self._models if k != keep), None)
+            if key is None:
+                break
+            del self._models[key]
+            evicted = True
+            self.evictions += 1
+            print(f"Evicted model {key} from the pool", file=sys.stderr)
+            if self.on_evict is not None:
+                self.on_evict(key)
+        if evicted:
+            gc.collect()  # release the weights now, before the next load
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "resident": self.keys(),
+            "resident_mb": round(self.resident_bytes / (1024 * 1024), 1),
+        }
+
+
+class ModelStore:
+    """Lazily loads the LID, ASR and speaker models and keeps them resident."""
+
+    def __init__(self, device=None, quantize=None, backend="torch", max_asr_models=None, asr_memory_mb=None):
+        import torch
+
+        self.device = device or torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        # Dynamic int8 quantization only has CPU kernels
+        if quantize and self.device.type != "cpu":
+            print(f"Ignoring --quantize {quantize}: quantized models only run on the CPU", file=sys.stderr)
+            quantize = None
+        self.quantize = quantize
+        self.backend = backend
+        self._asr_encoders = {}
+        self._language_id = None
+        self._speaker_encoder = None
+        # Per-language ASR models share a bounded pool so language switches reuse resident
+        # models without letting a multilingual worker grow without limit
+        if max_asr_models is None:
+            max_asr_models = int(os.environ.get(MAX_ASR_MODELS_ENV, DEFAULT_MAX_ASR_MODELS))
+        if asr_memory_mb is None:
+            asr_memory_mb = float(os.environ.get(ASR_MEMORY_MB_ENV, 0))
+        self._asr_models = ModelPool(max_asr_models, int(asr_memory_mb * 1024 * 1024) or None,
+                                     on_evict=self._drop_asr_model)
+
+    def language_id(self):
+        if self._language_id is None:
+            from speechbrain.pretrained import EncoderClassifier
+
+            self._language_id = EncoderClassifier.from_hparams(
+                source=LID_MODEL_SOURCE,
+                savedir=model_savedir(LID_MODEL_SOURCE)
+            )
+            self._language_id.to(self.device)
+        return self._language_id
+
+    def asr(self, source=DEFAULT_ASR_MODEL_SOURCE):
+        return self._asr_models.get(source, lambda: self._load_asr(source))
+
+    def _load_asr(self, source):
+        from speechbrain.pretrained import EncoderDecoderASR
+
+        asr_model = EncoderDecoderASR.from_hparams(
+            source=source,
+            savedir=model_savedir(source)
+        )
+        asr_model.to(self.device)
+        # The ONNX backend exports the fp32 encoder; quantized layers do not export
+        if self.quantize and self.backend == "torch":
+            quantize_model(asr_model, model_savedir(source), self.quantize)
+        return asr_model
+
+    def _drop_asr_model(self, source):
+        # The backend wraps (or was exported from) the evicted model
+        self._asr_encoders.pop(source, None)
+        if self.device.type == "cuda":
+            import torch
+
+            torch.cuda.empty_cache()
+
+    def loaded_asr_sources(self):
+        return self._asr_models.keys()
+
+    def pool_stats(self):
+        return self._asr_models.stats()
+
+    def asr_encoder(self, source=DEFAULT_ASR_MODEL_SOURCE):
+        # Inference backend running the acoustic encoder of the ASR model for `source`
+        # Does not count as a pool hit when the model is already resident
+        if source in self._asr_encoders and source in self._asr_models:
+            return self._asr_encoders[source]
+        from inference_backends import create_encoder
+
+        self._asr_encoders[source] = create_encoder(self.backend, self.asr(source), model_savedir(source))
+        return self._asr_encoders[source]
+
+    def speaker_encoder(self):
+        # ECAPA speaker embeddings; diarization clusters them on the in-memory waveform
+        if self._speaker_encoder is None:
+            from speechbrain.pretrained import EncoderClassifier
+
+            self._speaker_encoder = EncoderClassifier.from_hparams(
+                source=SPEAKER_MODEL_SOURCE,
+                savedir=model_savedir(SPEAKER_MODEL_SOURCE),
+                run_opts={"device": str(self.device)}  # Ensure model runs on the correct device
+            )
+            if self.quantize:
+                quantize_model(self._speaker_encoder, model_savedir(SPEAKER_MODEL_SOURCE), self.quantize)
+        return self._speaker_encoder
+
+    def preload(self, asr_sources=(DEFAULT_ASR_MODEL_SOURCE,)):
+        # Load everything a typical job touches so the first request is not slow either
+        self.language_id()
+        for source in asr_sources:
+            self.asr_encoder(source)
+        self.speaker_encoder()
@@ -0,0 +1,136 @@
+# Per-stage profiling for the audio pipeline.
+# Records wall time, CPU time (all threads), the process peak RSS and the processing
+# speed in audio-seconds per second for every stage, and can export a Chrome trace
+# (chrome://tracing or https://ui.perfetto.dev) for a visual timeline.
+# CPU time is only measurable for the whole process, so stages that run at the same time
+# on different threads (ASR and speaker embeddings, per-channel ASR) cannot be told apart:
+# they report no CPU time of their own, and one extra entry for the group of overlapping
+# stages carries the CPU time they used together.
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+class StageProfiler:
+    def __init__(self):
+        self.audio_seconds = None
+        self.stages = []
+        self._origin = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            self.stages.append({
+                "stage": name,
+                "start": wall_start - self._origin,
+                "wall_seconds": time.perf_counter() - wall_start,
+                "cpu_start": cpu_start,
+                "cpu_end": time.process_time(),
+                "peak_rss_mb": peak_rss_mb(),  # process high-water mark at the end of the stage
+                "thread": threading.get_ident(),
+            })
+
+    def concurrent_groups(self):
+        """Indices into `stages` of every group of stages that overlapped on different threads."""
+        group_of = list(range(len(self.stages)))
+
+        def root(i):
+            while group_of[i] != i:
+                i = group_of[i]
+            return i
+
+        for i, a in enumerate(self.stages):
+            for j in range(i + 1, len(self.stages)):
+                b = self.stages[j]
+                if (a["thread"] != b["thread"] and a["start"] < b["start"] + b["wall_seconds"]
+                        and b["start"] < a["start"] + a["wall_seconds"]):
+                    group_of[root(j)] = root(i)
+        groups = {}
+        for i in range(len(self.stages)):
+            groups.setdefault(root(i), []).append(i)
+        return [members for members in groups.values() if len(members) > 1]
+
+    def _entry(self, name, wall_seconds, cpu_seconds, peak_rss_mb):
+        entry = {
+            "stage": name,
+            "wall_seconds": round(wall_seconds, 4),
+            "cpu_seconds": None if cpu_seconds is None else round(cpu_seconds, 4),
+            "peak_rss_mb": peak_rss_mb,
+        }
+        if self.audio_seconds and wall_seconds > 0:
+            entry["audio_seconds_per_second"] = round(self.audio_seconds / wall_seconds, 2)
+        return entry
+
+    def report(self):
+        group_ends = {}
+        concurrent = {}
+        for members in self.concurrent_groups():
+            stages = sorted((self.stages[i] for i in members), key=lambda stage: stage["start"])
+            name = "+".join(stage["stage"] for stage in stages)
+            last = max(stages, key=lambda stage: stage["start"] + stage["wall_seconds"])
+            start = min(stage["start"] for stage in stages)
+            # The peak RSS only grows, so the group's is the one of the stage that ended last
+            group = self._entry(name, last["start"] + last["wall_seconds"] - start,
+                                max(stage["cpu_end"] for stage in stages) - min(stage["cpu_start"] for stage in stages),
+                                last["peak_rss_mb"])
+            group["concurrent_stages"] = [stage["stage"] for stage in stages]
+            group_ends[members[-1]] = group
+            concurrent.update((i, name) for i in members)
+
+        report = []
+        for i, stage in enumerate(self.stages):
+            cpu_seconds = None if i in concurrent else stage["cpu_end"] - stage["cpu_start"]
+            entry = self._entry(stage["stage"], stage["wall_seconds"], cpu_seconds, stage["peak_rss_mb"])
+            if i in concurrent:
+                entry["concurrent_group"] = concurrent[i]
+            report.append(entry)
+            if i in group_ends:
+                report.append(group_ends[i])
+        return report
+
+    def write_chrome_trace(self, path):
+        pid = os.getpid()
+        concurrent = {i for members in self.concurrent_groups() for i in members}
+        trace_events = [{
+            "name": stage["stage"],
+            "ph": "X",
+            "ts": round(stage["start"] * 1e6),
+            "dur": round(stage["wall_seconds"] * 1e6),
+            "pid": pid,
+            "tid": stage["thread"],
+            "args": {
+                # process-wide, so meaningless for a stage that overlapped others
+                "cpu_seconds": None if i in concurrent else round(stage["cpu_end"] - stage["cpu_start"], 4),
+                "peak_rss_mb": stage["peak_rss_mb"],
+            },
+        } for i, stage in enumerate(self.stages)]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+
+
+@contextmanager
+def pipeline_stage(events, profiler, name, **fields):
+    # One stage boundary feeds both the progress events and the profiler
+    with events.stage(name, **fields):
+        with profiler.stage(name) if profiler is not None else nullcontext():
+            yield
@@ -0,0 +1,77 @@
+# Dynamic int8 quantization of the CPU models.
+# The linear layers of the loaded SpeechBrain models (most of wav2vec2's compute; the
+# classifier head of ECAPA) are swapped for int8 dynamically-quantized versions. The
+# quantized weights are saved next to the fp32 checkpoint in pretrained_models/; later
+# loads only swap in empty int8 layers and read the weights back instead of quantizing again.
+import os
+import sys
+
+QUANTIZE_MODES = ("int8",)
+
+
+def quantized_weights_path(savedir, mode="int8"):
+    return os.path.join(savedir, f"quantized_{mode}.pt")
+
+
+def _swap_in_empty_int8_linears(module):
+    """Replace every nn.Linear under `module` like quantize_dynamic does, but without weights.
+
+    Returns (parent, name, original) for every swapped layer so the swap can be undone.
+    """
+    import torch
+    from torch.ao.nn.quantized.dynamic import Linear as DynamicLinear
+
+    swapped = []
+    for parent in list(module.modules()):
+        for name, child in list(parent.named_children()):
+            # quantize_dynamic only matches the exact type, not subclasses
+            if type(child) is torch.nn.Linear:
+                setattr(parent, name, DynamicLinear(child.in_features, child.out_features,
+                                                    bias_=child.bias is not None, dtype=torch.qint8))
+                swapped.append((parent, name, child))
+    return swapped
+
+
+def _shapes(value):
+    # Packed int8 layers load whatever weights they are given, so fit is checked up front
+    if hasattr(value, "shape"):
+        return tuple(value.shape)
+    if isinstance(value, (tuple, list)):
+        return tuple(_shapes(item) for item in value)
+    if isinstance(value, dict):
+        return {key: _shapes(item) for key, item in value.items()}
+    return value
+
+
+def quantize_model(model, savedir, mode="int8"):
+    """Quantize the modules of a loaded SpeechBrain model in place and return it."""
+    import torch
+    from torch.ao.quantization import quantize_dynamic
+
+    if mode not in QUANTIZE_MODES:
+        raise ValueError(f"Unsupported quantization mode: {mode}")
+
+    path = quantized_weights_path(savedir, mode)
+    if os.path.exists(path):
+        swapped = _swap_in_empty_int8_linears(model.mods)
+        try:
+            state_dict = torch.load(path, map_location="cpu")
+            if _shapes(dict(state_dict)) != _shapes(dict(model.mods.state_dict())):
+                raise ValueError("layer shapes do not match the model")
+            model.mods.load_state_dict(state_dict)
+            return model
+        except Exception as e:
+            print(f"Ignoring stale quantized weights at {path}: {str(e)}", file=sys.stderr)
+            for parent, name, original in swapped:
+                setattr(parent, name, original)
+
+    # Swap nn.Linear for its dynamic int8 counterpart, quantizing the fp32 weights
+    quantize_dynamic(model.mods, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    try:
+        os.makedirs(savedir, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        torch.save(model.mods.state_dict(), tmp_path)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Could not cache quantized weights: {str(e)}", file=sys.stderr)
+    return model
@@ -0,0 +1,150 @@
+# Content-addressed on-disk cache for audio processing results.
+# Entries are keyed by a streaming SHA-256 of the audio bytes; each entry holds the final
+# JSON for every (language, model, options) combination seen for that audio, plus
+# intermediate artifacts (VAD regions, speaker embeddings) that later runs can reuse.
+# The cache is bounded in size and evicts least-recently-used entries.
+#
+# This module only needs the standard library (NumPy is imported for artifacts only),
+# so a cache hit returns without importing torch.
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+
+# Bump whenever a pipeline change alters results or artifacts; old entries then go stale
+PIPELINE_VERSION = "6"
+
+DEFAULT_CACHE_DIR = os.environ.get("AUDIO_PROCESSOR_CACHE_DIR", "audio_cache")
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+_LAST_USED_MARKER = ".last_used"
+
+
+def hash_file(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def result_key(language, model_sources, options):
+    # Identifies one result for a given audio entry
+    payload = json.dumps({"language": language, "models": sorted(model_sources), "options": options}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def result_id(audio_hash, key):
+    # Names one cached result, so its speakers can be enrolled later without the caller
+    # ever holding the voiceprints
+    return f"{audio_hash}.{key}"
+
+
+def parse_result_id(value):
+    """Return (audio_hash, key) of a result_id; raises ValueError for anything else."""
+    match = re.fullmatch(r"([0-9a-f]{64})\.([0-9a-f]{32})", value)
+    if match is None:
+        raise ValueError(f"Not a result id: {value!r}")
+    return match.group(1), match.group(2)
+
+
+def _atomic_write(path, write):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class ResultCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = os.path.join(cache_dir, f"v{PIPELINE_VERSION}")
+        self.max_bytes = max_bytes
+
+    def _entry_dir(self, audio_hash):
+        return os.path.join(self.root, audio_hash[:2], audio_hash)
+
+    def _touch(self, audio_hash):
+        marker = os.path.join(self._entry_dir(audio_hash), _LAST_USED_MARKER)
+        with open(marker, "a"):
+            pass
+        os.utime(marker, None)
+
+    def get_result(self, audio_hash, key):
+        path = os.path.join(self._entry_dir(audio_hash), "results", f"{key}.json")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._touch(audio_hash)
+        return result
+
+    def put_result(self, audio_hash, key, result):
+        results_dir = os.path.join(self._entry_dir(audio_hash), "results")
+        os.makedirs(results_dir, exist_ok=True)
+        payload = json.dumps(result).encode("utf-8")
+        _atomic_write(os.path.join(results_dir, f"{key}.json"), lambda f: f.write(payload))
+        self._touch(audio_hash)
+        self.evict()
+
+    def get_artifact(self, audio_hash, name):
+        import numpy as np
+
+        path = os.path.join(self._entry_dir(audio_hash), f"{name}.npy")
+        try:
+            array = np.load(path)
+        except (OSError, ValueError):
+            return None
+        self._touch(audio_hash)
+        return array
+
+    def put_artifact(self, audio_hash, name, array):
+        import numpy as np
+
+        entry_dir = self._entry_dir(audio_hash)
+        os.makedirs(entry_dir, exist_ok=True)
+        _atomic_write(os.path.join(entry_dir, f"{name}.npy"), lambda f: np.save(f, array))
+        self._touch(audio_hash)
+
+    def _entries(self):
+        if not os.path.isdir(self.root):
+            return
+        for prefix in os.listdir(self.root):
+            prefix_dir = os.path.join(self.root, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for audio_hash in os.listdir(prefix_dir):
+                yield os.path.join(prefix_dir, audio_hash)
+
+    def evict(self):
+        """Delete least-recently-used entries until the cache fits in `max_bytes`."""
+        entries = []
+        total = 0
+        for entry_dir in self._entries():
+            size = 0
+            for dirpath, _, filenames in os.walk(entry_dir):
+                for filename in filenames:
+                    try:
+                        size += os.path.getsize(os.path.join(dirpath, filename))
+                    except OSError:
+                        pass
+            marker = os.path.join(entry_dir, _LAST_USED_MARKER)
+            last_used = os.path.getmtime(marker) if os.path.exists(marker) else 0.0
+            entries.append((last_used, size, entry_dir))
+            total += size
+
+        entries.sort()
+        for _, size, entry_dir in entries:
+            if total <= self.max_bytes:
+                break
+            # Another worker may be evicting the same entry concurrently
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+
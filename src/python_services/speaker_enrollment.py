@@ -0,0 +1,155 @@
+# Cross-meeting speaker enrollment index.
+#   python audio_processor.py enroll result.json "Speaker 1=Alice" "Speaker 2=Bob"
+#   python audio_processor.py enroll --from-cache <result_id> "Speaker 1=Alice"
+# Every result carries one ECAPA centroid per detected speaker ("speaker_embeddings").
+# Enrolling appends the L2-normalized centroids of the named speakers as float32 rows to
+# `embeddings.f32` and their names to the ID table `speakers.json`; row i belongs to
+# names[i]. Jobs run with --enrollment-dir memory-map the matrix and match the speakers
+# of the new meeting against it with a blocked cosine search, so the speaker manager
+# opens with the names pre-filled ("speaker_names") even with tens of thousands of voices.
+import json
+import os
+
+import numpy as np
+
+from clustering import normalize_rows
+
+DEFAULT_ENROLLMENT_DIR = os.environ.get("AUDIO_PROCESSOR_ENROLLMENT_DIR", "speaker_enrollment")
+DEFAULT_MATCH_THRESHOLD = 0.5
+SEARCH_BLOCK_ROWS = 65536
+
+MATRIX_NAME = "embeddings.f32"
+TABLE_NAME = "speakers.json"
+
+
+class SpeakerIndex:
+    def __init__(self, directory=DEFAULT_ENROLLMENT_DIR):
+        self.directory = directory
+        self.matrix_path = os.path.join(directory, MATRIX_NAME)
+        self.table_path = os.path.join(directory, TABLE_NAME)
+        self.dim = None
+        self.names = []
+        self._matrix = None
+        try:
+            with open(self.table_path, "r", encoding="utf-8") as f:
+                table = json.load(f)
+            self.dim, self.names = table["dim"], table["names"]
+        except FileNotFoundError:
+            pass
+
+    def __len__(self):
+        return len(self.names)
+
+    def matrix(self):
+        """The enrolled vectors as a read-only (rows, dim) float32 memory map."""
+        if not self.names:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        if self._matrix is None:
+            # The ID table is written last, so rows past its length are an interrupted append
+            self._matrix = np.memmap(self.matrix_path, dtype=np.float32, mode="r", shape=(len(self.names), self.dim))
+        return self._matrix
+
+    def enroll(self, names, embeddings):
+        """Append one normalized row per (name, embedding) pair."""
+        vectors = normalize_rows(np.atleast_2d(embeddings))
+        if len(names) != vectors.shape[0]:
+            raise ValueError("Every enrolled embedding needs exactly one name")
+        if self.dim is not None and vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the index ({self.dim})")
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._matrix = None
+        with open(self.matrix_path, "ab") as f:
+            f.truncate(len(self.names) * vectors.shape[1] * 4)
+            f.write(vectors.tobytes())
+        self.dim = vectors.shape[1]
+        self.names = self.names + list(names)
+        tmp_path = f"{self.table_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "names": self.names}, f)
+        os.replace(tmp_path, self.table_path)
+
+    def search(self, queries, block_rows=SEARCH_BLOCK_ROWS):
+        """Best enrolled row and its cosine similarity for every query vector.
+
+        The matrix is scanned in blocks of `block_rows`, so memory stays bounded by
+        (queries, block_rows) however many voices are enrolled. Returns (rows, scores);
+        rows are -1 when the index is empty.
+        """
+        queries = normalize_rows(np.atleast_2d(queries))
+        best_rows = np.full(queries.shape[0], -1, dtype=np.int64)
+        best_scores = np.full(queries.shape[0], -np.inf, dtype=np.float32)
+        matrix = self.matrix()
+        for start in range(0, matrix.shape[0], block_rows):
+            scores = queries @ np.asarray(matrix[start:start + block_rows]).T
+            rows = scores.argmax(axis=1)
+            block_best = scores[np.arange(queries.shape[0]), rows]
+            better = block_best > best_scores
+            best_rows[better] = rows[better] + start
+            best_scores[better] = block_best[better]
+        return best_rows, best_scores
+
+    def suggest_names(self, speaker_embeddings, threshold=DEFAULT_MATCH_THRESHOLD):
+        """Map detected speaker labels ("Speaker 1") to enrolled names they match.
+
+        A name is suggested for at most one speaker of a meeting, the closest one.
+        """
+        if not self.names or not speaker_embeddings:
+            return {}
+        labels = list(speaker_embeddings)
+        rows, scores = self.search([speaker_embeddings[label] for label in labels])
+        suggestions = {}
+        taken = set()
+        for i in np.argsort(-scores):
+            name = self.names[rows[i]]
+            if scores[i] >= threshold and name not in taken:
+                suggestions[labels[i]] = name
+                taken.add(name)
+        return suggestions
+
+
+def main(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="audio_processor.py enroll",
+                                     description="Enroll named speakers of a processed meeting for future meetings.")
+    parser.add_argument("result", help="Result JSON of a processed meeting (carries \"speaker_embeddings\"), "
+                                       "or with --from-cache the \"result_id\" of a cached result.")
+    parser.add_argument("assignments", nargs="+", metavar="LABEL=NAME", help="e.g. \"Speaker 1=Alice\".")
+    parser.add_argument("--enrollment-dir", default=DEFAULT_ENROLLMENT_DIR, help="Directory of the enrollment index.")
+    parser.add_argument("--from-cache", action="store_true",
+                        help="Read the result from the result cache, so the voiceprints never leave the server.")
+    parser.add_argument("--cache-dir", default=None, help="Result cache directory for --from-cache.")
+    args = parser.parse_args(argv[1:])
+
+    if args.from_cache:
+        from result_cache import DEFAULT_CACHE_DIR, ResultCache, parse_result_id
+
+        try:
+            audio_hash, key = parse_result_id(args.result)
+        except ValueError as e:
+            print(json.dumps({"error": str(e)}))
+            return 1
+        result = ResultCache(args.cache_dir or DEFAULT_CACHE_DIR).get_result(audio_hash, key)
+        if result is None:
+            print(json.dumps({"error": f"No cached result {args.result!r}; process the meeting again"}))
+            return 1
+    else:
+        with open(args.result, "r", encoding="utf-8") as f:
+            result = json.load(f)
+    speaker_embeddings = result.get("speaker_embeddings", {})
+    names, embeddings = [], []
+    for assignment in args.assignments:
+        label, _, name = assignment.partition("=")
+        if not name.strip():
+            parser.error(f"Expected LABEL=NAME, got {assignment!r}")
+        if label not in speaker_embeddings:
+            print(json.dumps({"error": f"No embedding for {label!r} in {args.result}"}))
+            return 1
+        names.append(name.strip())
+        embeddings.append(speaker_embeddings[label])
+
+    index = SpeakerIndex(args.enrollment_dir)
+    index.enroll(names, embeddings)
+    print(json.dumps({"enrolled": names, "total": len(index)}, indent=2))
+    return 0
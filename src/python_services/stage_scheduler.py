@@ -0,0 +1,37 @@
+# Concurrent execution of independent pipeline stages.
+# ASR decoding and speaker-embedding extraction both only read the speech waveform, so they
+# run side by side and the pipeline joins them again at alignment. The torch intra-op
+# threads are split between the stages so together they do not oversubscribe the CPU.
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+def run_stages(tasks, concurrent=True, total_threads=None):
+    """Run the zero-argument callables in `tasks` and return one completed Future per task.
+
+    With `concurrent` and at least two intra-op threads to share, each task runs on its own
+    thread; otherwise the tasks run in order on the calling thread. Exceptions stay in the
+    futures so callers can handle each stage's failure separately.
+    """
+    import torch
+
+    total_threads = total_threads or torch.get_num_threads()
+    if not concurrent or len(tasks) < 2 or total_threads < 2:
+        futures = []
+        for task in tasks:
+            future = Future()
+            try:
+                future.set_result(task())
+            except Exception as e:
+                future.set_exception(e)
+            futures.append(future)
+        return futures
+
+    # torch keeps one process-wide intra-op pool size, so it cannot be set per stage;
+    # shrinking it while the stages overlap gives each stage's ops an equal share of the cores
+    torch.set_num_threads(max(1, total_threads // len(tasks)))
+    try:
+        with ThreadPoolExecutor(max_workers=len(tasks), thread_name_prefix="stage") as executor:
+            futures = [executor.submit(task) for task in tasks]
+    finally:
+        torch.set_num_threads(total_threads)
+    return futures
@@ -0,0 +1,111 @@
+# Energy-based voice activity detection.
+# Finds the voiced regions of a recording so that LID, ASR and diarization only see
+# speech, and maps times on the condensed (speech-only) timeline back to the original.
+import numpy as np
+
+from diarization import run_length_encode
+
+
+def frame_energy_db(signal, frame_samples):
+    num_frames = signal.shape[0] // frame_samples
+    frames = np.asarray(signal[:num_frames * frame_samples], dtype=np.float32).reshape(num_frames, frame_samples)
+    # einsum avoids a squared copy of the whole recording
+    power = np.einsum("ij,ij->i", frames, frames) / frame_samples
+    return 10.0 * np.log10(power + 1e-10)
+
+
+NOISE_BLOCK_FRAMES = 16
+
+
+def noise_floor(energy, block_frames=NOISE_BLOCK_FRAMES):
+    """Level of the quietest stretch of the recording (minimum statistics).
+
+    Every block of `block_frames` frames is levelled by its median, so clicks and single
+    quiet frames do not count, and the quietest block is the floor. Unlike a fixed
+    percentile of all frames this stays on the background noise however little of the
+    recording is silent, so a quieter speaker is never taken for noise; a floor that
+    is too low only lets more noise through, which `floor_db` bounds.
+    """
+    num_blocks = max(1, energy.size // block_frames)
+    blocks = energy[:max(block_frames, num_blocks * block_frames)].reshape(num_blocks, -1)
+    return float(np.median(blocks, axis=1).min())
+
+
+def voiced_frames(energy, threshold_db=12.0, floor_db=-55.0):
+    """Frames `threshold_db` above the noise floor and above `floor_db`."""
+    return energy > max(noise_floor(energy) + threshold_db, floor_db)
+
+
+def frames_to_regions(voiced, frame_samples, num_samples, sample_rate, min_speech=0.25, min_silence=0.4,
+                      padding=0.2):
+    """Turn per-frame voiced flags into an (N, 2) int64 array of [start, end) sample ranges.
+
+    Pauses shorter than `min_silence` are bridged, blips shorter than `min_speech` dropped,
+    and every region is padded by `padding` seconds so word onsets are not clipped.
+    """
+    if voiced.size == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    frame_seconds = frame_samples / sample_rate
+    voiced, starts, ends = run_length_encode(voiced)
+
+    # Bridge short pauses by flipping them to voiced, then re-encode
+    short_silence = ~voiced & ((ends - starts) * frame_seconds < min_silence)
+    short_silence[0] = short_silence[-1] = False  # leading/trailing silence is never bridged
+    voiced = voiced | short_silence
+    flags = np.repeat(voiced, ends - starts)
+    voiced, starts, ends = run_length_encode(flags)
+
+    keep = voiced & ((ends - starts) * frame_seconds >= min_speech)
+    pad = int(padding * sample_rate)
+    regions = np.stack((starts[keep] * frame_samples - pad, ends[keep] * frame_samples + pad), axis=1)
+    regions = np.clip(regions, 0, num_samples).astype(np.int64)
+    if regions.shape[0] < 2:
+        return regions
+
+    # Padding can make neighbours overlap; merge them
+    overlapping = regions[1:, 0] <= regions[:-1, 1]
+    new_region = np.concatenate(([True], ~overlapping))
+    first = np.flatnonzero(new_region)
+    last = np.concatenate((first[1:], [regions.shape[0]])) - 1
+    return np.stack((regions[first, 0], regions[last, 1]), axis=1)
+
+
+def detect_speech_regions(signal, sample_rate, frame_seconds=0.03, threshold_db=12.0, floor_db=-55.0,
+                          min_speech=0.25, min_silence=0.4, padding=0.2):
+    """Return an (N, 2) int64 array of [start, end) sample ranges containing speech.
+
+    A frame is voiced when its energy is `threshold_db` above the recording's noise floor
+    (see noise_floor) and above the absolute `floor_db`; see
+    frames_to_regions for how voiced frames become regions.
+    """
+    frame_samples = max(1, int(frame_seconds * sample_rate))
+    energy = frame_energy_db(signal, frame_samples)
+    if energy.size == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    return frames_to_regions(voiced_frames(energy, threshold_db, floor_db), frame_samples, signal.shape[0],
+                             sample_rate, min_speech, min_silence, padding)
+
+
+class SpeechTimeline:
+    """Maps times on the speech-only timeline back onto the original recording."""
+
+    def __init__(self, regions, sample_rate):
+        self.regions = np.asarray(regions, dtype=np.int64).reshape(-1, 2)
+        self.sample_rate = sample_rate
+        lengths = self.regions[:, 1] - self.regions[:, 0]
+        self._condensed_starts = np.concatenate(([0], np.cumsum(lengths)[:-1])) / sample_rate
+        self._original_starts = self.regions[:, 0] / sample_rate
+
+    @property
+    def speech_seconds(self):
+        return float((self.regions[:, 1] - self.regions[:, 0]).sum()) / self.sample_rate
+
+    def to_original(self, times, ends=False):
+        # A time sitting exactly on a join belongs to the following region when it starts
+        # something and to the preceding one when it ends something (`ends=True`)
+        times = np.asarray(times, dtype=np.float64)
+        if self.regions.shape[0] == 0:
+            return times
+        index = np.searchsorted(self._condensed_starts, times, side="left" if ends else "right") - 1
+        index = np.clip(index, 0, self.regions.shape[0] - 1)
+        return self._original_starts[index] + (times - self._condensed_starts[index])
@@ -0,0 +1,24 @@
+import pytest
+
+
+@pytest.fixture
+def speaker_embeddings():
+    """Build synthetic window embeddings: one noisy sample of a fixed voice per name in a sequence."""
+    np = pytest.importorskip("numpy")
+
+    def make(sequence, dims=192, seed=0):
+        rng = np.random.default_rng(seed)
+        voices = {name: rng.normal(size=dims) for name in sorted(set(sequence))}
+        return np.array([voices[name] + 0.3 * rng.normal(size=dims) for name in sequence], dtype=np.float32)
+
+    return make
+
+
+@pytest.fixture
+def mean_encoder():
+    """Speaker encoder stand-in whose embedding of a window is the window's mean sample."""
+    class MeanEncoder:
+        def encode_batch(self, batch):
+            return batch.mean(dim=1, keepdim=True).unsqueeze(1)
+
+    return MeanEncoder()
@@ -0,0 +1,70 @@
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "src", "python_services"))
+
+from alignment import (assign_words_to_turns, ctc_forced_align, stitch_timed_words,
+                       tokens_to_words, words_to_segments)
+
+
+def _log_probs(frame_tokens, vocab_size):
+    # Peaky emissions: each frame strongly prefers the given token
+    probs = np.full((len(frame_tokens), vocab_size), 0.01)
+    probs[np.arange(len(frame_tokens)), frame_tokens] = 1.0
+    return np.log(probs / probs.sum(axis=1, keepdims=True))
+
+
+def test_ctc_forced_align_recovers_token_spans():
+    # blank=0; tokens 3, 3, 5 (repeated token needs a blank in between)
+    log_probs = _log_probs([0, 3, 3, 0, 3, 0, 0, 5, 5, 0], vocab_size=6)
+    starts, ends = ctc_forced_align(log_probs, [3, 3, 5], blank_id=0)
+    assert starts.tolist() == [1, 4, 7]
+    assert ends.tolist() == [3, 5, 9]
+
+
+def test_ctc_forced_align_rejects_impossible_sequence():
+    with pytest.raises(ValueError):
+        ctc_forced_align(_log_probs([0, 1], vocab_size=3), [1, 1, 1], blank_id=0)
+
+
+def test_tokens_to_words_joins_sentencepiece_pieces():
+    words, starts, ends = tokens_to_words(["▁HEL", "LO", "▁", "WORLD"], [0, 2, 5, 6], [2, 4, 6, 9])
+    assert words == ["HELLO", "WORLD"]
+    assert starts.tolist() == [0, 6]
+    assert ends.tolist() == [4, 9]
+
+
+def test_assign_words_to_turns_uses_midpoints_and_nearest_turn_in_gaps():
+    turn_starts, turn_ends = np.array([0.0, 5.0]), np.array([4.0, 9.0])
+    word_starts = np.array([0.5, 3.8, 4.3, 4.6, 8.0])
+    word_ends = np.array([1.0, 4.2, 4.5, 4.9, 8.5])
+    assert assign_words_to_turns(word_starts, word_ends, turn_starts, turn_ends).tolist() == [0, 0, 0, 1, 1]
+
+
+def test_stitch_timed_words_splits_overlap_at_midpoint():
+    # Two 3 s chunks at 1 Hz overlapping by 1 s; "C" is decoded by both
+    bounds = [(0, 3), (2, 5)]
+    chunk_words = [
+        (["A", "B", "C"], np.array([0.0, 1.0, 2.1]), np.array([0.9, 1.9, 2.4])),
+        (["C", "D"], np.array([2.1, 3.5]), np.array([2.4, 4.5])),
+    ]
+    words, starts, _ = stitch_timed_words(chunk_words, bounds, sample_rate=1)
+    assert words == ["A", "B", "C", "D"]
+    assert starts.tolist() == [0.0, 1.0, 2.1, 3.5]
+
+
+def test_words_to_segments_groups_by_speaker():
+    segments = words_to_segments(
+        np.array([7, 2]), np.array([0.0, 2.0]), np.array([2.0, 4.0]),
+        ["hi", "there", "hello"], np.array([0.1, 0.6, 2.5]), np.array([0.5, 1.0, 3.0])
+    )
+    assert segments == [
+        {"speaker": "Speaker 1", "start_time": 0.0, "end_time": 2.0, "text": "hi there"},
+        {"speaker": "Speaker 2", "start_time": 2.0, "end_time": 4.0, "text": "hello"},
+    ]
@@ -0,0 +1,43 @@
+import os
+import sys
+
+import pytest
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "src", "python_services"))
+
+from asr_chunking import chunk_bounds, stitch_hypotheses
+
+
+def test_chunk_bounds_cover_signal_with_overlap():
+    bounds = chunk_bounds(100, 30, 5)
+    assert bounds[0] == (0, 30)
+    assert bounds[-1][1] == 100
+    for (_, prev_end), (start, _) in zip(bounds, bounds[1:]):
+        assert prev_end - start == 5
+
+
+def test_chunk_bounds_short_signal_is_single_chunk():
+    assert chunk_bounds(10, 30, 5) == [(0, 10)]
+
+
+def test_chunk_bounds_rejects_overlap_longer_than_chunk():
+    with pytest.raises(ValueError):
+        chunk_bounds(100, 10, 10)
+
+
+def test_stitch_removes_words_repeated_in_overlap():
+    hypotheses = ["WE SHOULD SHIP THE RELEASE ON", "THE RELEASE ON FRIDAY AFTER REVIEW"]
+    assert stitch_hypotheses(hypotheses) == "WE SHOULD SHIP THE RELEASE ON FRIDAY AFTER REVIEW"
+
+
+def test_stitch_tolerates_garbled_chunk_edges():
+    # The first chunk cuts "AFTER" in half and the second starts mid-word
+    hypotheses = ["SHIP THE RELEASE ON FRIDAY AF", "LEASE ON FRIDAY AFTER REVIEW"]
+    assert stitch_hypotheses(hypotheses) == "SHIP THE RELEASE ON FRIDAY AFTER REVIEW"
+
+
+def test_stitch_keeps_single_coincidental_word():
+    hypotheses = ["LET US START", "THE BUDGET IS FINAL"]
+    assert stitch_hypotheses(hypotheses) == "LET US START THE BUDGET IS FINAL"
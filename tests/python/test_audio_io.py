@@ -0,0 +1,82 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "src", "python_services"))
+
+import audio_io
+from audio_io import ChunkedResampler, decode_to_scratch, decode_tracks_to_scratch, gather_regions, resampler_for
+
+
+@pytest.mark.parametrize("orig_freq", [48000, 44100, 8000])
+def test_chunked_resampler_matches_whole_signal_resample(orig_freq):
+    torch = pytest.importorskip("torch")
+    torchaudio = pytest.importorskip("torchaudio")
+
+    signal = np.random.default_rng(0).normal(size=orig_freq * 2 + 123).astype(np.float32)
+    expected = torchaudio.functional.resample(torch.from_numpy(signal), orig_freq, 16000).numpy()
+
+    resampler = ChunkedResampler(orig_freq, 16000)
+    parts = [resampler.process(signal[i:i + 7777]) for i in range(0, signal.shape[0], 7777)]
+    parts.append(resampler.flush())
+    resampled = np.concatenate(parts)
+    assert resampled.shape == expected.shape
+    assert np.allclose(resampled, expected, atol=1e-5)
+
+
+def test_resampler_modules_are_shared_per_rate_pair():
+    pytest.importorskip("torchaudio")
+    assert resampler_for(44100, 16000) is resampler_for(44100, 16000)
+    assert resampler_for(48000, 16000) is not resampler_for(44100, 16000)
+
+
+def test_decode_to_scratch_downmixes_and_resamples_blocks(tmp_path, monkeypatch):
+    pytest.importorskip("torchaudio")
+    stereo = np.random.default_rng(1).normal(size=(48000 * 2, 2)).astype(np.float32)
+    blocks = [stereo[i:i + 10000] for i in range(0, stereo.shape[0], 10000)]
+    monkeypatch.setattr(audio_io, "open_audio_blocks", lambda path, sample_rate, block_seconds: (48000, iter(blocks)))
+
+    signal = decode_to_scratch("meeting.wav", 16000, scratch_dir=str(tmp_path))
+    assert isinstance(signal, np.memmap)
+    assert signal.shape == (32000,)
+    assert os.listdir(tmp_path) == []  # the scratch file is unlinked once mapped
+
+
+def test_decode_tracks_to_scratch_keeps_each_channel(tmp_path, monkeypatch):
+    pytest.importorskip("torchaudio")
+    stereo = np.random.default_rng(2).normal(size=(48000, 2)).astype(np.float32)
+    blocks = [stereo[i:i + 10000] for i in range(0, stereo.shape[0], 10000)]
+    monkeypatch.setattr(audio_io, "open_audio_blocks", lambda path, sample_rate, block_seconds: (48000, iter(blocks)))
+
+    mono, tracks = decode_tracks_to_scratch("meeting.wav", 16000, scratch_dir=str(tmp_path))
+    assert len(tracks) == 2 and all(track.shape == mono.shape == (16000,) for track in tracks)
+    # Resampling is linear, so the channels average back to the downmix
+    assert np.allclose((tracks[0] + tracks[1]) / 2, mono, atol=1e-5)
+    assert os.listdir(tmp_path) == []
+
+
+def test_gather_regions_concatenates_into_a_memmap(tmp_path):
+    signal = np.arange(100, dtype=np.float32)
+    gathered = gather_regions(signal, np.array([[10, 20], [50, 55]]), scratch_dir=str(tmp_path))
+    assert gathered.tolist() == list(range(10, 20)) + list(range(50, 55))
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_video_container_audio_is_piped_through_ffmpeg(tmp_path):
+    video = str(tmp_path / "meeting.mp4")
+    subprocess.run(["ffmpeg", "-nostdin", "-loglevel", "error",
+                    "-f", "lavfi", "-i", "testsrc=size=64x64:rate=5:duration=2",
+                    "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=44100:duration=2",
+                    "-shortest", video], check=True)
+
+    source_rate, blocks = audio_io.open_audio_blocks(video, 16000, block_seconds=0.5)
+    assert source_rate == 16000
+    signal = np.concatenate([block[:, 0] for block in blocks])
+    assert abs(signal.shape[0] - 32000) < 1600
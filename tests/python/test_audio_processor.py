@@ -0,0 +1,103 @@
+import json
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+torch = pytest.importorskip("torch")
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "src", "python_services"))
+
+import asr_chunking
+import audio_io
+import language_id
+from audio_processor import job_cache_key, process_audio
+from result_cache import ResultCache, hash_file
+from speaker_enrollment import main as enroll_main
+
+SAMPLE_RATE = 16000
+
+
+class StubModels:
+    # Resident models of a worker; `failing` names the one that raises, as on an OOM
+    def __init__(self, encoder, failing=None):
+        self.device = torch.device("cpu")
+        self.encoder = encoder
+        self.failing = failing
+
+    def _check(self, name):
+        if name == self.failing:
+            raise RuntimeError(f"{name} ran out of memory")
+
+    def language_id(self):
+        self._check("language_id")
+        return object()
+
+    def asr(self, source):
+        return object()
+
+    def asr_encoder(self, source):
+        return None
+
+    def speaker_encoder(self):
+        self._check("speaker_encoder")
+        return self.encoder
+
+
+@pytest.fixture
+def job(tmp_path, monkeypatch, mean_encoder):
+    # Three seconds of tone, decoded from memory; language ID and ASR are stubbed
+    audio_file = tmp_path / "meeting.wav"
+    audio_file.write_bytes(os.urandom(4096))
+    tone = (0.3 * np.sin(2 * np.pi * 220 * np.arange(3 * SAMPLE_RATE) / SAMPLE_RATE)).astype(np.float32)
+    monkeypatch.setattr(audio_io, "open_audio_blocks", lambda path, sample_rate, block_seconds: (
+        SAMPLE_RATE, iter([tone[:, None]])))
+    monkeypatch.setattr(language_id, "identify_language", lambda model, *args, **kwargs: "de")
+    monkeypatch.setattr(asr_chunking, "transcribe_chunked", lambda *args, **kwargs: ("HELLO WORLD", None))
+    cache_dir = str(tmp_path / "cache")
+    cache = ResultCache(cache_dir)
+
+    def run(language, failing=None, enrollment_dir=None):
+        result = process_audio(str(audio_file), language, models=StubModels(mean_encoder, failing), cache=cache,
+                               speaker_check=False, enrollment_dir=enrollment_dir)
+        cached = cache.get_result(hash_file(str(audio_file)), job_cache_key(language, speaker_check=False))
+        return result, cached
+
+    run.cache_dir = cache_dir
+    return run
+
+
+def test_complete_results_are_cached(job):
+    result, cached = job("auto")
+    assert result["segments"][0]["text"] == "HELLO WORLD"
+    assert cached == result
+
+
+@pytest.mark.parametrize("failing", ["language_id", "speaker_encoder"])
+def test_fallback_results_are_returned_but_not_cached(job, failing):
+    result, cached = job("auto", failing=failing)
+    assert "error" not in result and result["segments"][0]["text"] == "HELLO WORLD"
+    assert cached is None
+    # The retry after the failure is gone computes and caches the full result
+    result, cached = job("auto")
+    assert cached == result
+
+
+def test_speakers_of_a_cached_result_are_enrolled_by_result_id(job, tmp_path, capsys):
+    enrollment_dir = str(tmp_path / "index")
+    result, cached = job("auto", enrollment_dir=enrollment_dir)
+    assert "result_id" not in cached
+    label = next(iter(result["speaker_embeddings"]))
+
+    argv = ["enroll", "--from-cache", "--cache-dir", job.cache_dir, "--enrollment-dir", enrollment_dir]
+    assert enroll_main(argv + [result["result_id"], f"{label}=Alice"]) == 0
+    assert json.loads(capsys.readouterr().out) == {"enrolled": ["Alice"], "total": 1}
+    # The cache hit of the next upload comes back with the name filled in
+    result, _ = job("auto", enrollment_dir=enrollment_dir)
+    assert result["speaker_names"] == {label: "Alice"}
+
+    assert enroll_main(argv + ["../../etc/passwd", f"{label}=Alice"]) == 1
+    assert json.loads(capsys.readouterr().out)["error"].startswith("Not a result id")
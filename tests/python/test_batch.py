@@ -0,0 +1,92 @@
+import io
+import json
+import os
+import sys
+
+import pytest
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "src", "python_services"))
+
+import batch
+from batch import _run_job, collect_jobs, run_batch
+
+
+def _write(path, size):
+    path.write_bytes(b"\0" * size)
+    return str(path)
+
+
+def fake_process_audio(audio_file, language, models=None, cache=None, **options):
+    if "broken" in audio_file:
+        raise RuntimeError("decoder crashed")
+    return {"language": language, "duration_seconds": 30.0, "segments": []}
+
+
+def _init_fake_worker(options, threads_per_worker, cache_dir, cache_max_bytes):
+    # Runs in the spawned worker in place of batch._init_worker, so no model is loaded
+    batch._worker_state.update({"process_audio": fake_process_audio, "models": None, "cache": None,
+                                "options": options})
+
+
+def test_collect_jobs_reads_directories_and_manifests_longest_first(tmp_path):
+    audio_dir = tmp_path / "archive"
+    (audio_dir / "2023").mkdir(parents=True)
+    small = _write(audio_dir / "small.wav", 10)
+    large = _write(audio_dir / "2023" / "large.MP3", 300)
+    _write(audio_dir / "notes.txt", 1000)
+    medium = _write(tmp_path / "medium.flac", 100)
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("\n".join([
+        medium,
+        "",
+        json.dumps({"id": "board-1", "audio_file": str(tmp_path / "missing.wav"), "language": "ko"}),
+        "{not json",
+        json.dumps({"id": "board-2", "file": medium}),
+    ]) + "\n")
+
+    jobs = collect_jobs(str(audio_dir), str(manifest), language="en")
+    assert jobs == [
+        {"audio_file": large, "language": "en"},
+        {"audio_file": medium, "language": "en"},
+        {"audio_file": small, "language": "en"},
+        {"id": "board-1", "audio_file": str(tmp_path / "missing.wav"), "language": "ko"},
+        {"error": jobs[4]["error"], "manifest_line": 4},
+        {"id": "board-2", "error": jobs[5]["error"], "manifest_line": 5},
+    ]
+    assert jobs[4]["error"].startswith("Invalid job:") and jobs[5]["error"].startswith("Invalid job:")
+
+
+def test_run_job_turns_failures_into_error_records(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch, "_worker_state", {"process_audio": fake_process_audio, "models": None,
+                                                 "cache": None, "options": {}})
+    broken = _write(tmp_path / "broken.wav", 10)
+
+    record = _run_job({"id": "job-1", "audio_file": broken, "language": "en"})
+    assert record["id"] == "job-1" and record["audio_file"] == broken
+    assert record["error"] == "Processing failed: decoder crashed"
+    assert record["processing_seconds"] >= 0
+
+    missing = str(tmp_path / "missing.wav")
+    assert _run_job({"audio_file": missing})["error"] == f"Audio file not found: {missing}"
+
+
+def test_run_batch_streams_records_and_summarises_the_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch, "_init_worker", _init_fake_worker)
+    jobs = [{"audio_file": _write(tmp_path / name, 10), "language": "en"}
+            for name in ("a.wav", "b.wav", "broken.wav")]
+    jobs.append({"error": "Invalid job: expected a JSON object", "manifest_line": 7})
+
+    output = io.StringIO()
+    summary = run_batch(jobs, output, workers=1, threads_per_worker=1)
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert sorted(os.path.basename(record["audio_file"]) for record in records if "audio_file" in record) == [
+        "a.wav", "b.wav", "broken.wav"]
+    assert sum("error" in record for record in records) == 2
+    assert {"error": "Invalid job: expected a JSON object", "manifest_line": 7} in records
+
+    assert summary["files"] == 4 and summary["failed"] == 2
+    assert summary["workers"] == 1 and summary["threads_per_worker"] == 1
+    assert summary["audio_seconds"] == 60.0
+    assert summary["real_time_factor"] == pytest.approx(summary["wall_seconds"] / 60.0, abs=1e-3)
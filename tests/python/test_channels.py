@@ -0,0 +1,70 @@
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "src", "python_services"))
+
+from channels import analyze_channels, channel_segments, turn_units
+from diarization import NON_SPEECH
+
+SAMPLE_RATE = 16000
+
+
+def _two_mic_recording(bleed=0.05, seed=0):
+    # Speaker A talks on channel 0 for 0-2 s and 4-5 s, speaker B on channel 1 for 2.5-4 s;
+    # each mic also picks up the other speaker at `bleed` amplitude
+    rng = np.random.default_rng(seed)
+    a = np.zeros(6 * SAMPLE_RATE, dtype=np.float32)
+    b = np.zeros(6 * SAMPLE_RATE, dtype=np.float32)
+    for start, end in [(0, 2), (4, 5)]:
+        a[start * SAMPLE_RATE:end * SAMPLE_RATE] = 0.3 * rng.normal(size=(end - start) * SAMPLE_RATE)
+    b[int(2.5 * SAMPLE_RATE):4 * SAMPLE_RATE] = 0.3 * rng.normal(size=int(1.5 * SAMPLE_RATE))
+    noise = 1e-4 * rng.normal(size=(2, a.size))
+    return [(a + bleed * b + noise[0]).astype(np.float32), (b + bleed * a + noise[1]).astype(np.float32)]
+
+
+def test_one_speaker_per_channel_is_detected_and_labelled():
+    layout = analyze_channels(_two_mic_recording(), SAMPLE_RATE)
+    assert layout is not None and layout.speaking_channels == [0, 1]
+    labels = layout.frame_labels()
+    frame = lambda seconds: int(seconds / layout.frame_shift)
+    assert labels[frame(1.0)] == 0
+    assert labels[frame(3.0)] == 1
+    assert labels[frame(4.5)] == 0
+    assert labels[frame(5.5)] == NON_SPEECH
+
+
+def test_channel_regions_leave_out_bleed_from_the_other_mic():
+    tracks = _two_mic_recording()
+    layout = analyze_channels(tracks, SAMPLE_RATE)
+    regions = layout.channel_regions(1, tracks[1].shape[0]) / SAMPLE_RATE
+    assert regions.shape == (1, 2)
+    assert 2.2 <= regions[0, 0] <= 2.5 and 4.0 <= regions[0, 1] <= 4.3
+
+
+def test_duplicated_or_single_speaker_channels_take_the_diarization_path():
+    mono = _two_mic_recording()[0]
+    assert analyze_channels([mono, mono.copy()], SAMPLE_RATE) is None
+    silent = 1e-4 * np.random.default_rng(1).normal(size=mono.size).astype(np.float32)
+    assert analyze_channels([mono, silent], SAMPLE_RATE) is None
+    assert analyze_channels([mono], SAMPLE_RATE) is None
+
+
+def test_channel_segments_interleave_words_by_time():
+    segments = channel_segments({
+        1: (["hi", "there"], [0.5, 0.8], [0.7, 1.0]),
+        0: (["hello", "again", "bye"], [0.0, 1.5, 3.0], [0.4, 2.0, 3.2]),
+    })
+    assert [(s["speaker"], s["text"]) for s in segments] == [
+        ("Speaker 1", "hello"), ("Speaker 2", "hi there"), ("Speaker 1", "again bye")]
+    assert segments[1]["start_time"] == 0.5 and segments[1]["end_time"] == 1.0
+
+
+def test_turn_units_spread_an_untimed_transcript_over_turns():
+    texts, starts, ends = turn_units("one two three four", [0.0, 5.0], [1.0, 2.0 + 5.0])
+    assert texts == ["one", "two three four"] and starts == [0.0, 5.0] and ends == [1.0, 7.0]
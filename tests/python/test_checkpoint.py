@@ -0,0 +1,103 @@
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+torch = pytest.importorskip("torch")
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "src", "python_services"))
+
+from asr_chunking import transcribe_chunked
+from checkpoint import JobCheckpoint
+from diarization import embed_windows
+
+
+class FlakyAsrModel:
+    """Names each chunk after its first sample; fails once `fail_after` batches are decoded."""
+
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+        self.decoded_batches = 0
+
+    def transcribe_batch(self, batch, wav_lens):
+        if self.fail_after is not None and self.decoded_batches >= self.fail_after:
+            raise RuntimeError("node preempted")
+        self.decoded_batches += 1
+        return [f"chunk{int(row[0])}" for row in batch], None
+
+
+def _job(work_dir, resume=False):
+    return JobCheckpoint(str(work_dir), "a" * 64, "b" * 32, resume=resume)
+
+
+def test_job_checkpoint_keeps_or_discards_earlier_work(tmp_path):
+    checkpoint = _job(tmp_path)
+    checkpoint.put_array("vad_regions", np.array([[0, 10]]))
+    checkpoint.stage("asr").put_batch(0, {"hypotheses": ["hello"], "timed_words": None})
+    assert checkpoint.completed_batches() == {"asr": 1}
+    checkpoint.release()  # the run dies
+
+    resumed = _job(tmp_path, resume=True)
+    assert resumed.path == checkpoint.path
+    assert resumed.get_array("vad_regions").tolist() == [[0, 10]]
+    assert resumed.stage("asr").get_batch(0)["hypotheses"] == ["hello"]
+    resumed.release()
+
+    fresh = _job(tmp_path)
+    assert fresh.get_array("vad_regions") is None
+    assert os.listdir(tmp_path) == [os.path.basename(fresh.path)]  # the abandoned run was cleared
+    fresh.finish()
+    assert os.listdir(tmp_path) == []
+
+
+def test_concurrent_runs_of_one_job_keep_their_own_checkpoints(tmp_path):
+    first = _job(tmp_path)
+    first.stage("asr").put_batch(0, {"hypotheses": ["first"], "timed_words": None})
+
+    # A retry of the same upload, fresh or resumed, must not adopt or delete a live run
+    second = _job(tmp_path)
+    resumed = _job(tmp_path, resume=True)
+    assert len({first.path, second.path, resumed.path}) == 3
+    first.stage("asr").put_batch(4, {"hypotheses": ["still here"], "timed_words": None})
+    assert resumed.stage("asr").get_batch(0) is None
+
+    second.finish()
+    resumed.finish()
+    assert first.stage("asr").get_batch(0)["hypotheses"] == ["first"]
+    first.finish()
+    assert os.listdir(tmp_path) == []
+
+
+def test_transcription_resumes_after_the_last_completed_batch(tmp_path):
+    waveform = torch.arange(16000 * 100, dtype=torch.float32).unsqueeze(0)
+    options = dict(chunk_seconds=10.0, overlap_seconds=0.0, batch_size=2)
+    stage = JobCheckpoint(str(tmp_path), "a" * 64, "b" * 32).stage("asr")
+
+    with pytest.raises(RuntimeError):
+        transcribe_chunked(FlakyAsrModel(fail_after=3), waveform, 16000, checkpoint=stage, **options)
+
+    model = FlakyAsrModel()
+    transcript, _ = transcribe_chunked(model, waveform, 16000, checkpoint=stage, **options)
+    assert model.decoded_batches == 2  # 5 batches in total, 3 finished before the failure
+    expected, _ = transcribe_chunked(FlakyAsrModel(), waveform, 16000, **options)
+    assert transcript == expected
+
+
+def test_speaker_embeddings_reuse_saved_batches(tmp_path):
+    class CountingEncoder:
+        calls = 0
+
+        def encode_batch(self, batch):
+            CountingEncoder.calls += 1
+            return batch.mean(dim=1, keepdim=True).unsqueeze(1)
+
+    waveform = torch.arange(16000 * 10, dtype=torch.float32).unsqueeze(0)
+    stage = JobCheckpoint(str(tmp_path), "a" * 64, "b" * 32).stage("speaker_embeddings")
+    first = embed_windows(CountingEncoder(), waveform, 16000, batch_size=4, checkpoint=stage)
+    calls = CountingEncoder.calls
+    second = embed_windows(CountingEncoder(), waveform, 16000, batch_size=4, checkpoint=stage)
+    assert CountingEncoder.calls == calls
+    assert np.array_equal(first, second)
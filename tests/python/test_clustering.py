@@ -0,0 +1,49 @@
+import os
+import sys
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "src", "python_services"))
+
+from clustering import agglomerative_merge, cluster_speakers
+
+
+def test_cluster_speakers_finds_speaker_count(speaker_embeddings):
+    embeddings = speaker_embeddings(["a"] * 20 + ["b"] * 15 + ["a"] * 10 + ["c"] * 12)
+    labels = cluster_speakers(embeddings)
+    assert len(set(labels.tolist())) == 3
+    assert len(set(labels[:20].tolist())) == 1
+    assert labels[0] == labels[40] != labels[25]
+
+
+def test_cluster_speakers_single_speaker(speaker_embeddings):
+    assert set(cluster_speakers(speaker_embeddings(["a"] * 30)).tolist()) == {0}
+
+
+def test_cluster_speakers_across_chunks_and_centroid_reduction(speaker_embeddings):
+    sequence = ["a", "b", "c", "d"] * 500
+    labels = cluster_speakers(speaker_embeddings(sequence), chunk_size=100, subclusters=8, max_centroids=40)
+    assert len(set(labels.tolist())) == 4
+    for offset in range(4):
+        assert len(set(labels[offset::4].tolist())) == 1
+
+
+def test_agglomerative_merge_respects_max_clusters(speaker_embeddings):
+    sums = speaker_embeddings(list("abcdef"))
+    assert len(set(agglomerative_merge(sums, threshold=0.99, max_clusters=6).tolist())) == 6
+    assert len(set(agglomerative_merge(sums, threshold=0.99, max_clusters=2).tolist())) == 2
+
+
+def test_cluster_speakers_scales_to_long_recordings(speaker_embeddings):
+    # 200k windows at a 0.75 s hop is ~40 hours of speech; a full affinity matrix would be 160 GB
+    sequence = np.repeat(np.arange(5), 40).tolist() * 1000
+    embeddings = speaker_embeddings(sequence, dims=64)
+    started = time.perf_counter()
+    labels = cluster_speakers(embeddings)
+    assert time.perf_counter() - started < 30.0
+    assert len(set(labels.tolist())) == 5
@@ -0,0 +1,115 @@
+import os
+import sys
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "src", "python_services"))
+
+from diarization import (NON_SPEECH, SINGLE_SPEAKER_MIN_SIMILARITY, diarize_embeddings, embed_sampled_windows,
+                         embed_windows, labels_to_turns, run_length_encode, single_speaker_frames,
+                         speaker_centroids, split_similarity, turns_to_segments, window_labels_to_frames)
+
+
+def test_run_length_encode():
+    values, starts, ends = run_length_encode(np.array([1, 1, 0, 0, 0, 1]))
+    assert values.tolist() == [1, 0, 1]
+    assert starts.tolist() == [0, 2, 5]
+    assert ends.tolist() == [2, 5, 6]
+
+
+def test_labels_to_turns_merges_short_gaps_and_drops_flicker():
+    # 0.1 s frames: speaker 0 for 1 s, 0.2 s silence, speaker 0 again, a 1-frame blip of
+    # speaker 1, then speaker 1 for 1 s
+    labels = np.array([0] * 10 + [NON_SPEECH] * 2 + [0] * 10 + [1] + [0] * 5 + [1] * 10)
+    speakers, starts, ends = labels_to_turns(labels, frame_shift=0.1)
+    assert speakers.tolist() == [0, 1]
+    assert starts == pytest.approx([0.0, 2.8])
+    assert ends == pytest.approx([2.8, 3.8])
+
+
+def test_turns_to_segments_keeps_review_schema():
+    segments = turns_to_segments(np.array([3, 1]), np.array([0.0, 5.0]), np.array([5.0, 10.0]),
+                                 "one two three four")
+    assert segments == [
+        {"speaker": "Speaker 1", "start_time": 0.0, "end_time": 5.0, "text": "one two"},
+        {"speaker": "Speaker 2", "start_time": 5.0, "end_time": 10.0, "text": "three four"},
+    ]
+
+
+def test_labels_to_turns_handles_millions_of_frames_quickly():
+    rng = np.random.default_rng(0)
+    turn_lengths = rng.integers(50, 3000, size=2000)
+    labels = np.repeat(rng.integers(0, 4, size=turn_lengths.size), turn_lengths)
+    assert labels.size > 2_000_000
+    started = time.perf_counter()
+    labels_to_turns(labels, frame_shift=0.01)
+    assert time.perf_counter() - started < 1.0
+
+
+def test_window_labels_to_frames_pads_with_last_label():
+    frames = window_labels_to_frames(np.array([0, 0, 1]), num_samples=10, hop_samples=2)
+    assert frames.tolist() == [0, 0, 1, 1, 1]
+
+
+def test_diarize_embeddings_returns_frame_shift(speaker_embeddings):
+    embeddings = speaker_embeddings(["a"] * 10 + ["b"] * 10)
+    labels, frame_shift = diarize_embeddings(embeddings, num_samples=20 * 12000, sample_rate=16000)
+    assert frame_shift == 0.75
+    assert labels.size == 20
+
+
+def test_embed_windows_uses_strided_windows_of_the_waveform(mean_encoder):
+    torch = pytest.importorskip("torch")
+
+    waveform = torch.arange(16000 * 3, dtype=torch.float32).unsqueeze(0)
+    embeddings = embed_windows(mean_encoder, waveform, 16000, window_seconds=1.0, hop_seconds=0.5, batch_size=2)
+    assert embeddings.shape == (5, 1)
+    assert embeddings.dtype == np.float32
+    assert embeddings[1, 0] == pytest.approx(8000 + 7999.5)
+
+
+def test_speaker_centroids_average_normalized_window_embeddings():
+    embeddings = np.array([[2.0, 0.0], [0.0, 3.0], [0.0, 1.0]], dtype=np.float32)
+    centroids = speaker_centroids(embeddings, np.array([0, 1, 1, 1]))
+    assert np.allclose(centroids[0], [1.0, 0.0])
+    assert np.allclose(centroids[1], [0.0, 1.0])
+
+
+def test_split_similarity_keeps_one_voice_together(speaker_embeddings):
+    assert split_similarity(speaker_embeddings(["a"] * 64)) > SINGLE_SPEAKER_MIN_SIMILARITY
+
+
+@pytest.mark.parametrize("sequence", [
+    ["a"] * 32 + ["b"] * 32,                     # balanced two-person meeting
+    ["a"] * 21 + ["b"] * 21 + ["c"] * 21,        # three-way split
+    ["a", "b"] * 32,                             # alternating turns
+    ["a"] * 58 + ["b"] * 6,                      # minority speaker
+])
+def test_split_similarity_detects_further_speakers(sequence, speaker_embeddings):
+    assert split_similarity(speaker_embeddings(sequence)) <= SINGLE_SPEAKER_MIN_SIMILARITY
+
+
+def test_embed_sampled_windows_spreads_the_sample_over_the_recording(mean_encoder):
+    torch = pytest.importorskip("torch")
+
+    waveform = torch.arange(16000 * 10, dtype=torch.float32).unsqueeze(0)
+    sampled, complete = embed_sampled_windows(mean_encoder, waveform, 16000, num_windows=4,
+                                              window_seconds=1.0, hop_seconds=0.5)
+    full = embed_windows(mean_encoder, waveform, 16000, window_seconds=1.0, hop_seconds=0.5)
+    assert not complete
+    assert np.allclose(sampled[:, 0], full[[0, 6, 12, 18], 0])
+
+    sampled, complete = embed_sampled_windows(mean_encoder, waveform, 16000, num_windows=64,
+                                              window_seconds=1.0, hop_seconds=0.5)
+    assert complete and np.array_equal(sampled, full)
+
+
+def test_single_speaker_frames_match_diarize_embeddings_layout():
+    labels, frame_shift = single_speaker_frames(num_samples=20 * 12000, sample_rate=16000)
+    assert frame_shift == 0.75
+    assert labels.tolist() == [0] * 20
@@ -0,0 +1,60 @@
+import json
+import os
+import sys
+
+import pytest
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "src", "python_services"))
+
+from events import NO_EVENTS, EventEmitter
+
+
+class Stream(list):
+    def write(self, line):
+        self.append(json.loads(line))
+
+    def flush(self):
+        pass
+
+
+def test_events_arrive_in_order_and_end_with_the_result():
+    stream = Stream()
+    events = EventEmitter(stream)
+    with events.stage("asr", model="asr-en"):
+        events.emit("partial-transcript", start_time=0.0, end_time=1.5, text="hello")
+    events.emit("segment", segment={"speaker": "Speaker 1", "text": "hello"})
+    events.emit("result", result={"segments": []})
+
+    assert [event["event"] for event in stream] == ["stage-start", "partial-transcript", "stage-end", "segment",
+                                                   "result"]
+    assert stream[0] == {"event": "stage-start", "elapsed": stream[0]["elapsed"], "stage": "asr", "model": "asr-en"}
+    assert stream[2]["status"] == "ok" and stream[2]["seconds"] >= 0
+    assert stream[-1]["result"] == {"segments": []}
+    assert all("id" not in event for event in stream)
+
+
+def test_events_are_tagged_with_the_job_id():
+    stream = Stream()
+    events = EventEmitter(stream, job_id="job-7")
+    with events.stage("load"):
+        pass
+    events.emit("result", result={})
+    assert [event["id"] for event in stream] == ["job-7"] * 3
+
+
+def test_stage_end_reports_an_error_status_when_the_stage_raises():
+    stream = Stream()
+    events = EventEmitter(stream)
+    with pytest.raises(RuntimeError):
+        with events.stage("vad"):
+            raise RuntimeError("decode failed")
+    assert [(event["event"], event.get("status")) for event in stream] == [("stage-start", None),
+                                                                           ("stage-end", "error")]
+
+
+def test_disabled_emitter_writes_nothing():
+    assert not NO_EVENTS.enabled
+    with NO_EVENTS.stage("asr"):
+        NO_EVENTS.emit("result", result={})
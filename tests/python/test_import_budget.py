@@ -0,0 +1,72 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
+SERVICES_DIR = os.path.join(PROJECT_ROOT, "src", "python_services")
+AUDIO_PROCESSOR = os.path.join(SERVICES_DIR, "audio_processor.py")
+sys.path.insert(0, SERVICES_DIR)
+
+from result_cache import ResultCache, hash_file
+
+HEAVY_MODULES = {"torch", "torchaudio", "speechbrain", "numpy", "onnxruntime", "soundfile", "transformers"}
+BUDGET_SECONDS = 0.2
+
+
+def _run(args, cwd):
+    # Returns (completed process, top-level packages imported, best-of-3 wall time)
+    best = None
+    for _ in range(3):
+        started = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-X", "importtime", AUDIO_PROCESSOR] + args,
+                                   cwd=str(cwd), capture_output=True, text=True)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    imported = set()
+    for line in completed.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            imported.add(line.rsplit("|", 1)[1].strip().split(".")[0])
+    return completed, imported, best
+
+
+def _interpreter_startup():
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    return time.perf_counter() - started
+
+
+def _assert_light(imported, elapsed):
+    assert not imported & HEAVY_MODULES, f"heavy modules imported: {sorted(imported & HEAVY_MODULES)}"
+    assert elapsed - _interpreter_startup() < BUDGET_SECONDS
+
+
+def test_help_is_light(tmp_path):
+    completed, imported, elapsed = _run(["--help"], tmp_path)
+    assert completed.returncode == 0
+    _assert_light(imported, elapsed)
+
+
+def test_missing_file_is_light(tmp_path):
+    completed, imported, elapsed = _run([str(tmp_path / "missing.wav")], tmp_path)
+    assert completed.returncode == 1
+    assert "Audio file not found" in completed.stderr
+    _assert_light(imported, elapsed)
+
+
+def test_cache_hit_is_light(tmp_path):
+    from audio_processor import job_cache_key
+
+    audio_file = tmp_path / "meeting.wav"
+    audio_file.write_bytes(os.urandom(4096))
+    cached = {"language": "en", "duration_seconds": 1.0, "segments": [], "full_transcript_debug": ""}
+    cache = ResultCache(str(tmp_path / "cache"))
+    cache.put_result(hash_file(str(audio_file)), job_cache_key("en"), cached)
+
+    completed, imported, elapsed = _run([str(audio_file), "--language", "en", "--cache-dir", str(tmp_path / "cache")],
+                                        tmp_path)
+    assert completed.returncode == 0
+    assert json.loads(completed.stdout) == cached
+    _assert_light(imported, elapsed)
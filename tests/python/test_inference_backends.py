@@ -0,0 +1,76 @@
+import os
+import sys
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "src", "python_services"))
+
+from alignment import ctc_emissions
+from inference_backends import TorchEncoder, create_encoder, onnx_encoder_path, onnx_export_error
+
+
+class TinyEncoder(torch.nn.Module):
+    # Strided conv front-end + projection, masked by the relative lengths like wav2vec2
+    def __init__(self):
+        super().__init__()
+        self.conv = torch.nn.Conv1d(1, 16, kernel_size=400, stride=320)
+        self.proj = torch.nn.Linear(16, 16)
+
+    def forward(self, wavs, wav_lens):
+        features = torch.relu(self.conv(wavs.unsqueeze(1))).transpose(1, 2)
+        frames = features.shape[1]
+        mask = (torch.arange(frames).unsqueeze(0) < (wav_lens * frames).unsqueeze(1)).float()
+        return self.proj(features) * mask.unsqueeze(2)
+
+
+class TinyASR:
+    def __init__(self):
+        torch.manual_seed(0)
+        self.mods = torch.nn.ModuleDict({"encoder": TinyEncoder()})
+        self.hparams = type("HParams", (), {
+            "ctc_lin": torch.nn.Linear(16, 12),
+            "log_softmax": torch.nn.LogSoftmax(dim=-1),
+        })()
+
+    def encode_batch(self, wavs, wav_lens):
+        return self.mods.encoder(wavs, wav_lens)
+
+
+def test_onnx_backend_matches_torch_tokens(tmp_path):
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("onnx")
+    asr_model = TinyASR()
+    torch.manual_seed(1)
+    wavs = torch.randn(3, 48000)
+    wav_lens = torch.tensor([1.0, 0.7, 0.4])
+
+    onnx_encoder = create_encoder("onnx", asr_model, str(tmp_path), num_threads=1)
+    assert os.path.exists(onnx_encoder_path(str(tmp_path)))
+
+    with torch.no_grad():
+        torch_log_probs, torch_out = ctc_emissions(asr_model, wavs, wav_lens, TorchEncoder(asr_model))
+        onnx_log_probs, onnx_out = ctc_emissions(asr_model, wavs, wav_lens, onnx_encoder)
+    assert onnx_out.shape == torch_out.shape
+    assert torch.equal(onnx_log_probs.argmax(dim=-1), torch_log_probs.argmax(dim=-1))
+    assert torch.allclose(onnx_out, torch_out, atol=1e-4)
+
+
+def test_create_encoder_rejects_unknown_backend(tmp_path):
+    with pytest.raises(ValueError):
+        create_encoder("tensorrt", TinyASR(), str(tmp_path))
+
+
+def test_onnx_backend_fails_fast_on_a_read_only_bundle(tmp_path, monkeypatch):
+    pytest.importorskip("onnxruntime")
+    assert onnx_export_error(str(tmp_path)) is None  # writable: the encoder can still be exported
+
+    monkeypatch.setattr(os, "access", lambda path, mode: False)
+    error = onnx_export_error(str(tmp_path))
+    assert "not writable" in error and "warmup --backend onnx" in error
+    with pytest.raises(RuntimeError, match="not writable"):
+        create_encoder("onnx", TinyASR(), str(tmp_path), num_threads=1)
+    assert not os.path.exists(onnx_encoder_path(str(tmp_path)))
@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "src", "python_services"))
+
+from language_id import language_code, select_lid_excerpts
+
+SAMPLE_RATE = 1000
+
+
+def test_select_lid_excerpts_picks_loudest_window_per_section():
+    signal = np.full(90 * SAMPLE_RATE, 1e-3)
+    for loud_start in (12, 40, 75):
+        signal[loud_start * SAMPLE_RATE:(loud_start + 10) * SAMPLE_RATE] = 0.5
+    excerpts = select_lid_excerpts(signal, SAMPLE_RATE, num_excerpts=3, excerpt_seconds=10.0)
+    assert [start // SAMPLE_RATE for start, _ in excerpts] == [12, 40, 75]
+    assert all(end - start == 10 * SAMPLE_RATE for start, end in excerpts)
+
+
+def test_select_lid_excerpts_short_recording_uses_everything():
+    assert select_lid_excerpts(np.ones(20 * SAMPLE_RATE), SAMPLE_RATE) == [(0, 20 * SAMPLE_RATE)]
+
+
+def test_language_code_normalises_model_labels():
+    assert language_code("English") == "en"
+    assert language_code("ja: Japanese") == "ja"
+    assert language_code("Basque") == "Basque"
@@ -0,0 +1,64 @@
+import os
+import sys
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "src", "python_services"))
+
+from model_bundle import (_localize_symlinks, bundle_missing_error, use_offline_bundle, verify_bundle,
+                          write_manifest)
+
+
+def _make_bundle(tmp_path):
+    bundle = tmp_path / "v1"
+    blob = bundle / "hf_cache" / "blobs" / "abc"
+    blob.parent.mkdir(parents=True)
+    blob.write_bytes(b"weights")
+    savedir = bundle / "asr-wav2vec2-commonvoice-en"
+    savedir.mkdir()
+    (savedir / "hyperparams.yaml").write_text("sample_rate: 16000\n")
+    os.symlink(str(blob.resolve()), str(savedir / "asr.ckpt"))  # absolute, like SpeechBrain's fetch
+    return bundle
+
+
+def test_manifest_round_trip_and_tamper_detection(tmp_path):
+    bundle = _make_bundle(tmp_path)
+    assert bundle_missing_error(str(bundle)) is not None
+
+    manifest = write_manifest(str(bundle))
+    assert bundle_missing_error(str(bundle)) is None
+    assert set(manifest["files"]) == {os.path.join("hf_cache", "blobs", "abc"),
+                                      os.path.join("asr-wav2vec2-commonvoice-en", "hyperparams.yaml")}
+    assert verify_bundle(str(bundle)) == []
+
+    (bundle / "hf_cache" / "blobs" / "abc").write_bytes(b"WEIGHTS")
+    (bundle / "asr-wav2vec2-commonvoice-en" / "hyperparams.yaml").unlink()
+    problems = verify_bundle(str(bundle))
+    assert len(problems) == 2
+    assert any(problem.startswith("checksum mismatch") for problem in problems)
+
+
+def test_localize_symlinks_makes_bundle_relocatable(tmp_path):
+    bundle = _make_bundle(tmp_path)
+    outside = tmp_path / "global_cache_file"
+    outside.write_bytes(b"tokenizer")
+    os.symlink(str(outside), str(bundle / "asr-wav2vec2-commonvoice-en" / "tokenizer.ckpt"))
+
+    _localize_symlinks(str(bundle))
+    link = bundle / "asr-wav2vec2-commonvoice-en" / "asr.ckpt"
+    assert not os.path.isabs(os.readlink(str(link)))
+    copied = bundle / "asr-wav2vec2-commonvoice-en" / "tokenizer.ckpt"
+    assert not copied.is_symlink() and copied.read_bytes() == b"tokenizer"
+
+    moved = tmp_path / "moved"
+    os.rename(str(bundle), str(moved))
+    assert (moved / "asr-wav2vec2-commonvoice-en" / "asr.ckpt").read_bytes() == b"weights"
+
+
+def test_use_offline_bundle_points_hub_at_the_bundle(tmp_path, monkeypatch):
+    for name in ("HF_HUB_CACHE", "HF_HUB_OFFLINE", "TRANSFORMERS_OFFLINE"):
+        monkeypatch.delenv(name, raising=False)
+    use_offline_bundle(str(tmp_path / "v1"))
+    assert os.environ["HF_HUB_OFFLINE"] == "1"
+    assert os.environ["TRANSFORMERS_OFFLINE"] == "1"
+    assert os.environ["HF_HUB_CACHE"] == str(tmp_path / "v1" / "hf_cache")
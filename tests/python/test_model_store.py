@@ -0,0 +1,56 @@
+import os
+import sys
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "src", "python_services"))
+
+from model_store import ModelPool
+
+
+def _pool(**kwargs):
+    loads, evicted = [], []
+
+    def loader(key):
+        def load():
+            loads.append(key)
+            return {"name": key}
+        return load
+
+    pool = ModelPool(size_of=lambda model: 100, on_evict=evicted.append, **kwargs)
+    return pool, loader, loads, evicted
+
+
+def test_pool_reuses_resident_models_and_evicts_least_recently_used():
+    pool, loader, loads, evicted = _pool(max_models=2)
+    for key in ["en", "ko", "en", "ja", "en", "ko"]:
+        assert pool.get(key, loader(key)) == {"name": key}
+    assert loads == ["en", "ko", "ja", "ko"]
+    assert evicted == ["ko", "ja"]
+    stats = pool.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (2, 4, 2)
+    assert stats["resident"] == ["en", "ko"]
+
+
+def test_pool_makes_room_before_loading():
+    pool, _, _, _ = _pool(max_models=1)
+    pool.get("en", lambda: "en-model")
+
+    def load_ko():
+        assert "en" not in pool  # the old model is already gone while the new one loads
+        return "ko-model"
+
+    pool.get("ko", load_ko)
+    assert pool.keys() == ["ko"]
+
+
+def test_pool_memory_budget_keeps_the_requested_model():
+    pool, loader, _, evicted = _pool(max_models=5, max_bytes=250)
+    for key in ["en", "ko", "ja"]:
+        pool.get(key, loader(key))
+    assert evicted == ["en"]
+    assert pool.resident_bytes == 200
+
+    tight, loader, _, _ = _pool(max_models=5, max_bytes=50)
+    tight.get("en", loader("en"))
+    assert tight.keys() == ["en"]
@@ -0,0 +1,76 @@
+import json
+import os
+import sys
+import threading
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "src", "python_services"))
+
+from events import EventEmitter
+from profiling import StageProfiler, pipeline_stage
+
+
+def test_report_includes_audio_seconds_per_second():
+    profiler = StageProfiler()
+    with profiler.stage("load"):
+        sum(range(10000))
+    profiler.audio_seconds = 60.0
+    report = profiler.report()
+    assert [entry["stage"] for entry in report] == ["load"]
+    assert report[0]["wall_seconds"] >= 0
+    assert report[0]["audio_seconds_per_second"] > 0
+
+
+def test_pipeline_stage_feeds_events_and_chrome_trace(tmp_path):
+    class Stream(list):
+        def write(self, line):
+            self.append(json.loads(line))
+
+        def flush(self):
+            pass
+
+    stream = Stream()
+    profiler = StageProfiler()
+    with pipeline_stage(EventEmitter(stream), profiler, "asr"):
+        pass
+    assert [event["event"] for event in stream] == ["stage-start", "stage-end"]
+
+    trace_path = tmp_path / "trace.json"
+    profiler.write_chrome_trace(str(trace_path))
+    trace = json.loads(trace_path.read_text())
+    assert trace["traceEvents"][0]["name"] == "asr"
+    assert trace["traceEvents"][0]["ph"] == "X"
+
+
+def test_overlapping_stages_share_one_cpu_entry():
+    profiler = StageProfiler()
+    asr_started, embeddings_done = threading.Event(), threading.Event()
+
+    def embed():
+        asr_started.wait()
+        with profiler.stage("speaker_embeddings"):
+            sum(range(10000))
+        embeddings_done.set()
+
+    with profiler.stage("load"):
+        pass
+    worker = threading.Thread(target=embed)
+    worker.start()
+    with profiler.stage("asr"):
+        asr_started.set()
+        embeddings_done.wait()
+    worker.join()
+    with profiler.stage("segments"):
+        pass
+
+    report = {entry["stage"]: entry for entry in profiler.report()}
+    assert list(report) == ["load", "speaker_embeddings", "asr", "asr+speaker_embeddings", "segments"]
+    # Process CPU time cannot be split between the overlapping stages
+    assert report["asr"]["cpu_seconds"] is None and report["speaker_embeddings"]["cpu_seconds"] is None
+    assert report["asr"]["concurrent_group"] == "asr+speaker_embeddings"
+    group = report["asr+speaker_embeddings"]
+    assert group["concurrent_stages"] == ["asr", "speaker_embeddings"]
+    assert group["cpu_seconds"] >= 0
+    assert group["wall_seconds"] >= report["asr"]["wall_seconds"]
+    assert report["load"]["cpu_seconds"] is not None and "concurrent_group" not in report["segments"]
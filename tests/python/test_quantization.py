@@ -0,0 +1,62 @@
+import os
+import sys
+
+import pytest
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "src", "python_services"))
+
+from benchmark import word_error_rate
+from quantization import quantize_model, quantized_weights_path
+
+
+class FakePretrained:
+    def __init__(self, torch, seed=0):
+        torch.manual_seed(seed)
+        self.mods = torch.nn.ModuleDict({"encoder": torch.nn.Sequential(
+            torch.nn.Linear(16, 32), torch.nn.ReLU(), torch.nn.Linear(32, 8))})
+
+
+def test_quantize_model_swaps_linear_layers_and_caches_weights(tmp_path, monkeypatch):
+    torch = pytest.importorskip("torch")
+    model = FakePretrained(torch)
+    inputs = torch.randn(4, 16)
+    expected = model.mods["encoder"](inputs)
+
+    quantize_model(model, str(tmp_path))
+    assert "Linear" in type(model.mods["encoder"][0]).__name__
+    assert type(model.mods["encoder"][0]) is not torch.nn.Linear
+    assert os.path.exists(quantized_weights_path(str(tmp_path)))
+    quantized = model.mods["encoder"](inputs)
+    assert torch.allclose(quantized, expected, atol=0.05)
+
+    # A second load reads the cached int8 weights back without quantizing again; its own
+    # fp32 weights differ, so matching outputs can only come from the cache
+    monkeypatch.setattr(torch.ao.quantization, "quantize_dynamic", None)
+    reloaded = quantize_model(FakePretrained(torch, seed=1), str(tmp_path))
+    assert torch.equal(reloaded.mods["encoder"](inputs), quantized)
+
+
+def test_quantize_model_requantizes_when_cached_weights_do_not_fit(tmp_path):
+    torch = pytest.importorskip("torch")
+    quantize_model(FakePretrained(torch), str(tmp_path))
+
+    model = FakePretrained(torch)
+    model.mods["encoder"][2] = torch.nn.Linear(32, 4)  # a different model in the same directory
+    inputs = torch.randn(4, 16)
+    expected = model.mods["encoder"](inputs)
+    quantize_model(model, str(tmp_path))
+    assert torch.allclose(model.mods["encoder"](inputs), expected, atol=0.05)
+
+
+def test_quantize_model_rejects_unknown_mode(tmp_path):
+    torch = pytest.importorskip("torch")
+    with pytest.raises(ValueError):
+        quantize_model(FakePretrained(torch), str(tmp_path), mode="int4")
+
+
+def test_word_error_rate():
+    assert word_error_rate("the cat sat", "the cat sat") == 0.0
+    assert word_error_rate("the cat sat", "the bat sat down") == pytest.approx(2 / 3)
+    assert word_error_rate("", "") == 0.0
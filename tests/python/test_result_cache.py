@@ -0,0 +1,66 @@
+import os
+import sys
+import time
+
+import pytest
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "src", "python_services"))
+
+from result_cache import ResultCache, hash_file, result_key
+
+
+@pytest.fixture
+def audio_file(tmp_path):
+    path = tmp_path / "meeting.wav"
+    path.write_bytes(os.urandom(3 * 1024 * 1024 + 17))
+    return str(path)
+
+
+def test_hash_file_streams_whole_file(audio_file):
+    import hashlib
+
+    with open(audio_file, "rb") as f:
+        assert hash_file(audio_file, block_size=4096) == hashlib.sha256(f.read()).hexdigest()
+
+
+def test_result_key_depends_on_language_models_and_options():
+    base = result_key("auto", ["a", "b"], {"vad": True})
+    assert base == result_key("auto", ["b", "a"], {"vad": True})
+    assert base != result_key("en", ["a", "b"], {"vad": True})
+    assert base != result_key("auto", ["a"], {"vad": True})
+    assert base != result_key("auto", ["a", "b"], {"vad": False})
+
+
+def test_result_round_trip(tmp_path, audio_file):
+    cache = ResultCache(str(tmp_path / "cache"))
+    audio_hash = hash_file(audio_file)
+    assert cache.get_result(audio_hash, "k") is None
+    result = {"language": "en", "segments": [{"speaker": "Speaker 1", "start_time": 0, "end_time": 1, "text": "hi"}]}
+    cache.put_result(audio_hash, "k", result)
+    assert cache.get_result(audio_hash, "k") == result
+
+
+def test_artifact_round_trip(tmp_path):
+    np = pytest.importorskip("numpy")
+    cache = ResultCache(str(tmp_path / "cache"))
+    regions = np.array([[0, 16000], [32000, 48000]])
+    cache.put_artifact("ab" * 32, "vad_regions", regions)
+    assert cache.get_artifact("ab" * 32, "vad_regions").tolist() == regions.tolist()
+    assert cache.get_artifact("cd" * 32, "vad_regions") is None
+
+
+def test_evicts_least_recently_used_entries(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=10 ** 9)
+    payload = {"text": "x" * 4000}
+    for audio_hash in ("aa" * 32, "bb" * 32, "cc" * 32):
+        cache.put_result(audio_hash, "k", payload)
+        time.sleep(0.01)
+    cache.get_result("aa" * 32, "k")  # "bb" is now the least recently used
+
+    cache.max_bytes = 9000
+    cache.evict()
+    assert cache.get_result("aa" * 32, "k") == payload
+    assert cache.get_result("bb" * 32, "k") is None
+    assert cache.get_result("cc" * 32, "k") == payload
@@ -0,0 +1,94 @@
+import io
+import json
+import os
+import sys
+
+import pytest
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "src", "python_services"))
+
+import audio_processor
+from result_cache import ResultCache, hash_file
+
+CACHED = {"language": "en", "duration_seconds": 1.0, "segments": [], "full_transcript_debug": ""}
+
+
+class StubModelStore:
+    # Stands in for the resident models; serve() only preloads and reports on them
+    def __init__(self, quantize=None, backend="torch"):
+        pass
+
+    def preload(self):
+        pass
+
+    def pool_stats(self):
+        return {}
+
+
+@pytest.fixture
+def worker(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio_processor, "ModelStore", StubModelStore)
+    monkeypatch.setattr(audio_processor, "warm_up", lambda models: {})
+    monkeypatch.setattr(audio_processor, "bundle_missing_error", lambda: None)
+
+    # Jobs are answered from the result cache, so no model is ever run
+    cache = ResultCache(str(tmp_path / "cache"))
+    audio_file = tmp_path / "meeting.wav"
+    audio_file.write_bytes(os.urandom(4096))
+    for language in ("auto", "en"):
+        cache.put_result(hash_file(str(audio_file)), audio_processor.job_cache_key(language), CACHED)
+
+    def run(lines, emit_events=False):
+        output = io.StringIO()
+        audio_processor.serve(io.StringIO("".join(line + "\n" for line in lines)), output, cache=cache,
+                              emit_events=emit_events)
+        return [json.loads(line) for line in output.getvalue().splitlines()]
+
+    run.audio_file = str(audio_file)
+    return run
+
+
+def test_serve_answers_bare_paths_and_json_jobs_in_order(worker):
+    results = worker([
+        json.dumps({"id": "job-1", "audio_file": worker.audio_file, "language": "en"}),
+        "",
+        worker.audio_file,
+    ])
+    assert results == [{"id": "job-1", **CACHED}, CACHED]  # a bare path carries no id
+
+
+def test_serve_reports_bad_jobs_and_keeps_going(worker, monkeypatch):
+    process_audio = audio_processor.process_audio
+
+    def failing_process_audio(audio_file, language, **kwargs):
+        if language == "fail":
+            raise RuntimeError("decoder crashed")
+        return process_audio(audio_file, language, **kwargs)
+
+    monkeypatch.setattr(audio_processor, "process_audio", failing_process_audio)
+    results = worker([
+        "{}",
+        "{not json",
+        json.dumps({"id": "missing", "audio_file": "/no/such/file.wav"}),
+        json.dumps({"id": "crash", "audio_file": worker.audio_file, "language": "fail"}),
+        json.dumps({"id": "after", "audio_file": worker.audio_file, "language": "en"}),
+        json.dumps({"id": "no-file"}),
+    ])
+    assert len(results) == 6
+    assert results[0]["error"].startswith("Invalid job:") and "id" not in results[0]
+    assert results[1]["error"].startswith("Invalid job:")
+    assert results[2] == {"id": "missing", "error": "Audio file not found: /no/such/file.wav"}
+    assert results[3] == {"id": "crash", "error": "Processing failed: decoder crashed"}
+    assert results[4] == {"id": "after", **CACHED}
+    # An empty job after a good one must not repeat that job's result
+    assert results[5]["id"] == "no-file" and results[5]["error"].startswith("Invalid job:")
+
+
+def test_serve_wraps_results_in_events_tagged_with_the_job_id(worker):
+    events = worker([json.dumps({"id": "job-1", "audio_file": worker.audio_file, "language": "en"})],
+                    emit_events=True)
+    assert [event["event"] for event in events] == ["stage-start", "stage-end", "cache-hit", "result"]
+    assert {event["id"] for event in events} == {"job-1"}
+    assert events[-1]["result"] == CACHED
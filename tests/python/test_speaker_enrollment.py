@@ -0,0 +1,75 @@
+import json
+import os
+import sys
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "src", "python_services"))
+
+from speaker_enrollment import SpeakerIndex, main
+
+
+def _voices(count, dims=192, seed=0):
+    return np.random.default_rng(seed).normal(size=(count, dims)).astype(np.float32)
+
+
+def test_enrolled_speakers_are_found_after_reopening(tmp_path):
+    voices = _voices(3)
+    SpeakerIndex(str(tmp_path)).enroll(["Alice", "Bob", "Carol"], voices)
+
+    index = SpeakerIndex(str(tmp_path))
+    assert len(index) == 3
+    assert isinstance(index.matrix(), np.memmap)
+    assert np.allclose(np.linalg.norm(index.matrix(), axis=1), 1.0, atol=1e-5)
+    rows, scores = index.search(voices[[2, 0]] + 0.1 * _voices(2, seed=1))
+    assert rows.tolist() == [2, 0]
+    assert (scores > 0.9).all()
+
+
+def test_suggest_names_gives_each_name_to_the_closest_speaker_only(tmp_path):
+    voices = _voices(2)
+    index = SpeakerIndex(str(tmp_path))
+    index.enroll(["Alice", "Bob"], voices)
+    suggestions = index.suggest_names({
+        "Speaker 1": voices[1] + 0.2 * _voices(1, seed=1)[0],
+        "Speaker 2": voices[1] + 0.05 * _voices(1, seed=2)[0],
+        "Speaker 3": _voices(1, seed=3)[0],
+    })
+    assert suggestions == {"Speaker 2": "Bob"}
+
+
+def test_search_scans_tens_of_thousands_of_voices_in_blocks(tmp_path):
+    voices = _voices(50000, seed=4)
+    index = SpeakerIndex(str(tmp_path))
+    index.enroll([f"voice-{i}" for i in range(voices.shape[0])], voices)
+    started = time.perf_counter()
+    rows, _ = index.search(voices[[123, 49999, 7]], block_rows=4096)
+    assert time.perf_counter() - started < 2.0
+    assert rows.tolist() == [123, 49999, 7]
+
+
+def test_interrupted_append_is_ignored_and_overwritten(tmp_path):
+    voices = _voices(2)
+    index = SpeakerIndex(str(tmp_path))
+    index.enroll(["Alice"], voices[:1])
+    with open(index.matrix_path, "ab") as f:
+        f.write(b"\0" * 100)  # partial row from a crash before the ID table was updated
+    index = SpeakerIndex(str(tmp_path))
+    index.enroll(["Bob"], voices[1:])
+    assert SpeakerIndex(str(tmp_path)).search(voices)[0].tolist() == [0, 1]
+
+
+def test_enroll_command_reads_speaker_embeddings_from_a_result(tmp_path, capsys):
+    voices = _voices(2)
+    result_path = tmp_path / "result.json"
+    result_path.write_text(json.dumps({"speaker_embeddings": {"Speaker 1": voices[0].tolist(),
+                                                              "Speaker 2": voices[1].tolist()}}))
+    enrollment_dir = str(tmp_path / "index")
+    assert main(["enroll", str(result_path), "Speaker 2=Bob", "--enrollment-dir", enrollment_dir]) == 0
+    assert json.loads(capsys.readouterr().out) == {"enrolled": ["Bob"], "total": 1}
+    assert SpeakerIndex(enrollment_dir).suggest_names({"Speaker 1": voices[1].tolist()}) == {"Speaker 1": "Bob"}
@@ -0,0 +1,44 @@
+import os
+import sys
+import threading
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "src", "python_services"))
+
+from stage_scheduler import run_stages
+
+
+def test_run_stages_overlaps_stages_and_splits_threads():
+    both_started = threading.Barrier(2, timeout=5)
+
+    def asr():
+        both_started.wait()
+        return torch.get_num_threads()
+
+    def embeddings():
+        both_started.wait()
+        raise RuntimeError("encoder failed")
+
+    threads_before = torch.get_num_threads()
+    try:
+        asr_future, embeddings_future = run_stages([asr, embeddings], total_threads=4)
+        assert asr_future.result() == 2
+        with pytest.raises(RuntimeError):
+            embeddings_future.result()
+        assert torch.get_num_threads() == 4
+    finally:
+        torch.set_num_threads(threads_before)
+
+
+def test_run_stages_sequential_runs_in_order_on_the_calling_thread():
+    calls = []
+    futures = run_stages([lambda: calls.append("asr") or threading.get_ident(),
+                          lambda: calls.append("embeddings") or threading.get_ident()],
+                         concurrent=False)
+    assert calls == ["asr", "embeddings"]
+    assert [future.result() for future in futures] == [threading.get_ident()] * 2
@@ -0,0 +1,55 @@
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "src", "python_services"))
+
+from vad import SpeechTimeline, detect_speech_regions
+
+SAMPLE_RATE = 16000
+
+
+def _tone(seconds, amplitude=0.3):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return amplitude * np.sin(2 * np.pi * 220 * t)
+
+
+def _silence(seconds):
+    return np.random.default_rng(0).normal(0, 1e-4, int(seconds * SAMPLE_RATE))
+
+
+def test_detect_speech_regions_skips_leading_dead_air_and_long_pauses():
+    signal = np.concatenate((_silence(5), _tone(2), _silence(3), _tone(1)))
+    regions = detect_speech_regions(signal, SAMPLE_RATE, padding=0.0) / SAMPLE_RATE
+    assert regions.shape == (2, 2)
+    assert regions[0] == pytest.approx([5.0, 7.0], abs=0.05)
+    assert regions[1] == pytest.approx([10.0, 11.0], abs=0.05)
+
+
+def test_detect_speech_regions_bridges_short_pauses():
+    signal = np.concatenate((_silence(1), _tone(1), _silence(0.2), _tone(1), _silence(1)))
+    assert detect_speech_regions(signal, SAMPLE_RATE).shape[0] == 1
+
+
+def _digital_silence(seconds):
+    return np.zeros(int(seconds * SAMPLE_RATE))
+
+
+@pytest.mark.parametrize("silence", [_silence, _digital_silence])
+def test_detect_speech_regions_keeps_a_quieter_speaker_when_little_is_silent(silence):
+    # Only 5 of 85 seconds are silent, so a 10th-percentile floor would land on the quiet speaker
+    signal = np.concatenate((silence(3), _tone(40), silence(2), _tone(40, amplitude=0.05)))
+    regions = detect_speech_regions(signal, SAMPLE_RATE, padding=0.0) / SAMPLE_RATE
+    assert regions == pytest.approx(np.array([[3.0, 43.0], [45.0, 85.0]]), abs=0.05)
+
+
+def test_speech_timeline_maps_back_to_original_times():
+    timeline = SpeechTimeline(np.array([[5, 7], [10, 11]]) * SAMPLE_RATE, SAMPLE_RATE)
+    assert timeline.speech_seconds == pytest.approx(3.0)
+    assert timeline.to_original([0.0, 1.5, 2.0, 2.5]).tolist() == pytest.approx([5.0, 6.5, 10.0, 10.5])
+    assert timeline.to_original([2.0], ends=True).tolist() == pytest.approx([7.0])